@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import DailyBookingStats, DailyDriverTrips, DailyRevenue, RollupWatermark
+
+admin.site.register(RollupWatermark)
+admin.site.register(DailyRevenue)
+admin.site.register(DailyBookingStats)
+admin.site.register(DailyDriverTrips)
@@ -0,0 +1,25 @@
+import django_filters
+from .models import DailyBookingStats, DailyDriverTrips, DailyRevenue
+
+
+class DayRangeFilter(django_filters.FilterSet):
+    start = django_filters.DateFilter(field_name='day', lookup_expr='gte')
+    end = django_filters.DateFilter(field_name='day', lookup_expr='lte')
+
+
+class DailyRevenueFilter(DayRangeFilter):
+    class Meta:
+        model = DailyRevenue
+        fields = ['start', 'end', 'payment_method']
+
+
+class DailyBookingStatsFilter(DayRangeFilter):
+    class Meta:
+        model = DailyBookingStats
+        fields = ['start', 'end']
+
+
+class DailyDriverTripsFilter(DayRangeFilter):
+    class Meta:
+        model = DailyDriverTrips
+        fields = ['start', 'end', 'driver']
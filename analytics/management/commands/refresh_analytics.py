@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the daily revenue, booking and driver trip rollups from the bookings and payments "
+        "changed since the last run. Meant to be run periodically, e.g. every few minutes from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every day instead of only the changed ones.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        booking_days, payment_days = refresh_rollups(full=options['full'])
+        self.stdout.write(
+            f"Rebuilt {len(booking_days)} booking day(s) and {len(payment_days)} payment day(s) "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.db import models
+
+
+class RollupWatermark(models.Model):
+    """How far ``refresh_analytics`` has read the source tables, by ``updated_at``."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+
+class DailyRevenue(models.Model):
+    """Payments created on ``day`` with one payment method; revenue counts Completed payments only."""
+    day = models.DateField()
+    payment_method = models.CharField(max_length=50)
+    payments = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'payment_method'], name='daily_revenue_day_method_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.payment_method}: {self.revenue}"
+
+
+class DailyBookingStats(models.Model):
+    """Bookings created on ``day`` by their current status; fare counts completed trips only."""
+    day = models.DateField(unique=True)
+    bookings = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    fare = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.bookings} booking(s)"
+
+
+class DailyDriverTrips(models.Model):
+    """Bookings created on ``day`` and assigned to ``driver``."""
+    day = models.DateField()
+    driver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_trips')
+    trips = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    fare = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'driver'], name='daily_driver_trips_day_driver_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['driver', 'day'], name='daily_driver_trips_driver_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} driver {self.driver_id}: {self.trips} trip(s)"
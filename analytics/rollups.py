@@ -0,0 +1,162 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from bookings.models import Booking
+from payments.models import Payment
+from .models import DailyBookingStats, DailyDriverTrips, DailyRevenue, RollupWatermark
+
+WATERMARK = 'daily_rollups'
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _money_sum(field, condition):
+    return Coalesce(Sum(field, filter=condition), Value(Decimal('0')), output_field=MONEY)
+
+
+def _spans(days):
+    """Merge dates into (first, last) runs of consecutive days."""
+    spans = []
+    for day in sorted(days):
+        if spans and day == spans[-1][1] + timedelta(days=1):
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return spans
+
+
+def _created_on(days):
+    """Rows created on any of ``days`` (local dates), as one range per run of days."""
+    condition = Q()
+    for first, last in _spans(days):
+        condition |= Q(
+            created_at__gte=timezone.make_aware(datetime.combine(first, time.min)),
+            created_at__lt=timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min)),
+        )
+    return condition
+
+
+def _on_days(days):
+    condition = Q()
+    for first, last in _spans(days):
+        condition |= Q(day__range=(first, last))
+    return condition
+
+
+def changed_days(model, since):
+    """
+    Local creation dates of the ``model`` rows updated at or after ``since``
+    (of every row when ``since`` is None).
+
+    Soft-deleted rows are included, so the day they drop out of is rebuilt.
+    """
+    rows = model.all_objects.all()
+    if since is not None:
+        rows = rows.filter(updated_at__gte=since)
+    return set(rows.annotate(day=TruncDate('created_at')).values_list('day', flat=True).order_by().distinct())
+
+
+def rebuild_revenue(days):
+    rows = Payment.objects.filter(_created_on(days)).annotate(day=TruncDate('created_at')).values(
+        'day', 'payment_method',
+    ).annotate(
+        payments=Count('id'),
+        completed=Count('id', filter=Q(status='Completed')),
+        failed=Count('id', filter=Q(status='Failed')),
+        revenue=_money_sum('amount', Q(status='Completed')),
+    ).order_by()
+    DailyRevenue.objects.filter(_on_days(days)).delete()
+    DailyRevenue.objects.bulk_create(DailyRevenue(**row) for row in rows)
+
+
+def rebuild_bookings(days):
+    completed = Q(status='COMPLETED')
+    cancelled = Q(status='CANCELLED')
+    bookings = Booking.objects.filter(_created_on(days)).annotate(day=TruncDate('created_at')).order_by()
+
+    stats = bookings.values('day').annotate(
+        bookings=Count('id'),
+        completed=Count('id', filter=completed),
+        cancelled=Count('id', filter=cancelled),
+        fare=_money_sum('fare', completed),
+    )
+    trips = bookings.exclude(driver=None).values('day', 'driver_id').annotate(
+        trips=Count('id'),
+        completed=Count('id', filter=completed),
+        cancelled=Count('id', filter=cancelled),
+        fare=_money_sum('fare', completed),
+    )
+    DailyBookingStats.objects.filter(_on_days(days)).delete()
+    DailyBookingStats.objects.bulk_create(DailyBookingStats(**row) for row in stats)
+    DailyDriverTrips.objects.filter(_on_days(days)).delete()
+    DailyDriverTrips.objects.bulk_create(DailyDriverTrips(**row) for row in trips)
+
+
+def _batches(days):
+    days = sorted(days)
+    size = settings.ANALYTICS_REFRESH_BATCH_DAYS
+    for index in range(0, len(days), size):
+        yield days[index:index + size]
+
+
+def _drop_other_days(models, days):
+    """Delete the rows of ``models`` for every day not in ``days``."""
+    for model in models:
+        rows = model.objects.all()
+        if days:
+            rows = rows.exclude(_on_days(days))
+        rows.delete()
+
+
+def refresh_rollups(full=False):
+    """
+    Bring the daily rollups up to date and return the booking and payment
+    days that were rebuilt.
+
+    Only rows whose ``updated_at`` is at or after the stored watermark are
+    read, and every day one of them was created on is recomputed from the
+    source table, so a booking or payment changing status moves it between
+    buckets without any bookkeeping. The new watermark trails the start of the
+    run by ``ANALYTICS_WATERMARK_LAG`` seconds, so rows written by transactions
+    that were still open are read on the next run; re-reading a row is
+    harmless. ``full`` rebuilds every day, which also drops the rows of
+    bookings and payments that were deleted outright.
+
+    Days are rebuilt ``ANALYTICS_REFRESH_BATCH_DAYS`` at a time, each batch in
+    its own transaction, so the write lock is never held for the whole run.
+    Readers see every day either before or after its rebuild. A run that
+    fails part-way leaves the watermark where it was, and the next run redoes
+    the days it had not reached; so does an overlapping run, to the same end.
+    """
+    started = timezone.now()
+    since = None if full else refreshed_through()
+
+    booking_days = changed_days(Booking, since)
+    payment_days = changed_days(Payment, since)
+    for batch in _batches(booking_days):
+        with transaction.atomic():
+            rebuild_bookings(batch)
+    for batch in _batches(payment_days):
+        with transaction.atomic():
+            rebuild_revenue(batch)
+
+    with transaction.atomic():
+        if since is None:
+            _drop_other_days((DailyBookingStats, DailyDriverTrips), booking_days)
+            _drop_other_days((DailyRevenue,), payment_days)
+        value = started - timedelta(seconds=settings.ANALYTICS_WATERMARK_LAG)
+        # An overlapping run that started later may already have moved it on.
+        if not RollupWatermark.objects.filter(name=WATERMARK, value__gte=value).exists():
+            RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': value})
+    return booking_days, payment_days
+
+
+def refreshed_through():
+    """The watermark of the last refresh; changes made before it are in the rollups."""
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('value', flat=True).first()
@@ -0,0 +1,27 @@
+from rest_framework import serializers
+from .models import DailyBookingStats, DailyDriverTrips, DailyRevenue
+
+
+class DailyRevenueSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyRevenue
+        fields = ['day', 'payment_method', 'payments', 'completed', 'failed', 'revenue']
+
+
+class DailyBookingStatsSerializer(serializers.ModelSerializer):
+    cancellation_rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DailyBookingStats
+        fields = ['day', 'bookings', 'completed', 'cancelled', 'cancellation_rate', 'fare']
+
+    def get_cancellation_rate(self, obj):
+        return round(obj.cancelled / obj.bookings, 4) if obj.bookings else 0.0
+
+
+class DailyDriverTripsSerializer(serializers.ModelSerializer):
+    driver_name = serializers.CharField(source='driver.username', read_only=True)
+
+    class Meta:
+        model = DailyDriverTrips
+        fields = ['day', 'driver', 'driver_name', 'trips', 'completed', 'cancelled', 'fare']
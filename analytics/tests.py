@@ -0,0 +1,127 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from bookings.models import Booking
+from core.authentication import ClaimsRefreshToken
+from payments.models import Payment
+from users.models import User
+
+from .models import DailyBookingStats, DailyDriverTrips, DailyRevenue
+from .rollups import refresh_rollups, refreshed_through
+
+
+@override_settings(ANALYTICS_WATERMARK_LAG=0, ANALYTICS_REFRESH_BATCH_DAYS=2)
+class RefreshRollupsTests(TestCase):
+    def setUp(self):
+        self.passenger = User.objects.create_user('rider', role='PASSENGER')
+        self.driver = User.objects.create_user('driver', role='DRIVER')
+        self.now = timezone.now()
+        self.bookings = [self.trip(status, days_ago) for days_ago in (0, 1, 4) for status in ('COMPLETED', 'PENDING')]
+
+    def trip(self, status, days_ago=0, fare='100.00', method='Cash'):
+        booking = Booking.objects.create(
+            passenger=self.passenger, driver=self.driver, pickup_location='a', dropoff_location='b',
+            pickup_time=self.now, fare=fare, status=status,
+        )
+        payment = Payment.objects.create(
+            booking=booking, amount=fare, payment_method=method,
+            status='Completed' if status == 'COMPLETED' else 'Pending',
+        )
+        if days_ago:
+            created_at = self.now - timedelta(days=days_ago)
+            Booking.objects.filter(pk=booking.pk).update(created_at=created_at)
+            Payment.objects.filter(pk=payment.pk).update(created_at=created_at)
+        return booking
+
+    def rollups(self):
+        return {
+            model.__name__: sorted(model.objects.values_list(*fields))
+            for model, fields in (
+                (DailyBookingStats, ('day', 'bookings', 'completed', 'cancelled', 'fare')),
+                (DailyDriverTrips, ('day', 'driver', 'trips', 'completed', 'cancelled', 'fare')),
+                (DailyRevenue, ('day', 'payment_method', 'payments', 'completed', 'failed', 'revenue')),
+            )
+        }
+
+    def test_full_refresh_aggregates_per_day(self):
+        booking_days, payment_days = refresh_rollups(full=True)
+        self.assertEqual(len(booking_days), 3)
+        self.assertEqual(booking_days, payment_days)
+        stats = DailyBookingStats.objects.get(day=timezone.localdate())
+        self.assertEqual((stats.bookings, stats.completed, stats.cancelled, stats.fare), (2, 1, 0, Decimal('100.00')))
+        self.assertEqual(DailyRevenue.objects.get(day=timezone.localdate()).revenue, Decimal('100.00'))
+        self.assertIsNotNone(refreshed_through())
+
+    def test_nothing_changed_rebuilds_nothing(self):
+        refresh_rollups()
+        self.assertEqual(refresh_rollups(), (set(), set()))
+
+    def test_incremental_refresh_matches_a_full_recompute(self):
+        refresh_rollups()
+        Booking.objects.filter(pk=self.bookings[1].pk).apply_transition('cancel')
+        Payment.objects.filter(booking=self.bookings[3]).settle('Completed')
+        self.bookings[4].soft_delete()
+        self.trip('COMPLETED', fare='70.00', method='Gcash')
+        self.trip('COMPLETED', days_ago=9, fare='30.00')
+
+        booking_days, _ = refresh_rollups()
+        # Only the days with changes, not the untouched ones, were rebuilt.
+        self.assertEqual(len(booking_days), 3)
+        incremental = self.rollups()
+        refresh_rollups(full=True)
+        self.assertEqual(incremental, self.rollups())
+
+    @override_settings(ANALYTICS_WATERMARK_LAG=60)
+    def test_watermark_lag_reads_rows_committed_late(self):
+        an_hour_ago = self.now - timedelta(hours=1)
+        Booking.objects.update(updated_at=an_hour_ago)
+        Payment.objects.update(updated_at=an_hour_ago)
+        refresh_rollups()
+        # A write whose transaction was still open during the last run: its
+        # updated_at is before that run started, but it was not yet visible.
+        late = self.trip('COMPLETED', days_ago=7)
+        Booking.objects.filter(pk=late.pk).update(updated_at=refreshed_through() + timedelta(seconds=30))
+
+        booking_days, _ = refresh_rollups()
+        self.assertEqual(booking_days, {timezone.localdate(self.now - timedelta(days=7))})
+        self.assertEqual(DailyBookingStats.objects.get(day__in=booking_days).completed, 1)
+
+    def test_refresh_analytics_command(self):
+        call_command('refresh_analytics', stdout=io.StringIO())
+        self.assertEqual(DailyBookingStats.objects.count(), 3)
+        Booking.objects.filter(pk=self.bookings[4].pk).delete()
+        Booking.objects.filter(pk=self.bookings[5].pk).delete()
+        # Rows deleted outright are only dropped by a full rebuild.
+        call_command('refresh_analytics', '--full', stdout=io.StringIO())
+        self.assertEqual(DailyBookingStats.objects.count(), 2)
+
+
+class RollupListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+        driver = User.objects.create_user('driver', role='DRIVER')
+        DailyBookingStats.objects.create(day='2026-01-01', bookings=3, completed=1, cancelled=2, fare='100.00')
+        DailyBookingStats.objects.create(day='2026-01-02', bookings=1, completed=1, fare='50.00')
+        DailyDriverTrips.objects.create(day='2026-01-01', driver=driver, trips=3, completed=1, cancelled=2)
+        self.client = Client()
+
+    def get(self, path, user=None):
+        access = ClaimsRefreshToken.for_user(user or self.admin).access_token
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_lists_newest_day_first_with_filters(self):
+        data = self.get('/api/analytics/bookings/').json()
+        self.assertEqual([row['day'] for row in data['results']], ['2026-01-02', '2026-01-01'])
+        self.assertEqual(data['results'][1]['cancellation_rate'], 0.6667)
+        self.assertIn('refreshed_through', data)
+        self.assertEqual(self.get('/api/analytics/bookings/?start=2026-01-02').json()['count'], 1)
+        self.assertEqual(self.get('/api/analytics/drivers/').json()['results'][0]['driver_name'], 'driver')
+
+    def test_staff_only(self):
+        passenger = User.objects.create_user('rider', role='PASSENGER')
+        self.assertEqual(self.get('/api/analytics/revenue/', passenger).status_code, 403)
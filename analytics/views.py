@@ -0,0 +1,41 @@
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import generics, permissions
+from .filters import DailyBookingStatsFilter, DailyDriverTripsFilter, DailyRevenueFilter
+from .models import DailyBookingStats, DailyDriverTrips, DailyRevenue
+from .rollups import refreshed_through
+from .serializers import DailyBookingStatsSerializer, DailyDriverTripsSerializer, DailyRevenueSerializer
+from core.pagination import StandardPageNumberPagination
+
+
+class RollupListAPIView(generics.ListAPIView):
+    """
+    Daily rollup rows, newest day first, read from the tables kept by
+    ``refresh_analytics``; the source bookings and payments are not touched.
+    ``refreshed_through`` tells the dashboard how current the figures are.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = StandardPageNumberPagination
+    filter_backends = [DjangoFilterBackend]
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['refreshed_through'] = refreshed_through()
+        return response
+
+
+class DailyRevenueAPIView(RollupListAPIView):
+    queryset = DailyRevenue.objects.order_by('-day', 'payment_method')
+    serializer_class = DailyRevenueSerializer
+    filterset_class = DailyRevenueFilter
+
+
+class DailyBookingStatsAPIView(RollupListAPIView):
+    queryset = DailyBookingStats.objects.order_by('-day')
+    serializer_class = DailyBookingStatsSerializer
+    filterset_class = DailyBookingStatsFilter
+
+
+class DailyDriverTripsAPIView(RollupListAPIView):
+    queryset = DailyDriverTrips.objects.select_related('driver').order_by('-day', 'driver_id')
+    serializer_class = DailyDriverTripsSerializer
+    filterset_class = DailyDriverTripsFilter
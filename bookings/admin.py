@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.admin import SoftDeleteAdmin
 from .models import Booking
 
-admin.site.register(Booking)
+admin.site.register(Booking, SoftDeleteAdmin)
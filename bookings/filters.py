@@ -0,0 +1,13 @@
+import django_filters
+from .models import Booking
+
+
+class BookingFilter(django_filters.FilterSet):
+    passenger = django_filters.NumberFilter(field_name='passenger_id')
+    driver = django_filters.NumberFilter(field_name='driver_id')
+    pickup_after = django_filters.IsoDateTimeFilter(field_name='pickup_time', lookup_expr='gte')
+    pickup_before = django_filters.IsoDateTimeFilter(field_name='pickup_time', lookup_expr='lte')
+
+    class Meta:
+        model = Booking
+        fields = ['status', 'passenger', 'driver', 'pickup_after', 'pickup_before']
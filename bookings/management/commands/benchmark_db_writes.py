@@ -0,0 +1,108 @@
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+SCHEMA = (
+    "CREATE TABLE vehicle (id INTEGER PRIMARY KEY, status TEXT NOT NULL)",
+    "CREATE TABLE booking (id INTEGER PRIMARY KEY, vehicle_id INTEGER NOT NULL, status TEXT NOT NULL)",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent booking-style write throughput on a scratch SQLite file, with "
+        "SQLite's default journaling and with the tuned options from settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', default='1,4,16,32')
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--vehicles', type=int, default=200)
+
+    def handle(self, *args, **options):
+        tuned = getattr(settings, 'SQLITE_TUNED_OPTIONS', None)
+        if tuned is None:
+            raise CommandError("The SQLite profile is only configured when DB_ENGINE is sqlite3.")
+        profiles = {'default': {}, 'tuned': tuned}
+
+        self.stdout.write(f"{'profile':<8} {'threads':>7} {'commits_s':>10} {'locked':>7} {'p99_ms':>8}")
+        with tempfile.TemporaryDirectory() as scratch:
+            for threads in (int(t) for t in options['threads'].split(',')):
+                for profile, db_options in profiles.items():
+                    alias = f'bench_{profile}_{threads}'
+                    self.add_database(alias, Path(scratch) / f'{alias}.sqlite3', db_options)
+                    self.create_schema(alias, options['vehicles'])
+                    commits, outcomes, timings = self.run(alias, threads, options['seconds'], options['vehicles'])
+                    timings.sort()
+                    p99 = timings[int(len(timings) * 0.99)] if timings else float('nan')
+                    self.stdout.write(
+                        f"{profile:<8} {threads:>7} {commits / options['seconds']:>10.0f} "
+                        f"{outcomes['locked']:>7} {p99:>8.2f}"
+                    )
+
+    def add_database(self, alias, path, db_options):
+        configured = connections.configure_settings({
+            'default': connections.settings['default'],
+            alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path), 'OPTIONS': db_options},
+        })
+        connections.settings[alias] = configured[alias]
+
+    def create_schema(self, alias, vehicles):
+        with connections[alias].cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany("INSERT INTO vehicle (status) VALUES ('AVAILABLE')", [()] * vehicles)
+        connections[alias].close()
+
+    def run(self, alias, threads, seconds, vehicles):
+        deadline = time.perf_counter() + seconds
+        outcomes = Counter()
+        timings = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local = Counter()
+            local_timings = []
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    self.claim_and_release(alias, rng.randrange(vehicles))
+                except OperationalError:
+                    local['locked'] += 1
+                else:
+                    local['committed'] += 1
+                    local_timings.append((time.perf_counter() - start) * 1e3)
+            connections[alias].close()
+            with lock:
+                outcomes.update(local)
+                timings.extend(local_timings)
+
+        workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return outcomes['committed'], outcomes, timings
+
+    def claim_and_release(self, alias, offset):
+        # The shape of booking creation: read a candidate, claim it with a
+        # conditional UPDATE, record the booking, then free the vehicle again.
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM vehicle WHERE status = 'AVAILABLE' ORDER BY id LIMIT 1 OFFSET %s", [offset]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return
+            cursor.execute("UPDATE vehicle SET status = 'ON_TRIP' WHERE id = %s AND status = 'AVAILABLE'", row)
+            if cursor.rowcount:
+                cursor.execute("INSERT INTO booking (vehicle_id, status) VALUES (%s, 'PENDING')", row)
+                cursor.execute("UPDATE vehicle SET status = 'AVAILABLE' WHERE id = %s", row)
@@ -0,0 +1,95 @@
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from bookings.models import Booking
+from bookings.views import BookingExportAPIView
+from users.models import User
+from vehicles.models import Vehicle
+
+BATCH = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a bookings export of --rows synthetic bookings from a scratch SQLite file and fail "
+        "if the peak Python memory of the export exceeds --max-memory-mb."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--max-memory-mb', type=float, default=32)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as scratch:
+            alias = 'export_benchmark'
+            configured = connections.configure_settings({
+                'default': connections.settings['default'],
+                alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(Path(scratch) / 'export.sqlite3')},
+            })
+            connections.settings[alias] = configured[alias]
+            try:
+                self.populate(alias, options['rows'])
+                self.export(alias, options)
+            finally:
+                connections[alias].close()
+
+    def populate(self, alias, rows):
+        start = time.perf_counter()
+        with connections[alias].schema_editor() as editor:
+            for model in (User, Vehicle, Booking):
+                editor.create_model(model)
+        passenger = User.objects.db_manager(alias).create(username='passenger', role='PASSENGER')
+        pickup_time = timezone.now()
+        for offset in range(0, rows, BATCH):
+            Booking.objects.using(alias).bulk_create(
+                Booking(
+                    passenger_id=passenger.pk,
+                    pickup_location=f'Pickup {i}',
+                    pickup_geolocation='14.5995,120.9842',
+                    pickup_latitude=14.5995,
+                    pickup_longitude=120.9842,
+                    dropoff_location=f'Dropoff {i}',
+                    dropoff_geolocation='14.6760,121.0437',
+                    dropoff_latitude=14.6760,
+                    dropoff_longitude=121.0437,
+                    pickup_time=pickup_time + timedelta(minutes=i),
+                    status='COMPLETED',
+                    fare='250.00',
+                )
+                for i in range(offset, min(offset + BATCH, rows))
+            )
+        self.stdout.write(f"Inserted {rows} bookings in {time.perf_counter() - start:.1f}s")
+
+    def export(self, alias, options):
+        view = type('ScratchBookingExport', (BookingExportAPIView,), {
+            'queryset': Booking.objects.using(alias).all(),
+            'permission_classes': [],
+        }).as_view()
+        request = APIRequestFactory().get('/api/bookings/export/', {'format': options['format']})
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = view(request)
+        lines = size = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+            lines += chunk.count(b'\n')
+        elapsed = time.perf_counter() - start
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"Exported {lines} lines ({size / 2**20:.1f} MiB {options['format']}) in {elapsed:.1f}s, "
+            f"peak Python memory {peak_mb:.1f} MiB"
+        )
+        if peak_mb > options['max_memory_mb']:
+            raise CommandError(f"Peak memory {peak_mb:.1f} MiB exceeds {options['max_memory_mb']} MiB.")
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import AsyncRequestFactory, RequestFactory
+
+from bookings.models import Booking
+from bookings.views import (
+    BookingDetailAsyncView, BookingListCreateAPIView, BookingListCreateAsyncView,
+    BookingRetrieveUpdateDestroyAPIView,
+)
+from core.authentication import ClaimsRefreshToken
+from users.models import User
+from users.views import UserProfileAPIView, UserProfileAsyncView
+from vehicles.views import AvailableVehiclesAPIView, AvailableVehiclesAsyncView
+
+ENDPOINTS = {
+    'bookings': ('/api/bookings/', BookingListCreateAPIView, BookingListCreateAsyncView),
+    'booking-detail': ('/api/bookings/{pk}/', BookingRetrieveUpdateDestroyAPIView, BookingDetailAsyncView),
+    'available': ('/api/vehicles/available/', AvailableVehiclesAPIView, AvailableVehiclesAsyncView),
+    'profile': ('/api/users/profile/', UserProfileAPIView, UserProfileAsyncView),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync DRF read views on a thread pool (WSGI) with their async "
+        "variants on one event loop (ASGI) at increasing concurrency, against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="User whose JWT authenticates the requests.")
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+        parser.add_argument('--concurrency', default='10,100,500')
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        authorization = f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'
+        booking = Booking.objects.order_by('pk').first()
+        connection.close()
+
+        self.stdout.write(
+            f"{'endpoint':<15} {'conc':>5} {'mode':>5} {'req_s':>8} {'p50_ms':>8} {'p99_ms':>8} {'errors':>6}"
+        )
+        for name in options['endpoints'].split(','):
+            path, sync_view, async_view = ENDPOINTS[name]
+            kwargs = {}
+            if '{pk}' in path:
+                if booking is None:
+                    raise CommandError("booking-detail needs at least one booking.")
+                path, kwargs = path.format(pk=booking.pk), {'pk': booking.pk}
+
+            for concurrency in (int(c) for c in options['concurrency'].split(',')):
+                for mode, run in (('wsgi', self.run_sync), ('asgi', self.run_async)):
+                    elapsed, timings, errors = run(
+                        sync_view if mode == 'wsgi' else async_view,
+                        path, kwargs, authorization, concurrency, options['requests'],
+                    )
+                    timings.sort()
+                    self.stdout.write(
+                        f"{name:<15} {concurrency:>5} {mode:>5} {len(timings) / elapsed:>8.0f} "
+                        f"{timings[len(timings) // 2]:>8.2f} {timings[int(len(timings) * 0.99)]:>8.2f} {errors:>6}"
+                    )
+
+    def run_sync(self, view_class, path, kwargs, authorization, concurrency, total):
+        view = view_class.as_view()
+        factory = RequestFactory()
+
+        def one(_):
+            start = time.perf_counter()
+            response = view(factory.get(path, HTTP_AUTHORIZATION=authorization), **kwargs)
+            response.render()
+            close_old_connections()
+            return (time.perf_counter() - start) * 1e3, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(total)))
+        return self.summarize(time.perf_counter() - start, results)
+
+    def run_async(self, view_class, path, kwargs, authorization, concurrency, total):
+        view = view_class.as_view()
+        factory = AsyncRequestFactory()
+
+        async def one(slots):
+            async with slots:
+                # Per-request thread context and connection cleanup, as the handlers do.
+                async with ThreadSensitiveContext():
+                    start = time.perf_counter()
+                    response = await view(factory.get(path, headers={'Authorization': authorization}), **kwargs)
+                    await sync_to_async(close_old_connections)()
+                    return (time.perf_counter() - start) * 1e3, response.status_code
+
+        async def main():
+            slots = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(one(slots) for _ in range(total)))
+
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        return self.summarize(time.perf_counter() - start, results)
+
+    def summarize(self, elapsed, results):
+        timings = [ms for ms, _ in results]
+        errors = sum(1 for _, status in results if status >= 400)
+        return elapsed, timings, errors
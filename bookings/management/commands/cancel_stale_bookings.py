@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bookings.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Cancel PENDING bookings whose pickup time passed more than --minutes ago and free their vehicles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=30)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['minutes'])
+        cancelled = Booking.objects.filter(status='PENDING', pickup_time__lt=cutoff).apply_transition('cancel')
+        self.stdout.write(f"Cancelled {cancelled} stale booking(s).")
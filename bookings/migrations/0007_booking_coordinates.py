@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_remove_booking_deleted_at_booking_is_deleted'),
+        ('vehicles', '0007_vehicle_current_geolocation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='dropoff_latitude',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='dropoff_longitude',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='pickup_latitude',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='pickup_longitude',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['pickup_latitude', 'pickup_longitude'], name='booking_pickup_coords_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['dropoff_latitude', 'dropoff_longitude'], name='booking_dropoff_coords_idx'),
+        ),
+    ]
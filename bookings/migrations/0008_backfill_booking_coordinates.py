@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def parse(value):
+    try:
+        lat, lng = (float(part) for part in str(value).split(','))
+    except (TypeError, ValueError):
+        return None, None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None, None
+    return lat, lng
+
+
+def backfill_coordinates(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    batch = []
+    for booking in Booking.objects.only('pk', 'pickup_geolocation', 'dropoff_geolocation').iterator(chunk_size=2000):
+        booking.pickup_latitude, booking.pickup_longitude = parse(booking.pickup_geolocation)
+        booking.dropoff_latitude, booking.dropoff_longitude = parse(booking.dropoff_geolocation)
+        batch.append(booking)
+        if len(batch) >= 2000:
+            Booking.objects.bulk_update(
+                batch, ['pickup_latitude', 'pickup_longitude', 'dropoff_latitude', 'dropoff_longitude']
+            )
+            batch = []
+    if batch:
+        Booking.objects.bulk_update(
+            batch, ['pickup_latitude', 'pickup_longitude', 'dropoff_latitude', 'dropoff_longitude']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cancel_duplicate_active_bookings(apps, schema_editor):
+    # Older versions could hand the same vehicle to several bookings. Keep the
+    # newest active booking per vehicle so the unique constraint can be added.
+    Booking = apps.get_model('bookings', 'Booking')
+    active = Booking.objects.filter(
+        status__in=('PENDING', 'ACCEPTED', 'ONGOING'), vehicle__isnull=False
+    ).order_by('vehicle_id', '-created_at', '-id').values_list('pk', 'vehicle_id')
+    seen = set()
+    duplicates = []
+    for pk, vehicle_id in active.iterator():
+        if vehicle_id in seen:
+            duplicates.append(pk)
+        seen.add(vehicle_id)
+    Booking.objects.filter(pk__in=duplicates).update(status='CANCELLED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_backfill_booking_coordinates'),
+        ('vehicles', '0008_vehicle_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['driver', 'status'], name='booking_driver_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['passenger', 'status'], name='booking_passenger_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status', 'created_at'], name='booking_live_status_idx'),
+        ),
+        migrations.RunPython(cancel_duplicate_active_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('PENDING', 'ACCEPTED', 'ONGOING'))), fields=('vehicle',), name='booking_one_active_per_vehicle'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_booking_indexes_and_active_vehicle_constraint'),
+        ('vehicles', '0009_soft_delete_live_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at', '-id'], name='bookings_booking_live_idx'),
+        ),
+    ]
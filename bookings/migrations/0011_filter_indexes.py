@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_soft_delete_live_index'),
+        ('vehicles', '0010_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['pickup_time'], name='booking_live_pickup_time_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_filter_indexes'),
+        ('vehicles', '0010_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['updated_at'], name='booking_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_updated_at_index'),
+        ('vehicles', '0010_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_driver_status_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['driver', 'status', 'created_at'], name='booking_driver_status_idx'),
+        ),
+    ]
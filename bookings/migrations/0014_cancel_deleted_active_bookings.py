@@ -0,0 +1,31 @@
+from django.db import migrations
+
+ACTIVE_STATUSES = ('PENDING', 'ACCEPTED', 'ONGOING')
+
+
+def cancel_deleted_active_bookings(apps, schema_editor):
+    # Soft deleting used to leave a booking active, so its vehicle stayed
+    # ON_TRIP and the hidden booking held booking_one_active_per_vehicle.
+    # Cancel those bookings and release the vehicles they were holding.
+    Booking = apps.get_model('bookings', 'Booking')
+    Vehicle = apps.get_model('vehicles', 'Vehicle')
+    hidden = Booking.objects.filter(is_deleted=True, status__in=ACTIVE_STATUSES)
+    vehicle_ids = list(hidden.exclude(vehicle=None).values_list('vehicle_id', flat=True))
+    hidden.update(status='CANCELLED')
+    Vehicle.objects.filter(
+        pk__in=vehicle_ids, status='ON_TRIP'
+    ).exclude(
+        booking__status__in=ACTIVE_STATUSES
+    ).update(status='AVAILABLE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0013_driver_earnings_index'),
+        ('vehicles', '0010_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_deleted_active_bookings, migrations.RunPython.noop),
+    ]
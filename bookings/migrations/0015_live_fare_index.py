@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0014_cancel_deleted_active_bookings'),
+        ('vehicles', '0010_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['fare'], name='booking_live_fare_idx'),
+        ),
+    ]
@@ -1,8 +1,136 @@
+import math
+from decimal import Decimal
+from collections import namedtuple
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, DateField, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, Sqrt, TruncDate, TruncWeek
+from django.utils import timezone
 from vehicles.models import Vehicle
+from vehicles.dispatch import release_vehicles
+from core.events import booking_channel, booking_event, publish_on_commit
+from core.geo import KM_PER_DEGREE, parse_geolocation
+from core.models import SoftDeleteManager, SoftDeleteModel, SoftDeleteQuerySet
+
+Transition = namedtuple('Transition', ['sources', 'target', 'releases_vehicle'])
+
+
+class BookingQuerySet(SoftDeleteQuerySet):
+    def with_details(self):
+        """Join everything BookingSerializer reads, including the vehicle's driver."""
+        return self.select_related('passenger', 'driver', 'vehicle__driver')
+
+    def apply_transition(self, name):
+        """
+        Move every booking in this queryset through the named transition.
+
+        The bookings are locked and moved with one ``UPDATE ... WHERE status IN
+        (<sources>)``, so rows that a concurrent request already moved are
+        skipped rather than overwritten. Transitions that end a trip release
+        their vehicles in the same transaction, and every moved booking's
+        status event is published once it commits. Returns the number of
+        bookings moved.
+        """
+        transition = Booking.TRANSITIONS[name]
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(self.filter(status__in=transition.sources).select_for_update().values_list('pk', 'vehicle_id'))
+            if not rows:
+                return 0
+            booking_ids = [pk for pk, _ in rows]
+            updated = self.model.all_objects.filter(pk__in=booking_ids, status__in=transition.sources).update(
+                status=transition.target, updated_at=now,
+            )
+            if updated < len(rows):
+                # Where SELECT ... FOR UPDATE locks nothing (SQLite), another
+                # transaction can move some of them in between.
+                rows = list(self.model.all_objects.filter(
+                    pk__in=booking_ids, status=transition.target, updated_at=now,
+                ).values_list('pk', 'vehicle_id'))
+            vehicle_ids = [vehicle_id for _, vehicle_id in rows if vehicle_id is not None]
+            if transition.releases_vehicle and vehicle_ids:
+                release_vehicles(vehicle_ids)
+            for pk, _ in rows:
+                publish_on_commit(booking_channel(pk), booking_event(pk, transition.target, updated_at=now))
+        return updated
+
+    def soft_delete(self):
+        """
+        Hide these bookings, cancelling the active ones first.
+
+        A hidden booking that stayed active would keep its vehicle ON_TRIP and
+        hold the vehicle's booking_one_active_per_vehicle slot for good, so the
+        vehicle is released in the same transaction and the cancellation is
+        published like any other.
+        """
+        with transaction.atomic():
+            booking_ids = list(self.values_list('pk', flat=True))
+            bookings = self.model.all_objects.filter(pk__in=booking_ids)
+            bookings.apply_transition('cancel')
+            return bookings.update(is_deleted=True, updated_at=timezone.now())
+
+    def earnings(self, period=None):
+        """
+        Completed trips, their fare and their verified payments.
 
-class Booking(models.Model):
+        Returns one aggregate dict, or with ``period`` ('day' or 'week') one row
+        per period of ``created_at``, newest first. Filter by driver first, so
+        the driver/status/created_at index narrows the scan.
+        """
+        money = DecimalField(max_digits=14, decimal_places=2)
+        verified = Q(payment__status='Completed', payment__is_deleted=False)
+        figures = {
+            'completed_trips': Count('id'),
+            'total_fare': Coalesce(Sum('fare'), Value(Decimal('0')), output_field=money),
+            'verified_payments': Count('payment', filter=verified),
+            'verified_amount': Coalesce(Sum('payment__amount', filter=verified), Value(Decimal('0')), output_field=money),
+        }
+        completed = self.filter(status='COMPLETED')
+        if period is None:
+            return completed.aggregate(**figures)
+        trunc = TruncDate('created_at') if period == 'day' else TruncWeek('created_at', output_field=DateField())
+        return completed.annotate(period=trunc).values('period').annotate(**figures).order_by('-period')
+
+    def within_bbox(self, min_lat, min_lng, max_lat, max_lng, point='pickup'):
+        return self.filter(**{
+            f'{point}_latitude__range': (min_lat, max_lat),
+            f'{point}_longitude__range': (min_lng, max_lng),
+        })
+
+    def near(self, lat, lng, radius_km, point='pickup'):
+        """
+        Bookings whose pickup (or dropoff) lies within ``radius_km`` of (lat, lng).
+
+        The bounding box is matched against the coordinate index first, then the
+        remaining rows are checked with an equirectangular distance computed by
+        the database and annotated as ``distance_km``.
+        """
+        lat_delta = radius_km / KM_PER_DEGREE
+        lng_scale = max(math.cos(math.radians(lat)), 1e-6)
+        lng_delta = lat_delta / lng_scale
+        dlat = (F(f'{point}_latitude') - lat) * KM_PER_DEGREE
+        dlng = (F(f'{point}_longitude') - lng) * (KM_PER_DEGREE * lng_scale)
+        squared = dlat * dlat + dlng * dlng
+        return self.within_bbox(
+            lat - lat_delta, lng - lng_delta, lat + lat_delta, lng + lng_delta, point=point
+        ).alias(
+            distance_squared=squared
+        ).filter(
+            distance_squared__lte=radius_km * radius_km
+        ).annotate(
+            distance_km=Sqrt(squared)
+        )
+
+
+class Booking(SoftDeleteModel):
+    ACTIVE_STATUSES = ('PENDING', 'ACCEPTED', 'ONGOING')
+    TRANSITIONS = {
+        'accept': Transition(sources=('PENDING',), target='ACCEPTED', releases_vehicle=False),
+        'start': Transition(sources=('ACCEPTED',), target='ONGOING', releases_vehicle=False),
+        'complete': Transition(sources=('ONGOING',), target='COMPLETED', releases_vehicle=True),
+        'cancel': Transition(sources=ACTIVE_STATUSES, target='CANCELLED', releases_vehicle=True),
+    }
     STATUS_CHOICES = (
         ('PENDING', 'Pending'),
         ('ACCEPTED', 'Accepted'),
@@ -18,21 +146,63 @@ class Booking(models.Model):
     # Pickup Location
     pickup_location = models.CharField(max_length=200)
     pickup_geolocation = models.CharField(max_length=50, blank=False, null=False, default='0,0')
+    pickup_latitude = models.FloatField(null=True, editable=False)
+    pickup_longitude = models.FloatField(null=True, editable=False)
     
     # Dropoff Location
     dropoff_location = models.CharField(max_length=200)
     dropoff_geolocation = models.CharField(max_length=50, blank=False, null=False, default='0,0')
+    dropoff_latitude = models.FloatField(null=True, editable=False)
+    dropoff_longitude = models.FloatField(null=True, editable=False)
     
     pickup_time = models.DateTimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     fare = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    is_deleted = models.BooleanField(default=False)
+
+    objects = SoftDeleteManager.from_queryset(BookingQuerySet)()
+    all_objects = BookingQuerySet.as_manager()
+
+    class Meta(SoftDeleteModel.Meta):
+        indexes = SoftDeleteModel.Meta.indexes + [
+            models.Index(fields=['updated_at'], name='booking_updated_at_idx'),
+            models.Index(fields=['pickup_latitude', 'pickup_longitude'], name='booking_pickup_coords_idx'),
+            models.Index(fields=['dropoff_latitude', 'dropoff_longitude'], name='booking_dropoff_coords_idx'),
+            models.Index(fields=['driver', 'status', 'created_at'], condition=Q(is_deleted=False), name='booking_driver_status_idx'),
+            models.Index(fields=['passenger', 'status'], condition=Q(is_deleted=False), name='booking_passenger_status_idx'),
+            models.Index(fields=['status', 'created_at'], condition=Q(is_deleted=False), name='booking_live_status_idx'),
+            models.Index(fields=['pickup_time'], condition=Q(is_deleted=False), name='booking_live_pickup_time_idx'),
+            models.Index(fields=['fare'], condition=Q(is_deleted=False), name='booking_live_fare_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['vehicle'],
+                condition=Q(status__in=('PENDING', 'ACCEPTED', 'ONGOING')),
+                name='booking_one_active_per_vehicle',
+            ),
+        ]
 
     def soft_delete(self):
-        self.is_deleted = True
-        self.save(update_fields=['is_deleted'])
+        Booking.all_objects.filter(pk=self.pk).soft_delete()
+        self.refresh_from_db(fields=['status', 'is_deleted', 'updated_at'])
+
+    def sync_coordinates(self):
+        """Copy the geolocation strings into the indexed numeric columns."""
+        self.pickup_latitude, self.pickup_longitude = parse_geolocation(self.pickup_geolocation) or (None, None)
+        self.dropoff_latitude, self.dropoff_longitude = parse_geolocation(self.dropoff_geolocation) or (None, None)
+
+    def save(self, *args, **kwargs):
+        self.sync_coordinates()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'pickup_geolocation' in update_fields:
+                update_fields |= {'pickup_latitude', 'pickup_longitude'}
+            if 'dropoff_geolocation' in update_fields:
+                update_fields |= {'dropoff_latitude', 'dropoff_longitude'}
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
 
     def __str__(self):
         try:
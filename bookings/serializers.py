@@ -2,8 +2,21 @@ from rest_framework import serializers
 from .models import Booking
 from users.serializers import UserSerializer
 from vehicles.serializers import VehicleSerializer
+from core.geo import parse_geolocation
 
-class BookingSerializer(serializers.ModelSerializer):
+class GeolocationValidationMixin:
+    def validate_pickup_geolocation(self, value):
+        if parse_geolocation(value) is None:
+            raise serializers.ValidationError("Expected 'latitude,longitude'.")
+        return value
+
+    def validate_dropoff_geolocation(self, value):
+        if parse_geolocation(value) is None:
+            raise serializers.ValidationError("Expected 'latitude,longitude'.")
+        return value
+
+
+class BookingSerializer(GeolocationValidationMixin, serializers.ModelSerializer):
     passenger_name = serializers.CharField(source='passenger.username', read_only=True)
     driver_name = serializers.CharField(source='driver.username', read_only=True, allow_null=True)
     vehicle_details = VehicleSerializer(source='vehicle', read_only=True, allow_null=True)
@@ -18,10 +31,25 @@ class BookingSerializer(serializers.ModelSerializer):
             'pickup_time', 'status', 'fare',
             'created_at', 'updated_at', 'is_deleted'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        # Status, driver and vehicle only change through the transition
+        # endpoints and dispatch, and deletion through DELETE, so updates
+        # cannot skip releasing the vehicle or publishing the change.
+        read_only_fields = ['id', 'driver', 'vehicle', 'status', 'created_at', 'updated_at', 'is_deleted']
 
 
 class BookingListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = ['id', 'passenger', 'status', 'fare', 'pickup_time', 'created_at', 'updated_at', 'is_deleted']
+
+
+class BookingBulkItemSerializer(GeolocationValidationMixin, serializers.ModelSerializer):
+    """One booking of a bulk request; the passenger, driver and vehicle are assigned by the view."""
+
+    class Meta:
+        model = Booking
+        fields = [
+            'pickup_location', 'pickup_geolocation',
+            'dropoff_location', 'dropoff_geolocation',
+            'pickup_time', 'fare',
+        ]
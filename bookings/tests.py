@@ -1,3 +1,555 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import io
+import tracemalloc
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.authentication import ClaimsRefreshToken
+from core.events import InProcessBroker, booking_channel, booking_event, event_stream, get_broker
+from core.geo import haversine_km
+from users.models import User
+from vehicles.dispatch import vehicle_index
+from vehicles.models import Vehicle
+
+from .models import Booking
+
+
+def bearer(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'}
+
+
+class BookingTestCase(TestCase):
+    def setUp(self):
+        vehicle_index.clear()
+        self.passenger = User.objects.create_user('passenger', role='PASSENGER')
+        self.driver = User.objects.create_user('driver', role='DRIVER')
+        self.vehicle = Vehicle.objects.create(
+            driver=self.driver, plate_number='ABC 123', current_geolocation='14.5995,120.9842',
+        )
+        # Real clients send no CSRF cookie; APIClient would skip the check.
+        self.client = Client(enforce_csrf_checks=True)
+
+    def booking_data(self, **overrides):
+        return {
+            'passenger': self.passenger.pk,
+            'pickup_location': 'Rizal Park',
+            'pickup_geolocation': '14.5995,120.9842',
+            'dropoff_location': 'UP Diliman',
+            'dropoff_geolocation': '14.6538,121.0685',
+            'pickup_time': '2026-01-01T10:00:00Z',
+            'fare': '250.00',
+            **overrides,
+        }
+
+    def create_booking(self, user=None, **overrides):
+        return self.client.post(
+            '/api/bookings/', self.booking_data(**overrides), content_type='application/json',
+            **bearer(user or self.passenger),
+        )
+
+
+class BookingCreateTests(BookingTestCase):
+    def test_create_with_bearer_token_needs_no_csrf_token(self):
+        response = self.create_booking()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['vehicle'], self.vehicle.pk)
+        self.assertEqual(Booking.objects.get().status, 'PENDING')
+
+    def test_detail_write_needs_no_csrf_token(self):
+        booking_id = self.create_booking().json()['id']
+        response = self.client.patch(
+            f'/api/bookings/{booking_id}/', {'dropoff_location': 'Quezon City'},
+            content_type='application/json', **bearer(self.passenger),
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Booking.objects.get().dropoff_location, 'Quezon City')
+
+
+@override_settings(ROOT_URLCONF='core.asgi_urls')
+class AsyncBookingCreateTests(BookingCreateTests):
+    """The same checks against the async views the ASGI application mounts."""
+
+
+class BookingUpdateTests(BookingTestCase):
+    def test_patch_cannot_change_status_driver_or_vehicle(self):
+        booking_id = self.create_booking().json()['id']
+        self.client.post(f'/api/bookings/{booking_id}/cancel/', **bearer(self.passenger))
+        # Re-book the released vehicle, then try to reopen the cancelled booking.
+        self.assertEqual(self.create_booking().json()['vehicle'], self.vehicle.pk)
+        response = self.client.patch(
+            f'/api/bookings/{booking_id}/',
+            {'status': 'PENDING', 'vehicle': None, 'driver': None, 'is_deleted': True},
+            content_type='application/json', **bearer(self.passenger),
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        booking = Booking.objects.get(pk=booking_id)
+        self.assertEqual(
+            (booking.status, booking.vehicle_id, booking.driver_id, booking.is_deleted),
+            ('CANCELLED', self.vehicle.pk, self.driver.pk, False),
+        )
+
+
+class BookingExportTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+
+    def add_bookings(self, count, **fields):
+        pickup_time = timezone.now()
+        Booking.objects.bulk_create(
+            Booking(
+                passenger=self.passenger,
+                **{
+                    'pickup_location': f'Pickup {i}',
+                    'dropoff_location': f'Dropoff {i}',
+                    'pickup_time': pickup_time + timedelta(minutes=i),
+                    'status': 'COMPLETED',
+                    'fare': '250.00',
+                    **fields,
+                },
+            )
+            for i in range(count)
+        )
+
+    def export(self, format='csv'):
+        return self.client.get('/api/bookings/export/', {'format': format}, **bearer(self.admin))
+
+    def measure_export(self):
+        response = self.export()
+        self.assertEqual(response.status_code, 200)
+        tracemalloc.start()
+        lines = 0
+        for chunk in response.streaming_content:
+            lines += chunk.count(b'\n')
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return lines, peak
+
+    @override_settings(EXPORT_CHUNK_SIZE=500)
+    def test_memory_does_not_grow_with_rows(self):
+        self.add_bookings(2000)
+        lines, small_peak = self.measure_export()
+        self.assertEqual(lines, 2001)
+
+        self.add_bookings(18000)
+        lines, large_peak = self.measure_export()
+        self.assertEqual(lines, 20001)
+        # Ten times the rows; a buffered export would peak about ten times higher.
+        self.assertLess(large_peak, small_peak * 2)
+        # And a fixed ceiling: streamed, 20k rows peak just under 1 MB, while
+        # the CSV alone would take several MB if it were built up in memory.
+        self.assertLess(large_peak, 4 * 1024 * 1024)
+
+    def test_formula_cells_are_neutralized(self):
+        self.add_bookings(1, pickup_location='=HYPERLINK("http://x")')
+        body = b''.join(self.export().streaming_content).decode()
+        row = list(csv.DictReader(io.StringIO(body)))[0]
+        self.assertEqual(row['pickup_location'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(row['dropoff_location'], 'Dropoff 0')
+
+    def test_errors_are_json(self):
+        response = self.client.get('/api/bookings/export/', {'format': 'csv'}, **bearer(self.passenger))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
+
+    async def test_streams_from_an_async_iterator_under_asgi(self):
+        await Booking.objects.abulk_create(
+            Booking(passenger=self.passenger, pickup_location='a', dropoff_location='b',
+                    pickup_time=timezone.now(), fare='1.00')
+            for _ in range(3)
+        )
+        response = await AsyncClient().get(
+            '/api/bookings/export/', {'format': 'ndjson'},
+            headers={'Authorization': bearer(self.admin)['HTTP_AUTHORIZATION']},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(body.count(b'\n'), 3)
+
+
+class BookingQueryCountTests(BookingTestCase):
+    def add_trips(self, count):
+        for i in range(count):
+            passenger = User.objects.create_user(f'rider{self.trips}', role='PASSENGER')
+            driver = User.objects.create_user(f'driver{self.trips}', role='DRIVER')
+            vehicle = Vehicle.objects.create(driver=driver, plate_number=f'TRP {self.trips}')
+            Booking.objects.create(
+                passenger=passenger, driver=driver, vehicle=vehicle, pickup_location='a',
+                dropoff_location='b', pickup_time=timezone.now(), fare='100.00',
+            )
+            self.trips += 1
+
+    def setUp(self):
+        super().setUp()
+        self.trips = 0
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+        self.add_trips(2)
+        # Caches the token's auth state, which the first request loads.
+        self.client.get('/api/bookings/', **bearer(self.admin))
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        # COUNT for the page links and one SELECT for the page.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/bookings/', **bearer(self.admin)).status_code, 200)
+        self.add_trips(10)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/bookings/', **bearer(self.admin))
+        self.assertEqual(response.json()['count'], 12)
+
+    def test_detail_queries(self):
+        booking = Booking.objects.first()
+        # The version row for the ETag, then the booking.
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/bookings/{booking.pk}/', **bearer(self.admin))
+        self.assertEqual(response.status_code, 200)
+
+
+class BookingDispatchTests(BookingTestCase):
+    def test_create_skips_vehicle_held_by_an_active_booking(self):
+        # The vehicle is marked available, but a booking still holds it.
+        Booking.objects.create(
+            passenger=self.passenger, driver=self.driver, vehicle=self.vehicle,
+            pickup_time=timezone.now(), status='ACCEPTED',
+        )
+        other_driver = User.objects.create_user('other-driver', role='DRIVER')
+        other = Vehicle.objects.create(
+            driver=other_driver, plate_number='XYZ 789', current_geolocation='14.6010,120.9850',
+        )
+        response = self.create_booking()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['vehicle'], other.pk)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'ON_TRIP')
+        self.assertNotIn(self.vehicle.pk, vehicle_index)
+
+    def test_destroy_cancels_and_releases_vehicle(self):
+        booking_id = self.create_booking().json()['id']
+        response = self.client.delete(f'/api/bookings/{booking_id}/', **bearer(self.passenger))
+        self.assertEqual(response.status_code, 204, response.content)
+        booking = Booking.all_objects.get(pk=booking_id)
+        self.assertEqual((booking.status, booking.is_deleted), ('CANCELLED', True))
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'AVAILABLE')
+        # The hidden booking no longer holds the vehicle.
+        response = self.create_booking()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['vehicle'], self.vehicle.pk)
+
+    def test_bulk_soft_delete_cancels_filtered_bookings(self):
+        booking_id = self.create_booking().json()['id']
+        self.assertEqual(Booking.objects.filter(status='PENDING').soft_delete(), 1)
+        self.assertEqual(Booking.all_objects.get(pk=booking_id).status, 'CANCELLED')
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'AVAILABLE')
+
+
+class BookingTransitionTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(
+            passenger=self.passenger, driver=self.driver, vehicle=self.vehicle,
+            pickup_time=timezone.now(), fare='100.00',
+        )
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(status='ON_TRIP')
+
+    def act(self, action, user, booking=None):
+        booking = booking or self.booking
+        return self.client.post(f'/api/bookings/{booking.pk}/{action}/', **bearer(user))
+
+    def test_legal_transitions_run_to_completion(self):
+        for action, status in (('accept', 'ACCEPTED'), ('start', 'ONGOING'), ('complete', 'COMPLETED')):
+            response = self.act(action, self.driver)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(response.json()['status'], status)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'AVAILABLE')
+
+    def test_illegal_transitions_are_refused(self):
+        for action in ('start', 'complete'):
+            response = self.act(action, self.driver)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Only ONGOING bookings can be completed'})
+        Booking.objects.filter(pk=self.booking.pk).apply_transition('cancel')
+        for action in ('accept', 'cancel'):
+            self.assertEqual(self.act(action, self.driver).status_code, 400)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'CANCELLED')
+
+    def test_forbidden_is_told_apart_from_invalid_status(self):
+        other_driver = User.objects.create_user('other-driver', role='DRIVER')
+        stranger = User.objects.create_user('stranger', role='PASSENGER')
+        response = self.act('accept', other_driver)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'error': 'Only assigned driver can accept'})
+        self.assertEqual(self.act('accept', self.passenger).status_code, 403)
+        self.assertEqual(self.act('cancel', stranger).status_code, 403)
+        # The actor check comes first, whatever the status.
+        self.assertEqual(self.act('complete', other_driver).status_code, 403)
+        self.assertEqual(self.client.post('/api/bookings/0/accept/', **bearer(self.driver)).status_code, 404)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'PENDING')
+
+        response = self.act('cancel', self.passenger)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['status'], 'CANCELLED')
+
+    def test_bulk_cancel_releases_every_vehicle(self):
+        vehicles = [self.vehicle]
+        for n, status in enumerate(('ACCEPTED', 'ONGOING', 'COMPLETED')):
+            driver = User.objects.create_user(f'driver{n}', role='DRIVER')
+            vehicle = Vehicle.objects.create(
+                driver=driver, plate_number=f'BLK {n}', current_geolocation='14.5995,120.9842', status='ON_TRIP',
+            )
+            Booking.objects.create(
+                passenger=self.passenger, driver=driver, vehicle=vehicle, pickup_time=timezone.now(),
+                fare='100.00', status=status,
+            )
+            vehicles.append(vehicle)
+        vehicle_index.load([])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Booking.objects.apply_transition('cancel'), 3)
+        self.assertEqual(
+            sorted(Booking.objects.values_list('status', flat=True)), ['CANCELLED'] * 3 + ['COMPLETED'],
+        )
+        statuses = dict(Vehicle.objects.values_list('pk', 'status'))
+        self.assertEqual([statuses[vehicle.pk] for vehicle in vehicles], ['AVAILABLE'] * 3 + ['ON_TRIP'])
+        self.assertEqual({vehicle.pk for vehicle in vehicles[:3]}, set(vehicle_index._entries))
+
+
+class BookingIndexTests(BookingTestCase):
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # A handful of rows is cheaper to scan; make the planner show its choice.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn(index_name, queryset.explain())
+
+    def test_live_filters_use_partial_indexes(self):
+        self.assertUsesIndex(
+            Booking.objects.filter(status='PENDING').order_by('-created_at'), 'booking_live_status_idx',
+        )
+        self.assertUsesIndex(
+            Booking.objects.filter(driver=self.driver, status='COMPLETED').order_by('-created_at'),
+            'booking_driver_status_idx',
+        )
+        self.assertUsesIndex(
+            Booking.objects.filter(passenger=self.passenger, status='PENDING'), 'booking_passenger_status_idx',
+        )
+        self.assertUsesIndex(
+            Booking.objects.filter(pickup_time__gte=timezone.now()), 'booking_live_pickup_time_idx',
+        )
+
+    def test_ordering_fields_are_indexed(self):
+        self.assertUsesIndex(Booking.objects.order_by('fare'), 'booking_live_fare_idx')
+        self.assertUsesIndex(Booking.objects.order_by('-pickup_time'), 'booking_live_pickup_time_idx')
+
+
+class BookingGeoTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pickups = {
+            'park': '14.5995,120.9842',
+            'intramuros': '14.5896,120.9747',
+            'makati': '14.5547,121.0244',
+            'diliman': '14.6538,121.0685',
+        }
+        self.bookings = {
+            name: Booking.objects.create(
+                passenger=self.passenger, pickup_location=name, pickup_geolocation=geolocation,
+                dropoff_location='b', dropoff_geolocation='14.6538,121.0685', pickup_time=timezone.now(), fare='100.00',
+            )
+            for name, geolocation in self.pickups.items()
+        }
+
+    def names(self, queryset):
+        return [booking.pickup_location for booking in queryset]
+
+    def test_within_bbox_includes_its_bounds(self):
+        # Intramuros sits exactly on the box's south-west corner.
+        inside = Booking.objects.within_bbox(14.5896, 120.9747, 14.60, 121.0).order_by('pk')
+        self.assertEqual(self.names(inside), ['park', 'intramuros'])
+        self.assertFalse(Booking.objects.within_bbox(14.5897, 120.9747, 14.60, 121.0).filter(
+            pk=self.bookings['intramuros'].pk,
+        ).exists())
+        dropoffs = Booking.objects.within_bbox(14.65, 121.06, 14.66, 121.07, point='dropoff')
+        self.assertEqual(dropoffs.count(), 4)
+
+    def test_near_sorts_by_distance(self):
+        nearby = Booking.objects.near(14.5995, 120.9842, radius_km=8).order_by('distance_km')
+        self.assertEqual(self.names(nearby), ['park', 'intramuros', 'makati'])
+        for booking in nearby:
+            expected = haversine_km(14.5995, 120.9842, *map(float, booking.pickup_geolocation.split(',')))
+            self.assertAlmostEqual(booking.distance_km, expected, delta=expected * 0.01 + 1e-9)
+        # The bounding box's corners are farther than the radius and left out.
+        self.assertEqual(self.names(Booking.objects.near(14.5995, 120.9842, radius_km=1.5)), ['park'])
+
+    def test_backfill_migration_parses_geolocations(self):
+        migration = importlib.import_module('bookings.migrations.0008_backfill_booking_coordinates')
+        self.assertEqual(migration.parse('14.5995, 120.9842'), (14.5995, 120.9842))
+        for malformed in ('', '0,0,0', 'north,east', '91,0', '0,181', None):
+            self.assertEqual(migration.parse(malformed), (None, None))
+
+        Booking.objects.filter(pk=self.bookings['park'].pk).update(dropoff_geolocation='not a place')
+        Booking.objects.update(
+            pickup_latitude=None, pickup_longitude=None, dropoff_latitude=None, dropoff_longitude=None,
+        )
+        migration.backfill_coordinates(apps, None)
+        park = Booking.objects.get(pk=self.bookings['park'].pk)
+        self.assertEqual((park.pickup_latitude, park.pickup_longitude), (14.5995, 120.9842))
+        self.assertEqual((park.dropoff_latitude, park.dropoff_longitude), (None, None))
+        makati = Booking.objects.get(pk=self.bookings['makati'].pk)
+        self.assertEqual((makati.dropoff_latitude, makati.dropoff_longitude), (14.6538, 121.0685))
+
+
+class BookingCursorTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        created_at = timezone.now()
+        Booking.objects.bulk_create(
+            Booking(passenger=self.passenger, pickup_location=f'Pickup {i}', dropoff_location='UP Diliman',
+                    pickup_time=created_at)
+            for i in range(7)
+        )
+        # Five rows share one created_at: only the id can tell them apart.
+        ids = sorted(Booking.objects.values_list('pk', flat=True))
+        Booking.objects.filter(pk__in=ids[:5]).update(created_at=created_at)
+        Booking.objects.filter(pk__in=ids[5:]).update(created_at=created_at + timedelta(seconds=1))
+        self.expected = list(Booking.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def get(self, url):
+        response = self.client.get(url, **bearer(self.passenger))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pages_split_ties_on_id(self):
+        page = self.get('/api/bookings/?pagination=cursor&page_size=2')
+        seen, pages = [], []
+        while True:
+            pages.append([row['id'] for row in page['results']])
+            seen += pages[-1]
+            if not page['next']:
+                break
+            page = self.get(page['next'])
+        self.assertEqual(seen, self.expected)
+
+        # And back again through the previous links.
+        back = []
+        while page['previous']:
+            page = self.get(page['previous'])
+            back.append([row['id'] for row in page['results']])
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_pages_are_range_scans(self):
+        first = self.get('/api/bookings/?pagination=cursor&page_size=2')
+        with CaptureQueriesContext(connection) as queries:
+            self.get(first['next'])
+        page_query = queries.captured_queries[-1]['sql']
+        self.assertNotIn('OFFSET', page_query)
+        self.assertIn('"created_at" <=', page_query)
+
+    def test_malformed_cursor_is_not_found(self):
+        response = self.client.get('/api/bookings/?cursor=cD1nYXJiYWdl', **bearer(self.passenger))
+        self.assertEqual(response.status_code, 404)
+
+
+class BookingEventTests(BookingTestCase):
+    def published(self):
+        return mock.patch.object(get_broker(), 'publish')
+
+    def test_create_publishes_on_commit(self):
+        with self.published() as publish, self.captureOnCommitCallbacks(execute=True):
+            booking_id = self.create_booking().json()['id']
+            publish.assert_not_called()
+        channel, event = publish.call_args.args
+        self.assertEqual(channel, booking_channel(booking_id))
+        self.assertEqual((event['booking'], event['status'], event['final']), (booking_id, 'PENDING', False))
+
+    def test_bulk_create_publishes_every_booking(self):
+        Vehicle.objects.create(
+            driver=User.objects.create_user('other-driver', role='DRIVER'),
+            plate_number='XYZ 789', current_geolocation='14.6010,120.9850',
+        )
+        with self.published() as publish, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/bookings/bulk/', [self.booking_data(), self.booking_data()],
+                content_type='application/json', **bearer(self.passenger),
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        created = {row['id'] for row in response.json()['created']}
+        self.assertEqual({call.args[0] for call in publish.call_args_list}, {booking_channel(pk) for pk in created})
+
+    def published_statuses(self, publish):
+        return sorted((event['booking'], event['status']) for _, event in (call.args for call in publish.call_args_list))
+
+    def test_transitions_publish_once_each(self):
+        booking_id = self.create_booking().json()['id']
+        with self.published() as publish, self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/bookings/{booking_id}/accept/', **bearer(self.driver))
+            # Refused transitions move nothing and publish nothing.
+            self.client.post(f'/api/bookings/{booking_id}/complete/', **bearer(self.driver))
+        self.assertEqual(self.published_statuses(publish), [(booking_id, 'ACCEPTED')])
+
+    def test_soft_delete_publishes_the_cancellation_of_active_bookings(self):
+        active = Booking.objects.get(pk=self.create_booking().json()['id'])
+        done = Booking.objects.create(
+            passenger=self.passenger, pickup_location='a', dropoff_location='b',
+            pickup_time=timezone.now(), status='COMPLETED',
+        )
+        with self.published() as publish, self.captureOnCommitCallbacks(execute=True):
+            # As the admin's bulk delete action does.
+            Booking.objects.filter(pk__in=[active.pk, done.pk]).soft_delete()
+        self.assertEqual(self.published_statuses(publish), [(active.pk, 'CANCELLED')])
+        self.assertTrue(publish.call_args.args[1]['final'])
+
+    def test_stale_booking_cancellation_publishes(self):
+        booking_id = self.create_booking(pickup_time='2020-01-01T10:00:00Z').json()['id']
+        with self.published() as publish, self.captureOnCommitCallbacks(execute=True):
+            call_command('cancel_stale_bookings', stdout=io.StringIO())
+        self.assertEqual(self.published_statuses(publish), [(booking_id, 'CANCELLED')])
+
+
+class BookingEventStreamLoadTests(SimpleTestCase):
+    streams = 5000
+
+    async def test_idle_streams_on_one_loop(self):
+        # A worker holds thousands of idle streams on its event loop while
+        # request threads publish to them.
+        broker = InProcessBroker(queue_size=8)
+        delivered = {}
+
+        async def listen(booking_id):
+            subscription = broker.subscribe(booking_channel(booking_id))
+            async for chunk in event_stream(subscription, keepalive=60):
+                delivered[booking_id] = chunk
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        listeners = [asyncio.create_task(listen(booking_id)) for booking_id in range(self.streams)]
+        while broker.subscriber_count() < self.streams:
+            await asyncio.sleep(0)
+        per_stream = (tracemalloc.get_traced_memory()[0] - before) / self.streams
+        tracemalloc.stop()
+        self.assertLess(per_stream, 32 * 1024)
+
+        def publish_all():
+            for booking_id in range(self.streams):
+                broker.publish(booking_channel(booking_id), booking_event(booking_id, 'CANCELLED'))
+
+        # A final event ends every stream and releases its subscription.
+        await asyncio.to_thread(publish_all)
+        await asyncio.wait_for(asyncio.gather(*listeners), 30)
+        self.assertEqual(len(delivered), self.streams)
+        self.assertTrue(all('"status": "CANCELLED"' in chunk for chunk in delivered.values()))
+        self.assertEqual(broker.subscriber_count(), 0)
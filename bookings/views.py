@@ -1,136 +1,299 @@
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import APIException
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from .models import Booking
-from .serializers import BookingSerializer, BookingListSerializer
-from vehicles.models import Vehicle
+from .serializers import BookingBulkItemSerializer, BookingSerializer, BookingListSerializer
+from .filters import BookingFilter
+from vehicles.dispatch import claim_nearest_vehicle, hold_vehicle
+from core.bulk import BulkCreateAPIView
+from core.export import ExportAPIView
+from core.async_views import AsyncDetailView, AsyncListView
+from core.authentication import JWTClaimsAuthentication
+from core.conditional import ConditionalDetailMixin
+from core.events import (
+    booking_channel, booking_event, event_stream, get_broker, payment_event, publish_on_commit,
+)
+from core.geo import parse_geolocation
+from core.throttling import ConcurrencyLimiter, IPTokenBucketThrottle, UserTokenBucketThrottle
+from idempotency.mixins import IdempotentCreateMixin
+from users.cache import invalidate_driver_earnings
 from rest_framework import serializers
 
 User = get_user_model()
 
-class BookingListCreateAPIView(generics.ListCreateAPIView):
+# Shared by the single and bulk create endpoints.
+booking_create_limiter = ConcurrencyLimiter('booking_create')
+
+def publish_created(booking):
+    publish_on_commit(
+        booking_channel(booking.pk), booking_event(booking.pk, booking.status, updated_at=booking.updated_at),
+    )
+
+
+class BookingListCreateAPIView(IdempotentCreateMixin, generics.ListCreateAPIView):
     queryset = Booking.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    filterset_class = BookingFilter
+    ordering_fields = ['created_at', 'pickup_time', 'fare', 'status']
+    throttle_scope = 'booking_create'
+    idempotency_scope = 'bookings'
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return BookingSerializer
         return BookingListSerializer
 
+    def get_throttles(self):
+        # Only creating a booking is throttled; listing is not.
+        return super().get_throttles() if self.request.method == 'POST' else []
+
+    def create(self, request, *args, **kwargs):
+        with booking_create_limiter.slot():
+            return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         passenger = self.request.user
-        available_driver = User.objects.filter(role='DRIVER').first()
-        available_vehicle = Vehicle.objects.filter(status='AVAILABLE').first()
-        
-        if not available_driver or not available_vehicle:
-            raise serializers.ValidationError("No available drivers or vehicles.")
-        
-        booking = serializer.save(
-            passenger=passenger,
-            driver=available_driver,
-            vehicle=available_vehicle,
-            status='PENDING'
-        )
-        available_vehicle.status = 'ON_TRIP'
-        available_vehicle.save()
-        return booking
-
-
-class BookingRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Booking.objects.filter(is_deleted=False)
+        pickup = parse_geolocation(serializer.validated_data.get('pickup_geolocation', '0,0'))
+
+        for _ in range(settings.DISPATCH_CLAIM_ROUNDS):
+            try:
+                # A savepoint per attempt: a failed insert rolls back its own
+                # claim and leaves the surrounding transaction usable.
+                with transaction.atomic():
+                    claimed = claim_nearest_vehicle(*pickup)
+                    if not claimed:
+                        break
+                    booking = serializer.save(
+                        passenger=passenger,
+                        driver_id=claimed.driver_id,
+                        vehicle_id=claimed.vehicle_id,
+                        status='PENDING'
+                    )
+                    publish_created(booking)
+                    return booking
+            except IntegrityError:
+                # booking_one_active_per_vehicle: the vehicle was marked available
+                # while it still had an active booking. Try the next one.
+                hold_vehicle(claimed.vehicle_id)
+        raise serializers.ValidationError("No available drivers or vehicles.")
+
+
+class BookingBulkCreateAPIView(BulkCreateAPIView):
+    queryset = Booking.objects.all()
+    serializer_class = BookingBulkItemSerializer
+    output_serializer_class = BookingListSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        with booking_create_limiter.slot():
+            return super().post(request, *args, **kwargs)
+
+    def build_instances(self, valid, errors):
+        # Every booking claims its own vehicle, exactly as a single POST would.
+        instances = {}
+        for index, data in valid.items():
+            claimed = claim_nearest_vehicle(*parse_geolocation(data.get('pickup_geolocation', '0,0')))
+            if not claimed:
+                errors[index] = {"non_field_errors": ["No available drivers or vehicles."]}
+                continue
+            booking = Booking(
+                passenger=self.request.user,
+                driver_id=claimed.driver_id,
+                vehicle_id=claimed.vehicle_id,
+                status='PENDING',
+                **data
+            )
+            booking.sync_coordinates()
+            instances[index] = booking
+        return instances
+
+    def perform_bulk_create(self, instances):
+        created = super().perform_bulk_create(instances)
+        for booking in created:
+            publish_created(booking)
+        return created
+
+
+class BookingExportAPIView(ExportAPIView):
+    queryset = Booking.objects.all()
+    permission_classes = [permissions.IsAdminUser]
+    filterset_class = BookingFilter
+    export_filename = 'bookings'
+    export_columns = (
+        ('id', 'id'),
+        ('passenger_id', 'passenger_id'),
+        ('passenger_username', 'passenger__username'),
+        ('driver_id', 'driver_id'),
+        ('driver_username', 'driver__username'),
+        ('vehicle_id', 'vehicle_id'),
+        ('vehicle_plate_number', 'vehicle__plate_number'),
+        ('pickup_location', 'pickup_location'),
+        ('pickup_latitude', 'pickup_latitude'),
+        ('pickup_longitude', 'pickup_longitude'),
+        ('dropoff_location', 'dropoff_location'),
+        ('dropoff_latitude', 'dropoff_latitude'),
+        ('dropoff_longitude', 'dropoff_longitude'),
+        ('pickup_time', 'pickup_time'),
+        ('status', 'status'),
+        ('fare', 'fare'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+
+class BookingRetrieveUpdateDestroyAPIView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Booking.objects.with_details()
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_fields = (
+        'updated_at', 'passenger__updated_at', 'driver__updated_at',
+        'vehicle__updated_at', 'vehicle__driver__updated_at',
+    )
+
+    def perform_update(self, serializer):
+        # The fare of a completed trip counts towards the driver's earnings.
+        booking = serializer.save()
+        invalidate_driver_earnings(booking.driver_id)
 
     def perform_destroy(self, instance):
         instance.soft_delete()
+        invalidate_driver_earnings(instance.driver_id)
+
+
+class BookingListCreateAsyncView(AsyncListView):
+    write_view = BookingListCreateAPIView
+    serializer_class = BookingListSerializer
+
+
+class BookingDetailAsyncView(AsyncDetailView):
+    write_view = BookingRetrieveUpdateDestroyAPIView
 
 
 class BookingActionBase(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    transition = None
+    forbidden_message = None
+    invalid_status_message = None
 
     def get_booking(self, pk):
         try:
-            return Booking.objects.get(pk=pk)
+            return Booking.objects.with_details().get(pk=pk)
         except Booking.DoesNotExist:
             return None
 
+    def actor_filter(self, user):
+        return Q(driver_id=user.pk)
+
+    def can_act(self, booking, user):
+        return booking.driver_id == user.pk
 
-class AcceptBookingAPIView(BookingActionBase):
     def post(self, request, pk):
+        actor = self.actor_filter(request.user)
+        moved = Booking.objects.filter(actor, pk=pk).apply_transition(self.transition)
+
         booking = self.get_booking(pk)
         if not booking:
             return Response({"error": "Booking not found"}, status=404)
-        if booking.driver != request.user:
-            return Response({"error": "Only assigned driver can accept"}, status=403)
-        if booking.status != 'PENDING':
-            return Response({"error": "Only PENDING bookings can be accepted"}, status=400)
-        booking.status = 'ACCEPTED'
-        booking.save()
+        if not moved:
+            if not self.can_act(booking, request.user):
+                return Response({"error": self.forbidden_message}, status=403)
+            return Response({"error": self.invalid_status_message}, status=400)
+        if self.transition == 'complete':
+            invalidate_driver_earnings(booking.driver_id)
         return Response(BookingSerializer(booking).data)
 
 
+class AcceptBookingAPIView(BookingActionBase):
+    transition = 'accept'
+    forbidden_message = "Only assigned driver can accept"
+    invalid_status_message = "Only PENDING bookings can be accepted"
+
+
 class StartBookingAPIView(BookingActionBase):
-    def post(self, request, pk):
-        booking = self.get_booking(pk)
-        if not booking:
-            return Response({"error": "Booking not found"}, status=404)
-        if booking.driver != request.user:
-            return Response({"error": "Only assigned driver can start"}, status=403)
-        if booking.status != 'ACCEPTED':
-            return Response({"error": "Only ACCEPTED bookings can be started"}, status=400)
-        booking.status = 'ONGOING'
-        booking.save()
-        return Response(BookingSerializer(booking).data)
+    transition = 'start'
+    forbidden_message = "Only assigned driver can start"
+    invalid_status_message = "Only ACCEPTED bookings can be started"
 
 
 class CompleteBookingAPIView(BookingActionBase):
-    def post(self, request, pk):
-        booking = self.get_booking(pk)
-        if not booking:
-            return Response({"error": "Booking not found"}, status=404)
-        if booking.driver != request.user:
-            return Response({"error": "Only assigned driver can complete"}, status=403)
-        if booking.status != 'ONGOING':
-            return Response({"error": "Only ONGOING bookings can be completed"}, status=400)
-        booking.status = 'COMPLETED'
-        booking.save()
-        if booking.vehicle:
-            booking.vehicle.status = 'AVAILABLE'
-            booking.vehicle.save()
-        return Response(BookingSerializer(booking).data)
+    transition = 'complete'
+    forbidden_message = "Only assigned driver can complete"
+    invalid_status_message = "Only ONGOING bookings can be completed"
 
 
 class CancelBookingAPIView(BookingActionBase):
-    def post(self, request, pk):
-        booking = self.get_booking(pk)
-        if not booking:
-            return Response({"error": "Booking not found"}, status=404)
-        if booking.passenger != request.user and booking.driver != request.user:
-            return Response({"error": "Only passenger or driver can cancel"}, status=403)
-        if booking.status in ['COMPLETED', 'CANCELLED']:
-            return Response({"error": "Cannot cancel this booking"}, status=400)
-        booking.status = 'CANCELLED'
-        booking.save()
-        if booking.vehicle:
-            booking.vehicle.status = 'AVAILABLE'
-            booking.vehicle.save()
-        return Response(BookingSerializer(booking).data)
+    transition = 'cancel'
+    forbidden_message = "Only passenger or driver can cancel"
+    invalid_status_message = "Cannot cancel this booking"
+
+    def actor_filter(self, user):
+        return Q(passenger_id=user.pk) | Q(driver_id=user.pk)
+
+    def can_act(self, booking, user):
+        return user.pk in (booking.passenger_id, booking.driver_id)
     
 class RestoreBookingAPIView(generics.UpdateAPIView):
     serializer_class = BookingSerializer
-    queryset = Booking.objects.all()
+    queryset = Booking.all_objects.with_details()
     permission_classes = [permissions.IsAuthenticated]
 
     def update(self, request, pk, *args, **kwargs):
         try:
-            booking = Booking.objects.get(pk=pk)
+            booking = Booking.all_objects.with_details().get(pk=pk)
         except Booking.DoesNotExist:
             return Response({"error": "Booking not found"}, status=404)
         
         if not booking.is_deleted:
             return Response({"error": "The booking is not deleted"}, status=400)
         
-        booking.is_deleted = False
-        booking.save()
-        return Response(BookingSerializer(booking).data)
\ No newline at end of file
+        booking.restore()
+        return Response(BookingSerializer(booking).data)
+
+
+async def booking_events(request, pk):
+    """
+    Server-Sent Events stream of a booking's status and payment changes.
+
+    The first event is the booking's current state; after that every
+    transition is pushed as it commits, so clients no longer poll the detail
+    endpoint. Only the passenger, the assigned driver and staff may listen.
+    Streams are held open on the event loop, so this is served by the ASGI
+    application only.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Event streams are served by the ASGI application"}, status=501)
+    try:
+        authenticated = await JWTClaimsAuthentication().aauthenticate(request)
+    except APIException as exc:
+        return JsonResponse({"error": str(exc.detail)}, status=exc.status_code)
+    if authenticated is None:
+        return JsonResponse({"error": "Authentication credentials were not provided."}, status=401)
+    user = authenticated[0]
+
+    # Subscribe before reading the snapshot so no transition falls in between.
+    subscription = get_broker().subscribe(booking_channel(pk))
+    booking = await Booking.objects.filter(pk=pk).values(
+        'passenger_id', 'driver_id', 'status', 'updated_at', 'payment__id', 'payment__status',
+    ).afirst()
+    if booking is None:
+        subscription.close()
+        return JsonResponse({"error": "Booking not found"}, status=404)
+    if not (user.is_staff or user.pk in (booking['passenger_id'], booking['driver_id'])):
+        subscription.close()
+        return JsonResponse({"error": "Only the passenger or driver can follow this booking"}, status=403)
+
+    initial = [booking_event(pk, booking['status'], updated_at=booking['updated_at'])]
+    if booking['payment__id'] is not None:
+        initial.append(payment_event(pk, booking['payment__id'], booking['payment__status']))
+    response = StreamingHttpResponse(event_stream(subscription, initial), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
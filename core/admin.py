@@ -0,0 +1,24 @@
+from django.contrib import admin
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """Lists deleted rows too and soft-deletes or restores a selection in one UPDATE."""
+    list_filter = ['is_deleted']
+    actions = ['soft_delete_selected', 'restore_selected']
+
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    @admin.action(description="Soft delete selected %(verbose_name_plural)s")
+    def soft_delete_selected(self, request, queryset):
+        count = queryset.soft_delete()
+        self.message_user(request, f"Soft deleted {count} row(s).")
+
+    @admin.action(description="Restore selected %(verbose_name_plural)s")
+    def restore_selected(self, request, queryset):
+        count = queryset.restore()
+        self.message_user(request, f"Restored {count} row(s).")
@@ -2,6 +2,7 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Booking event streams (/api/bookings/<pk>/events/) are only served through it.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -12,5 +13,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Read by the settings: persistent database connections are off under ASGI,
+# and the async views of core.asgi_urls are mounted.
+os.environ.setdefault('SERVER_INTERFACE', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,32 @@
+"""
+URL configuration of the ASGI application.
+
+The routes of core.urls, with the hot read paths and the password-hashing
+endpoints (login, registration and password change) answered by async views
+on the event loop. WSGI deployments keep core.urls: there an async view
+runs through async_to_sync and its writes hop sync -> async -> sync, which is
+slower than the DRF view and loses the browsable API.
+"""
+from django.urls import path
+
+from bookings.views import BookingDetailAsyncView, BookingListCreateAsyncView
+from users.views import ChangePasswordAsyncView, LoginAsyncView, UserProfileAsyncView, UserRegisterAsyncView
+from vehicles.views import AvailableVehiclesAsyncView
+
+from . import urls
+
+ASYNC_VIEWS = {
+    'booking-list-create': BookingListCreateAsyncView,
+    'booking-detail': BookingDetailAsyncView,
+    'vehicle-available': AvailableVehiclesAsyncView,
+    'user-profile': UserProfileAsyncView,
+    'token_obtain_pair': LoginAsyncView,
+    'user-register': UserRegisterAsyncView,
+    'user-change-password': ChangePasswordAsyncView,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name].as_view(), name=pattern.name)
+    if getattr(pattern, 'name', None) in ASYNC_VIEWS else pattern
+    for pattern in urls.urlpatterns
+]
@@ -0,0 +1,168 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework.views import exception_handler
+
+from .authentication import JWTClaimsAuthentication
+from .conditional import set_version_headers, version_headers
+
+
+def render_json(data, status=200, headers=None):
+    response = HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+class AsyncReadView(View):
+    """
+    Async GET in front of a DRF view.
+
+    GET is answered on the event loop: the JWT user, counts and rows are
+    loaded with the async ORM, while filtering, serialization and rendering
+    reuse the DRF configuration of ``write_view``. Every other method is handed
+    to ``write_view`` unchanged, so validation, permissions and writes keep a
+    single implementation.
+
+    Subclasses implement ``aget(request, *args, **kwargs)`` and return a
+    response. Authentication failures and DRF exceptions are rendered the way
+    DRF would. Attributes named in ``inherited_attributes`` that the subclass
+    does not set are read from ``write_view``.
+    """
+    write_view = None
+    throttle_classes = ()
+    inherited_attributes = (
+        'queryset', 'serializer_class', 'permission_classes', 'version_fields',
+        'filterset_class', 'filterset_fields', 'search_fields', 'ordering_fields', 'ordering',
+    )
+    http_method_names = ['get', 'post', 'put', 'patch', 'delete', 'head', 'options']
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # As APIView.as_view() does: the unsafe methods are handed to a DRF view,
+        # which applies CSRF itself to session-authenticated requests only.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.drf_request = Request(request, authenticators=[])
+
+    def __getattr__(self, name):
+        if name in type(self).inherited_attributes:
+            return getattr(self.write_view, name, None)
+        raise AttributeError(name)
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def get_serializer(self, *args, **kwargs):
+        return self.serializer_class(*args, context={'request': self.drf_request, 'view': self}, **kwargs)
+
+    async def authenticate(self):
+        if self.drf_request.authenticators:
+            # DRF's Request picked up APIClient.force_authenticate().
+            result = (self.drf_request.user, self.drf_request.auth)
+        else:
+            result = await JWTClaimsAuthentication().aauthenticate(self.request)
+            self.drf_request.user = result[0] if result else AnonymousUser()
+        for permission in self.permission_classes or drf_settings.DEFAULT_PERMISSION_CLASSES:
+            if not permission().has_permission(self.drf_request, self):
+                if result is None:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied()
+
+    async def check_throttles(self):
+        """Raise Throttled when any of ``throttle_classes`` refuses the request, as DRF's views do."""
+        throttles = [throttle() for throttle in self.throttle_classes]
+        waits = [throttle.wait() for throttle in throttles if not await throttle.aallow_request(self.drf_request, self)]
+        if waits:
+            raise exceptions.Throttled(max(waits))
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            await self.authenticate()
+            return await self.aget(request, *args, **kwargs)
+        except Http404:
+            return self.handle_exception(exceptions.NotFound())
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def aget(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def handle_exception(self, exc):
+        response = exception_handler(exc, {'request': self.drf_request, 'view': self})
+        headers = {name: value for name, value in response.headers.items() if name != 'Content-Type'}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            headers['WWW-Authenticate'] = JWTClaimsAuthentication().authenticate_header(self.drf_request)
+        return render_json(response.data, status=response.status_code, headers=headers)
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.write_view.as_view())(request, *args, **kwargs)
+
+    post = put = patch = delete = options = delegate
+
+
+class AsyncPostView(AsyncReadView):
+    """
+    An AsyncReadView whose POST is answered on the event loop as well.
+
+    The body is parsed with DRF's default parsers; subclasses implement
+    ``post(request)``.
+    """
+    http_method_names = ['post', 'options']
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.drf_request.parsers = [parser() for parser in drf_settings.DEFAULT_PARSER_CLASSES]
+
+
+class AsyncDetailView(AsyncReadView):
+    """Async retrieve with the conditional GET handling of ConditionalDetailMixin."""
+
+    async def aget(self, request, pk):
+        queryset = self.get_queryset().filter(pk=pk)
+        versions = await queryset.values_list(*self.version_fields).afirst()
+        if versions is None:
+            raise Http404
+        etag, last_modified = version_headers(versions)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        instance = await queryset.afirst()
+        if instance is None:
+            raise Http404
+        return set_version_headers(render_json(self.get_serializer(instance).data), etag, last_modified)
+
+
+class AsyncListView(AsyncReadView):
+    """Async list endpoint honouring the DRF filter backends and pagination."""
+    filter_backends = drf_settings.DEFAULT_FILTER_BACKENDS
+    pagination_class = drf_settings.DEFAULT_PAGINATION_CLASS
+
+    def filter_queryset(self, queryset):
+        # Filter backends only compose the query; nothing is evaluated here.
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.drf_request, queryset, self)
+        return queryset
+
+    async def list_data(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.pagination_class is None:
+            return self.get_serializer([obj async for obj in queryset], many=True).data
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, self.drf_request, self)
+        if page is None:
+            return self.get_serializer([obj async for obj in queryset], many=True).data
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data).data
+
+    async def aget(self, request, *args, **kwargs):
+        return render_json(await self.list_data())
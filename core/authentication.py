@@ -0,0 +1,226 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch, get_md5_hash_password
+
+# Claims copied from the user into every access token.
+USER_CLAIMS = ('role', 'is_staff')
+# Tokens issued before the user's token_version was last bumped are revoked;
+# tokens without the claim count as version 0.
+VERSION_CLAIM = 'token_version'
+AUTH_STATE_FIELDS = USER_CLAIMS + ('is_active', 'is_deleted', 'token_version')
+
+
+def _auth_state_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _revoked_key(jti):
+    return f'auth:revoked:{jti}'
+
+
+def _auth_state_query(user_id):
+    return get_user_model().all_objects.filter(pk=user_id).values(*AUTH_STATE_FIELDS)
+
+
+def token_status(user_id, jti):
+    """
+    The user's ``AUTH_STATE_FIELDS`` (an empty dict for a user that does not
+    exist) and whether the token ``jti`` was revoked on its own.
+
+    Both come from the cache in one round trip; the user's state is loaded and
+    cached for AUTH_STATE_CACHE_TTL seconds when missing.
+    """
+    keys = [_auth_state_key(user_id), _revoked_key(jti)]
+    found = cache.get_many(keys)
+    state = found.get(keys[0])
+    if state is None:
+        state = _auth_state_query(user_id).first() or {}
+        cache.set(keys[0], state, settings.AUTH_STATE_CACHE_TTL)
+    return state, keys[1] in found
+
+
+async def atoken_status(user_id, jti):
+    keys = [_auth_state_key(user_id), _revoked_key(jti)]
+    found = await cache.aget_many(keys)
+    state = found.get(keys[0])
+    if state is None:
+        state = await _auth_state_query(user_id).afirst() or {}
+        await cache.aset(keys[0], state, settings.AUTH_STATE_CACHE_TTL)
+    return state, keys[1] in found
+
+
+def invalidate_auth_states(user_ids):
+    cache.delete_many([_auth_state_key(user_id) for user_id in user_ids])
+
+
+def invalidate_auth_state(user_id):
+    invalidate_auth_states([user_id])
+
+
+def revoke_token(token):
+    """
+    Refuse ``token`` from now until it expires.
+
+    The jti is kept in the cache, so a shared cache is needed for the
+    revocation to reach every worker (system check core.W001 warns when it is
+    not); revoking all of a user's tokens with ``User.revoke_tokens`` is
+    stored in the database instead.
+    """
+    remaining = datetime_from_epoch(token['exp']) - timezone.now()
+    if remaining.total_seconds() > 0:
+        cache.set(_revoked_key(token[api_settings.JTI_CLAIM]), True, int(remaining.total_seconds()) + 1)
+
+
+def check_token_status(validated_token, state, revoked, check_claims=True):
+    if not state or state['is_deleted']:
+        raise exceptions.AuthenticationFailed(_("User not found"), code="user_not_found")
+    if not state['is_active']:
+        raise exceptions.AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    if revoked or validated_token.get(VERSION_CLAIM, 0) != state['token_version']:
+        raise exceptions.AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+    if check_claims and any(
+        claim in validated_token and validated_token[claim] != state[claim] for claim in USER_CLAIMS
+    ):
+        raise exceptions.AuthenticationFailed(
+            _("The user's role has changed; refresh the token."), code="stale_claims"
+        )
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """RefreshToken carrying the user's ``USER_CLAIMS`` and token version into its access tokens."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh that refuses revoked refresh tokens and stamps the user's current
+    claims into the new access token.
+    """
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        state, revoked = token_status(refresh[api_settings.USER_ID_CLAIM], refresh[api_settings.JTI_CLAIM])
+        check_token_status(refresh, state, revoked, check_claims=False)
+
+        data = super().validate(attrs)
+        access = self.token_class.access_token_class(data['access'])
+        for claim in USER_CLAIMS:
+            access[claim] = state[claim]
+        data['access'] = str(access)
+        return data
+
+
+class JWTClaimsAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that builds the user from the token's claims instead of
+    loading the user row.
+
+    The user is a ``User`` instance holding only the id and ``USER_CLAIMS``;
+    every other field is deferred and loaded on first access, so permission
+    checks, ORM filters and foreign key assignments cost no query. The token is
+    checked against ``token_status`` (one cache round trip), so revoked tokens
+    and users that were deactivated, deleted or had their role changed are
+    refused within AUTH_STATE_CACHE_TTL seconds, and at once when the change
+    invalidates the cached state. Tokens issued without the claims fall back
+    to loading the user.
+
+    ``aauthenticate`` does the same for async views.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        state, revoked = token_status(user_id, validated_token.get(api_settings.JTI_CLAIM))
+        check_token_status(validated_token, state, revoked)
+        if not self.has_claims(validated_token):
+            return super().get_user(validated_token)
+        return self.build_user(user_id, validated_token)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        state, revoked = await atoken_status(user_id, validated_token.get(api_settings.JTI_CLAIM))
+        check_token_status(validated_token, state, revoked)
+        if self.has_claims(validated_token):
+            return self.build_user(user_id, validated_token)
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise exceptions.AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise exceptions.AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return user
+
+    def has_claims(self, validated_token):
+        # Revocation by password hash needs the password, i.e. the user row.
+        return not api_settings.CHECK_REVOKE_TOKEN and all(claim in validated_token for claim in USER_CLAIMS)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def build_user(self, user_id, validated_token):
+        values = {
+            'id': int(user_id),
+            'is_active': True,
+            'is_deleted': False,
+            'token_version': validated_token.get(VERSION_CLAIM, 0),
+        }
+        values.update((claim, validated_token[claim]) for claim in USER_CLAIMS)
+        names = [f.attname for f in self.user_model._meta.concrete_fields if f.attname in values]
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def load_deferred_fields(user):
+    """Load every field a claims-built user deferred, in one query; returns ``user``."""
+    deferred = user.get_deferred_fields()
+    if deferred:
+        user.refresh_from_db(fields=deferred)
+    return user
+
+
+async def aload_deferred_fields(user):
+    deferred = user.get_deferred_fields()
+    if deferred:
+        await user.arefresh_from_db(fields=deferred)
+    return user
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+from rest_framework.response import Response
+
+
+class BulkCreateAPIView(generics.GenericAPIView):
+    """
+    Create many rows from a JSON array in one request.
+
+    Each item is validated on its own by ``serializer_class``, which should
+    not run per-row queries. ``build_instances`` then performs the set-based
+    checks for the valid items and returns unsaved instances keyed by item
+    index, recording anything it rejects in ``errors``. The instances are
+    inserted with ``bulk_create`` in the same transaction; if the insert
+    still violates a constraint, nothing is created and the response is 409.
+
+    The response lists the created rows (``output_serializer_class``) and the
+    errors of every rejected item by index. It is 201 when every item was
+    created, 207 when only some were, and 400 when none were.
+    """
+    output_serializer_class = None
+    pagination_class = None
+    filter_backends = ()
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a JSON array of items."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_MAX_ITEMS:
+            return Response(
+                {"error": f"At most {settings.BULK_MAX_ITEMS} items can be sent at once."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # One serializer validates every item, as ListSerializer does, so its
+        # fields are only built once.
+        serializer = self.get_serializer()
+        errors = {}
+        valid = {}
+        for index, item in enumerate(items):
+            try:
+                valid[index] = serializer.run_validation(item)
+            except ValidationError as exc:
+                errors[index] = as_serializer_error(exc)
+
+        try:
+            with transaction.atomic():
+                instances = self.build_instances(valid, errors) if valid else {}
+                created = self.perform_bulk_create(list(instances.values()))
+        except IntegrityError:
+            return Response(
+                {"error": "The items conflict with existing data; nothing was created."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({
+            "created": self.output_serializer_class(created, many=True).data,
+            "errors": [{"index": index, "errors": errors[index]} for index in sorted(errors)],
+        }, status=response_status)
+
+    def build_instances(self, valid, errors):
+        raise NotImplementedError
+
+    def perform_bulk_create(self, instances):
+        """Insert the instances; runs inside the request's transaction."""
+        return self.get_queryset().model.objects.bulk_create(instances)
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Cache backends whose entries only exist in the process that wrote them.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_CACHES
+
+
+@register()
+def check_token_revocation_cache(app_configs, **kwargs):
+    """
+    Revoking a single token (logout) is recorded only in the default cache,
+    so with a per-process cache the token stays valid on every other server
+    worker. Skipped under DEBUG, where the development server is one process.
+    """
+    if settings.DEBUG or not is_process_local('default'):
+        return []
+    return [
+        Warning(
+            "The default cache is not shared between processes, so a token revoked on logout is "
+            "still accepted by the other server workers until it expires.",
+            hint="Point CACHE_BACKEND/CACHE_LOCATION at a shared cache (Redis, Memcached, file).",
+            id='core.W001',
+        )
+    ]
+
+
+@register()
+def check_throttle_cache(app_configs, **kwargs):
+    """
+    The token buckets live in THROTTLE_CACHE; a per-process cache gives each
+    server worker its own buckets, so a client gets the rate once per worker.
+    """
+    if settings.DEBUG or not is_process_local(settings.THROTTLE_CACHE):
+        return []
+    return [
+        Warning(
+            f"THROTTLE_CACHE ({settings.THROTTLE_CACHE!r}) is not shared between processes, so each "
+            "server worker keeps its own buckets and clients get every rate once per worker.",
+            hint="Point THROTTLE_CACHE at a shared cache (Redis, Memcached, file).",
+            id='core.W002',
+        )
+    ]
@@ -0,0 +1,79 @@
+import hashlib
+
+from django.db import transaction
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def version_headers(timestamps):
+    """ETag and Last-Modified (epoch seconds) for a representation built from rows with these ``updated_at`` values."""
+    present = [ts for ts in timestamps if ts is not None]
+    digest = hashlib.md5('|'.join(ts.isoformat() if ts else '-' for ts in timestamps).encode()).hexdigest()
+    last_modified = int(max(present).timestamp()) if present else None
+    return quote_etag(digest), last_modified
+
+
+def set_version_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalDetailMixin:
+    """
+    Conditional requests for RetrieveUpdateDestroy views.
+
+    ``version_fields`` lists the ``updated_at`` of the object and of every
+    related row its serializer embeds. Those timestamps alone are read to
+    answer If-None-Match/If-Modified-Since with 304 before the object is
+    loaded, and to reject writes whose If-Match/If-Unmodified-Since no longer
+    holds with 412.
+    """
+    version_fields = ('updated_at',)
+
+    def get_versions(self, for_update=False):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        if for_update:
+            queryset = queryset.select_for_update(of=('self',))
+        versions = queryset.values_list(*self.version_fields).first()
+        if versions is None:
+            raise Http404
+        return versions
+
+    def has_write_preconditions(self, request):
+        return 'HTTP_IF_MATCH' in request.META or 'HTTP_IF_UNMODIFIED_SINCE' in request.META
+
+    def check_write_preconditions(self, request):
+        if not self.has_write_preconditions(request):
+            return None
+        etag, last_modified = version_headers(self.get_versions(for_update=True))
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = version_headers(self.get_versions())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_version_headers(super().retrieve(request, *args, **kwargs), etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            failed = self.check_write_preconditions(request)
+            if failed is not None:
+                return failed
+            response = super().update(request, *args, **kwargs)
+        if response.status_code < 300:
+            set_version_headers(response, *version_headers(self.get_versions()))
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            failed = self.check_write_preconditions(request)
+            if failed is not None:
+                return failed
+            return super().destroy(request, *args, **kwargs)
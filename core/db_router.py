@@ -0,0 +1,74 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+PIN_COOKIE = 'db_primary'
+
+
+def pin_to_primary():
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to a random ``settings.REPLICA_DATABASES`` alias and writes to
+    the primary.
+
+    Once the current request (or task) writes, its later reads go to the
+    primary too, so it always reads its own writes. Reads made while a
+    primary transaction is open stay on the primary as well, which keeps
+    ``select_for_update`` and read-then-write transactions on one database.
+    Replicas get their schema through replication, so only the primary is
+    migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware(MiddlewareMixin):
+    """
+    Start each request unpinned, except requests that are about to write and
+    clients that wrote within the last ``REPLICA_PIN_SECONDS``.
+
+    Unsafe methods read from the primary from the start, so their validation
+    reads agree with what they write. A request that wrote leaves a short-lived
+    cookie behind, so the client's next reads do not hit a replica that is
+    still catching up.
+    """
+
+    def process_request(self, request):
+        _pinned.set(request.method not in ('GET', 'HEAD', 'OPTIONS') or PIN_COOKIE in request.COOKIES)
+        _wrote.set(False)
+
+    def process_response(self, request, response):
+        if settings.REPLICA_DATABASES and _wrote.get():
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """One listener's bounded queue, bound to the event loop that created it."""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, event):
+        # Publishers run on request threads; hand the event to the loop's thread.
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.full():
+            # A stalled client loses its oldest event rather than growing without bound.
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Fan-out pub/sub within a single worker process.
+
+    Replace it through ``settings.EVENT_BROKER`` with a broker exposing the same
+    ``subscribe``/``unsubscribe``/``publish`` methods (e.g. backed by Redis
+    pub/sub) when events must cross processes.
+    """
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or settings.EVENT_QUEUE_SIZE
+        self._channels = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # The subscriber's event loop has shut down.
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENT_BROKER)()
+    return _broker
+
+
+def publish_on_commit(channel, event):
+    """Publish once the surrounding transaction commits, so listeners never see rolled-back changes."""
+    transaction.on_commit(lambda: get_broker().publish(channel, event))
+
+
+def booking_channel(booking_id):
+    return f'booking:{booking_id}'
+
+
+def booking_event(booking_id, status, **extra):
+    """
+    Payload for a booking's status change.
+
+    ``final`` marks the last event a booking stream will carry: a cancelled
+    booking never changes again.
+    """
+    return {'type': 'booking', 'booking': booking_id, 'status': status, 'final': status == 'CANCELLED', **extra}
+
+
+def payment_event(booking_id, payment_id, status, **extra):
+    """Payload for a payment's status change; a settled payment closes its booking's stream."""
+    return {
+        'type': 'payment', 'booking': booking_id, 'payment': payment_id,
+        'status': status, 'final': status in ('Completed', 'Failed'), **extra,
+    }
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def event_stream(subscription, initial=(), keepalive=None):
+    """
+    Server-Sent Events for one subscription.
+
+    ``initial`` events are sent first, then every published event until one is
+    marked ``final``. An SSE comment goes out after ``keepalive`` idle seconds
+    so proxies keep the connection open. The subscription is released however
+    the stream ends, including when the client disconnects.
+    """
+    keepalive = keepalive or settings.EVENT_KEEPALIVE
+    try:
+        for event in initial:
+            yield format_sse(event)
+            if event.get('final'):
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_sse(event)
+            if event.get('final'):
+                return
+    finally:
+        subscription.close()
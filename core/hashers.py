@@ -0,0 +1,139 @@
+import asyncio
+import base64
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+
+EXECUTOR_SETTINGS = ('PASSWORD_HASH_EXECUTOR', 'PASSWORD_HASH_WORKERS')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _derive(password, salt, iterations, digest_name):
+    # Runs in the executor's workers: only the standard library, so a spawned
+    # process does not need Django set up to run it.
+    key = hashlib.pbkdf2_hmac(digest_name, password.encode(), salt.encode(), iterations)
+    return base64.b64encode(key).decode('ascii').strip()
+
+
+def get_hash_executor():
+    """
+    The executor password key derivation runs on, per PASSWORD_HASH_EXECUTOR:
+    ``'process'`` for a pool of PASSWORD_HASH_WORKERS processes, ``'thread'``
+    for a thread pool, or None to hash on the calling thread.
+
+    The pool is created on first use in each worker process, so it is never
+    inherited across a server's fork.
+    """
+    global _executor
+    kind = settings.PASSWORD_HASH_EXECUTOR
+    if not kind:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            workers = settings.PASSWORD_HASH_WORKERS
+            if kind == 'process':
+                # Spawned rather than forked: the server's threads and
+                # connections are not copied into the workers.
+                _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            else:
+                _executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hash')
+        return _executor
+
+
+def shutdown_hash_executor():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@receiver(setting_changed)
+def reset_hash_executor(setting, **kwargs):
+    if setting in EXECUTOR_SETTINGS:
+        shutdown_hash_executor()
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2-SHA256 hasher with the iteration count taken from
+    PASSWORD_HASH_ITERATIONS and the key derivation run on the hashing
+    executor.
+
+    The algorithm name is unchanged, so existing hashes verify as before and
+    are re-encoded at the configured cost on the next successful login.
+    Synchronous callers wait for the executor; ``aencode`` lets async code
+    await it instead.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def derive_args(self, password, salt, iterations):
+        self._check_encode_args(password, salt)
+        return str(password), salt, iterations or self.iterations, self.digest().name
+
+    def format(self, salt, iterations, hash):
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
+
+    def encode(self, password, salt, iterations=None):
+        args = self.derive_args(password, salt, iterations)
+        executor = get_hash_executor()
+        hash = _derive(*args) if executor is None else executor.submit(_derive, *args).result()
+        return self.format(salt, args[2], hash)
+
+    async def aencode(self, password, salt, iterations=None):
+        args = self.derive_args(password, salt, iterations)
+        hash = await asyncio.get_running_loop().run_in_executor(get_hash_executor(), _derive, *args)
+        return self.format(salt, args[2], hash)
+
+    async def averify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = await self.aencode(password, decoded['salt'], decoded['iterations'])
+        return constant_time_compare(encoded, encoded_2)
+
+
+def _offloaded(hasher):
+    return isinstance(hasher, PBKDF2PasswordHasher)
+
+
+async def amake_password(password):
+    """make_password() for async code: awaits the hashing executor instead of blocking the loop."""
+    hasher = hashers.get_hasher()
+    if password is None or not _offloaded(hasher):
+        return await sync_to_async(hashers.make_password)(password)
+    return await hasher.aencode(password, hasher.salt())
+
+
+async def acheck_password(password, encoded, setter=None):
+    """
+    check_password() for async code: the key derivation is awaited on the
+    hashing executor, and ``setter`` is awaited with the password when the
+    stored hash needs upgrading.
+    """
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        hasher = None
+    if password is None or not hashers.is_password_usable(encoded) or not _offloaded(hasher):
+        # Unusable, unknown and legacy hashes, including the dummy hash run
+        # against timing attacks, take Django's path on a thread.
+        is_correct, must_update = await sync_to_async(hashers.verify_password)(password, encoded)
+    else:
+        is_correct = await hasher.averify(password, encoded)
+        preferred = hashers.get_hasher()
+        must_update = hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+    if setter and is_correct and must_update:
+        await setter(password)
+    return is_correct
@@ -1,33 +1,53 @@
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 
-class SoftDeleteManager(models.Manager):
+class SoftDeleteQuerySet(models.QuerySet):
+    def soft_delete(self):
+        return self.update(is_deleted=True, updated_at=timezone.now())
+
+    def restore(self):
+        return self.update(is_deleted=False, updated_at=timezone.now())
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
     def get_queryset(self):
-        return super().get_queryset().filter(deleted_at__isnull=True)
+        return super().get_queryset().filter(is_deleted=False)
 
     def all_with_deleted(self):
         return super().get_queryset()
 
     def only_deleted(self):
-        return super().get_queryset().filter(deleted_at__isnull=False)
+        return super().get_queryset().filter(is_deleted=True)
 
 
 class SoftDeleteModel(models.Model):
-    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
-    
+    """
+    Base for models that are flagged as deleted instead of removed.
+
+    ``objects`` only sees live rows; ``all_objects`` sees everything. Subclasses
+    are expected to define ``created_at`` and ``updated_at`` timestamps.
+    """
+    is_deleted = models.BooleanField(default=False)
+
     objects = SoftDeleteManager()
-    
+    all_objects = SoftDeleteQuerySet.as_manager()
+
     class Meta:
         abstract = True
-    
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=Q(is_deleted=False),
+                name='%(app_label)s_%(class)s_live_idx',
+            ),
+        ]
+
     def soft_delete(self):
-        self.deleted_at = timezone.now()
-        self.save(update_fields=['deleted_at'])
-    
+        self.is_deleted = True
+        self.save(update_fields=['is_deleted', 'updated_at'])
+
     def restore(self):
-        self.deleted_at = None
-        self.save(update_fields=['deleted_at'])
-    
-    def is_deleted(self):
-        return self.deleted_at is not None
+        self.is_deleted = False
+        self.save(update_fields=['is_deleted', 'updated_at'])
@@ -0,0 +1,174 @@
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination, Cursor, CursorPagination, PageNumberPagination, _reverse_ordering,
+)
+
+
+class StandardPageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not queryset.ordered:
+            queryset = queryset.order_by('-created_at', '-id')
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` with the count and the page fetched through the async ORM."""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        if not queryset.ordered:
+            queryset = queryset.order_by('-created_at', '-id')
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return [obj async for obj in self.page.object_list]
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id).
+
+    A cursor holds the (created_at, id) of the last row served, and the next
+    page is ``WHERE created_at <= c AND (created_at < c OR id < i)``: a range
+    scan of the live (created_at, id) index, so deep pages cost the same as
+    the first one and rows sharing a created_at are split on id, not skipped
+    over with an offset. An ``?ordering=`` other than the default falls back
+    to DRF's cursor on the first ordering field.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    keyset = ('-created_at', '-id')
+    ordering = keyset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.get_ordering(request, queryset, view) != self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.keyset
+        cursor = self.decode_cursor(request)
+        # Positions are unique, so DRF's link building never needs an offset.
+        self.cursor = cursor and Cursor(offset=0, reverse=cursor.reverse, position=cursor.position)
+        reverse, position = (self.cursor.reverse, self.cursor.position) if self.cursor else (False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if position is not None:
+            created_at, pk = self.decode_position(position)
+            if reverse:
+                after = Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=pk))
+            else:
+                after = Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+            queryset = queryset.filter(after)
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > self.page_size:
+            following = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous, self.previous_position = following is not None, following
+        else:
+            self.has_next, self.next_position = following is not None, following
+            self.has_previous, self.previous_position = position is not None, position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # DRF evaluates the keyset page in the middle of its cursor logic; run it
+        # in a worker thread, which is all the async ORM would do for the query.
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def decode_position(self, position):
+        created_at, _, pk = position.rpartition('|')
+        try:
+            created_at, pk = parse_datetime(created_at), int(pk)
+        except ValueError:
+            created_at = None
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def _get_position_from_instance(self, instance, ordering):
+        if tuple(ordering) != self.keyset:
+            return super()._get_position_from_instance(instance, ordering)
+        if isinstance(instance, dict):
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.pk
+        return f'{created_at.isoformat()}|{pk}'
+
+
+class FlexiblePagination(BasePagination):
+    """
+    Page-number pagination unless the client asks for cursor mode with
+    ``?pagination=cursor`` (or follows a link that already carries a cursor).
+    """
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.page_number = StandardPageNumberPagination()
+        self.cursor = CreatedAtCursorPagination()
+        self.active = self.page_number
+
+    def select(self, request):
+        wants_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor.cursor_query_param in request.query_params
+        )
+        self.active = self.cursor if wants_cursor else self.page_number
+        return self.active
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.select(request).paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return await self.select(request).apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.active.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number.get_schema_operation_parameters(view) + [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "Set to 'cursor' for keyset pagination on (created_at, id).",
+                'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+            },
+            *self.cursor.get_schema_operation_parameters(view),
+        ]
+
+    def to_html(self):
+        return self.active.to_html()
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.active, 'display_page_controls', False)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -45,10 +46,13 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
 
     # applications
+    'core',
     'bookings',
     'users',
     'payments',
     'vehicles',
+    'analytics',
+    'idempotency',
 ]
 
 MIDDLEWARE = [
@@ -59,12 +63,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db_router.PrimaryPinningMiddleware',
 ]
 
-ROOT_URLCONF = 'core.urls'
-SIMPLE_JWT = {
-    "ACCESS_TOKEN_LIFETIME": timedelta(days=10),
-}
+# core.asgi sets SERVER_INTERFACE=asgi. The ASGI application answers the hot
+# read paths and login with async views (core.asgi_urls); WSGI keeps the DRF
+# views, which it runs without an async_to_sync hop.
+SERVER_INTERFACE = os.environ.get('SERVER_INTERFACE', 'wsgi')
+ROOT_URLCONF = 'core.asgi_urls' if SERVER_INTERFACE == 'asgi' else 'core.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -86,13 +92,70 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite by default. Set DB_ENGINE=django.db.backends.postgresql (with
+# psycopg installed) and DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT for
+# PostgreSQL. Connections are kept for DB_CONN_MAX_AGE seconds and checked
+# before reuse, unless DB_POOL_MAX_SIZE turns on psycopg's connection pool
+# (PostgreSQL only), which replaces persistent connections.
+#
+# Under ASGI (SERVER_INTERFACE=asgi) DB_CONN_MAX_AGE defaults
+# to 0, as Django's deployment docs advise: ORM calls run on executor threads
+# outside the request's connection handling, so persistent connections pile
+# up per thread rather than being reused. Use DB_POOL_MAX_SIZE there instead.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3')
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 0 if SERVER_INTERFACE == 'asgi' else 60))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    # Single-node tuning, applied to every new connection: WAL lets readers run
+    # alongside the writer, synchronous=NORMAL is durable across application
+    # crashes in WAL mode, and writers queue for up to DB_BUSY_TIMEOUT seconds
+    # instead of failing with "database is locked". IMMEDIATE transactions take
+    # the write lock up front, so a transaction that reads before it writes
+    # cannot deadlock against another one and fail without waiting.
+    DATABASES['default']['OPTIONS'] = SQLITE_TUNED_OPTIONS = {
+        'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        'timeout': float(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+        'transaction_mode': 'IMMEDIATE',
+    }
+elif DB_POOL_MAX_SIZE:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+
+# Read replicas
+# DB_REPLICAS lists one replica per entry: a file path for SQLite, a host for
+# other engines; every other setting is shared with the primary. Safe reads
+# are spread over them; see core.db_router. Clients that wrote read from the
+# primary for REPLICA_PIN_SECONDS, which should exceed the replication lag.
+REPLICA_DATABASES = []
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{index}'
+    location = 'NAME' if DB_ENGINE == 'django.db.backends.sqlite3' else 'HOST'
+    DATABASES[alias] = {**DATABASES['default'], location: replica.strip(), 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -113,6 +176,30 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+AUTHENTICATION_BACKENDS = ['users.backends.ModelBackend']
+
+# Password hashing
+# PBKDF2-SHA256 as Django ships it, with a configurable cost. Hashes with a
+# different iteration count are re-encoded on the next successful login.
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 1_000_000))
+# Where the key derivation runs: 'thread' (a pool of PASSWORD_HASH_WORKERS
+# threads per server worker; hashlib releases the GIL while deriving, so
+# hashing runs alongside the request threads and off the event loop),
+# 'process' for a process pool, or '' for the request thread. The pools are
+# per server worker, so the total is PASSWORD_HASH_WORKERS times the number of
+# server workers: keep it small, and opt into 'process' only with that sum
+# sized to the cores left over from serving.
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -140,13 +227,112 @@ REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
     # or allow read-only access for unauthenticated users.
     'DEFAULT_AUTHENTICATION_CLASSES': (
-    
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'core.authentication.JWTClaimsAuthentication',
+    ),
+    'DEFAULT_FILTER_BACKENDS': (
+        'django_filters.rest_framework.DjangoFilterBackend',
+        'rest_framework.filters.SearchFilter',
+        'rest_framework.filters.OrderingFilter',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.FlexiblePagination',
+    'PAGE_SIZE': 20,
+    # Token buckets of core.throttling, per '<throttle_scope>.<user|ip>'. A
+    # rate of 'N/period' allows bursts of N requests and N per period on
+    # average.
+    'DEFAULT_THROTTLE_RATES': {
+        'booking_create.user': '30/min',
+        'booking_create.ip': '300/min',
+        'login.ip': '30/min',
+        'register.ip': '20/hour',
+    },
+}
+
+# Cache holding the throttle buckets; it must be shared by every worker for
+# the rates to apply per client rather than per process (system check
+# core.W002 warns when it is not).
+THROTTLE_CACHE = 'default'
+
+# Requests of a scope handled at once by one worker process; more are refused
+# with 429 and Retry-After: CONCURRENCY_RETRY_AFTER seconds. The limit is
+# deliberately per process, since it protects that worker's threads and
+# database connections: the service as a whole admits up to the limit times
+# the number of server workers, so size it against the database's capacity
+# divided by the worker count.
+CONCURRENCY_LIMITS = {
+    'booking_create': int(os.environ.get('BOOKING_CREATE_MAX_CONCURRENCY', 16)),
 }
+CONCURRENCY_RETRY_AFTER = 1
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
-    'UPDATE_LAST_LOGIN': True
+    # Logging in only reads the user row; last_login is not kept up to date.
+    'UPDATE_LAST_LOGIN': False,
+    # Access tokens carry the user's role and is_staff, so requests are
+    # authenticated without loading the user row.
+    'TOKEN_OBTAIN_SERIALIZER': 'core.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.ClaimsTokenRefreshSerializer',
+}
+
+# How long a user's role, is_staff, is_active, is_deleted and token version are
+# cached for checking tokens. Changes invalidate the cached copy, but with the
+# default per-process cache other workers can take this long to notice them.
+AUTH_STATE_CACHE_TTL = 30
+
+# Largest JSON array accepted by the bulk create endpoints.
+BULK_MAX_ITEMS = 10000
+
+# Rows fetched per round trip by the streaming CSV/NDJSON exports.
+EXPORT_CHUNK_SIZE = 2000
+
+# Idempotency keys
+# Responses to create requests sent with an Idempotency-Key header are
+# replayed for this long; expired keys are purged at most every
+# IDEMPOTENCY_PURGE_INTERVAL seconds per worker, or by purge_idempotency_keys.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_PURGE_INTERVAL = 60
+
+# Analytics
+# refresh_analytics re-reads rows updated up to this many seconds before its
+# previous run, so writes whose transactions were still open are not missed.
+ANALYTICS_WATERMARK_LAG = 60
+# Days rebuilt per transaction, so a long refresh does not hold the write lock.
+ANALYTICS_REFRESH_BATCH_DAYS = 7
+
+# Cache
+# Per-process memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (file, Redis, Memcached) so invalidations reach every worker.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'ridehail'),
+    }
 }
 
+# Upper bound on how long a cached available-vehicles page is served, which
+# also bounds staleness when another worker's invalidation cannot reach us.
+AVAILABLE_VEHICLES_CACHE_TTL = 30
+
+# How long a driver's earnings summary is cached; 0 turns the cache off.
+DRIVER_EARNINGS_CACHE_TTL = 300
+
+# Dispatch
+# Grid cell edge in degrees (0.005 is roughly 550 m), how many nearest vehicles
+# are considered per booking, and how far from the pickup a vehicle may be.
+DISPATCH_CELL_SIZE_DEGREES = 0.005
+DISPATCH_CANDIDATES = 5
+DISPATCH_MAX_DISTANCE_KM = None
+# Rounds of candidates tried when other requests claim them first, and how
+# often (seconds) each worker reloads its index to see other workers' changes.
+DISPATCH_CLAIM_ROUNDS = 3
+DISPATCH_INDEX_TTL = 30
+
+
+# Real-time events
+# Broker fanning booking/payment events out to SSE listeners. The default is
+# in-process, so listeners only hear events published by their own worker;
+# swap in a cross-process broker when running several. Each listener buffers
+# at most EVENT_QUEUE_SIZE events and gets a keepalive after EVENT_KEEPALIVE
+# idle seconds.
+EVENT_BROKER = 'core.events.InProcessBroker'
+EVENT_QUEUE_SIZE = 16
+EVENT_KEEPALIVE = 15
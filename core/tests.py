@@ -0,0 +1,287 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from bookings.models import Booking
+from bookings.views import BookingListCreateAPIView, BookingListCreateAsyncView, booking_create_limiter
+from users.models import User
+from users.views import LoginAPIView, LoginAsyncView
+from vehicles.dispatch import vehicle_index
+from vehicles.models import Vehicle
+
+from .authentication import ClaimsRefreshToken, JWTClaimsAuthentication
+from .db_router import PIN_COOKIE
+
+
+class URLConfTests(SimpleTestCase):
+    def view_class(self, path):
+        return resolve(path).func.view_class
+
+    def test_wsgi_routes_serve_drf_views(self):
+        self.assertIs(self.view_class('/api/bookings/'), BookingListCreateAPIView)
+        self.assertIs(self.view_class('/api/login/'), LoginAPIView)
+
+    @override_settings(ROOT_URLCONF='core.asgi_urls')
+    def test_asgi_routes_serve_async_views(self):
+        self.assertIs(self.view_class('/api/bookings/'), BookingListCreateAsyncView)
+        self.assertIs(self.view_class('/api/login/'), LoginAsyncView)
+        # Routes without an async view are shared.
+        self.assertEqual(resolve('/api/payments/').url_name, 'payment-list-create')
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The primary is the test database; the replica is a second SQLite file
+    copied from it, which then lags behind because nothing replicates to it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.replica = os.path.join(cls.directory.name, 'replica.sqlite3')
+        # The alias only exists for this class, so the runner cannot know
+        # about it up front; allow it once it is registered.
+        connections.settings['replica1'] = {**connections.settings['default'], 'NAME': cls.replica}
+        cls.databases = {*cls.databases, 'replica1'}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.settings['replica1']
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        vehicle_index.clear()
+        self.passenger = User.objects.create_user('rider', role='PASSENGER')
+        driver = User.objects.create_user('driver', role='DRIVER')
+        Vehicle.objects.create(driver=driver, plate_number='ABC 123', current_geolocation='14.5995,120.9842')
+        self.booking(status='COMPLETED')
+
+        connections['replica1'].close()
+        if os.path.exists(self.replica):
+            os.remove(self.replica)
+        with connections['default'].cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [self.replica])
+        replicas = override_settings(REPLICA_DATABASES=['replica1'])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+
+        # Only on the primary from here on.
+        self.booking(status='CANCELLED')
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(self.passenger).access_token}'}
+
+    def booking(self, **fields):
+        return Booking.objects.create(
+            passenger=self.passenger, pickup_location='a', dropoff_location='b', pickup_time=timezone.now(), **fields,
+        )
+
+    def listed(self, client):
+        response = client.get('/api/bookings/', **self.headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['count']
+
+    def test_reads_replica_writes_primary_and_pins_after_write(self):
+        client = Client()
+        self.assertEqual(self.listed(client), 1)
+        self.assertNotIn(PIN_COOKIE, client.cookies)
+
+        response = client.post('/api/bookings/', {
+            'passenger': self.passenger.pk, 'pickup_location': 'a', 'pickup_geolocation': '14.5995,120.9842',
+            'dropoff_location': 'b', 'dropoff_geolocation': '14.6538,121.0685',
+            'pickup_time': '2026-01-01T10:00:00Z',
+        }, content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Booking.objects.using('default').count(), 3)
+        self.assertEqual(Booking.objects.using('replica1').count(), 1)
+
+        # The writer's next read is pinned to the primary by the cookie ...
+        self.assertIn(PIN_COOKIE, client.cookies)
+        self.assertEqual(self.listed(client), 3)
+        # ... while other clients keep reading the replica.
+        self.assertEqual(self.listed(Client()), 1)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('rider', role='PASSENGER')
+        self.refresh = ClaimsRefreshToken.for_user(self.user)
+        self.client = Client()
+
+    def authenticate(self, access):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return JWTClaimsAuthentication().authenticate(request)[0]
+
+    def get(self, path, access):
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_cached_auth_state_costs_no_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate(self.refresh.access_token)
+        with self.assertNumQueries(0):
+            user = self.authenticate(self.refresh.access_token)
+        self.assertEqual((user.pk, user.role, user.is_staff), (self.user.pk, 'PASSENGER', False))
+
+    def test_permission_checks_cost_no_query(self):
+        access = self.refresh.access_token
+        self.authenticate(access)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/api/users/passengers/', access).status_code, 403)
+
+    def test_role_change_refuses_tokens_with_the_old_claims(self):
+        access = self.refresh.access_token
+        self.authenticate(access)
+        self.user.role = 'DRIVER'
+        self.user.save()
+
+        response = self.get('/api/users/profile/', access)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], "The user's role has changed; refresh the token.")
+        # A refresh stamps the current role into the new access token.
+        response = self.client.post('/api/refresh/', {'refresh': str(self.refresh)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.authenticate(response.json()['access']).role, 'DRIVER')
+
+    def test_deactivation_refuses_tokens(self):
+        access = self.refresh.access_token
+        self.authenticate(access)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.get('/api/users/profile/', access)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'User is inactive')
+        response = self.client.post('/api/refresh/', {'refresh': str(self.refresh)}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_revoking_tokens_refuses_tokens_issued_before(self):
+        access = self.refresh.access_token
+        self.authenticate(access)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.revoke_tokens()
+        self.assertEqual(self.get('/api/users/profile/', access).json()['detail'], 'Token has been revoked')
+        self.assertEqual(self.get('/api/users/profile/', ClaimsRefreshToken.for_user(self.user).access_token).status_code, 200)
+
+
+class ThrottleTests(TestCase):
+    rates = {'booking_create.user': '3/min', 'booking_create.ip': '5/min'}
+
+    def setUp(self):
+        cache.clear()
+        vehicle_index.clear()
+        self.rider = User.objects.create_user('rider', role='PASSENGER')
+        self.other = User.objects.create_user('other', role='PASSENGER')
+        for n in range(8):
+            driver = User.objects.create_user(f'driver{n}', role='DRIVER')
+            Vehicle.objects.create(driver=driver, plate_number=f'THR {n}', current_geolocation='14.5995,120.9842')
+        rates = mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, self.rates, clear=True)
+        rates.start()
+        self.addCleanup(rates.stop)
+        # Frozen, so the bucket never refills between requests.
+        clock = mock.patch('core.throttling.time.time', return_value=1_000_000.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def book(self, user, address='10.0.0.1'):
+        return Client(REMOTE_ADDR=address).post('/api/bookings/', {
+            'passenger': user.pk, 'pickup_location': 'a', 'pickup_geolocation': '14.5995,120.9842',
+            'dropoff_location': 'b', 'dropoff_geolocation': '14.6538,121.0685', 'pickup_time': '2026-01-01T10:00:00Z',
+        }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(user).access_token}')
+
+    def test_burst_past_the_limit_is_refused_with_retry_after(self):
+        self.assertEqual([self.book(self.rider).status_code for _ in range(3)], [201, 201, 201])
+        response = self.book(self.rider)
+        self.assertEqual(response.status_code, 429)
+        # A token comes back every 60 / 3 seconds.
+        self.assertEqual(response['Retry-After'], '20')
+
+    def test_user_and_address_buckets_are_independent(self):
+        for _ in range(4):
+            self.book(self.rider)
+        # The address has one request left; the other user's bucket is full.
+        self.assertEqual(self.book(self.other).status_code, 201)
+        self.assertEqual(self.book(self.other).status_code, 429)
+        self.assertEqual(self.book(self.other, address='10.0.0.2').status_code, 201)
+        # The rider stays refused from any address.
+        self.assertEqual(self.book(self.rider, address='10.0.0.3').status_code, 429)
+
+    @override_settings(CONCURRENCY_LIMITS={'booking_create': 1}, CONCURRENCY_RETRY_AFTER=1)
+    def test_full_concurrency_slots_refuse_requests(self):
+        with booking_create_limiter.slot():
+            response = self.book(self.rider)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(booking_create_limiter.active, 0)
+        self.assertEqual(self.book(self.other).status_code, 201)
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.passenger = User.objects.create_user('rider', role='PASSENGER')
+        self.driver = User.objects.create_user('driver', role='DRIVER')
+        self.vehicle = Vehicle.objects.create(driver=self.driver, plate_number='ABC 123')
+        self.booking = Booking.objects.create(
+            passenger=self.passenger, driver=self.driver, vehicle=self.vehicle, pickup_location='a',
+            dropoff_location='b', pickup_time=timezone.now(), fare='100.00',
+        )
+        self.url = f'/api/bookings/{self.booking.pk}/'
+        self.client = Client()
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(self.passenger).access_token}'}
+
+    def get(self, **headers):
+        return self.client.get(self.url, **self.headers, **headers)
+
+    def write(self, method, data=None, **headers):
+        return getattr(self.client, method)(self.url, data, content_type='application/json', **self.headers, **headers)
+
+    def test_unchanged_booking_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_etag_follows_the_embedded_driver_and_vehicle(self):
+        etag = self.get()['ETag']
+        self.driver.contact_info = '0917 000 0000'
+        self.driver.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.vehicle.plate_number = 'XYZ 789'
+        self.vehicle.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['vehicle_details']['plate_number'], 'XYZ 789')
+
+    def test_stale_if_match_refuses_writes(self):
+        stale = self.get()['ETag']
+        Booking.objects.filter(pk=self.booking.pk).update(dropoff_location='elsewhere', updated_at=timezone.now())
+        put = {
+            'passenger': self.passenger.pk, 'pickup_location': 'a', 'dropoff_location': 'c',
+            'pickup_time': '2026-01-01T10:00:00Z',
+        }
+        self.assertEqual(self.write('put', put, HTTP_IF_MATCH=stale).status_code, 412)
+        self.assertEqual(self.write('patch', {'dropoff_location': 'c'}, HTTP_IF_MATCH=stale).status_code, 412)
+        self.assertEqual(self.write('delete', HTTP_IF_MATCH=stale).status_code, 412)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.dropoff_location, self.booking.is_deleted), ('elsewhere', False))
+
+        current = self.get()['ETag']
+        response = self.write('patch', {'dropoff_location': 'c'}, HTTP_IF_MATCH=current)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotEqual(response['ETag'], current)
+        self.assertEqual(self.write('delete', HTTP_IF_MATCH=response['ETag']).status_code, 204)
@@ -0,0 +1,136 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'30/min'`` -> ``(30, 60)``: the bucket size and the seconds it takes to refill."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    A token bucket per client and ``throttle_scope`` of the view.
+
+    The rate is read from DEFAULT_THROTTLE_RATES under ``'<scope>.<kind>'``,
+    e.g. ``'booking_create.user': '30/min'``: the bucket holds 30 requests and
+    refills at 30 a minute, so a client can burst up to the limit and then
+    continues at the average rate. Scopes without a rate are not throttled.
+
+    Each bucket is a single timestamp in the THROTTLE_CACHE cache (the
+    theoretical arrival time of GCRA), read and written once per request. As
+    with DRF's own throttles there is no lock, so concurrent requests can
+    slip a few requests past the limit. Limits only hold across server
+    workers when that cache is shared.
+    """
+    kind = None
+
+    def get_ident_for(self, request):
+        """The client the bucket belongs to, or None to let the request through."""
+        raise NotImplementedError
+
+    def get_bucket(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}.{self.kind}') if scope else None
+        if rate is None:
+            return None
+        ident = self.get_ident_for(request)
+        if ident is None:
+            return None
+        return f'throttle:{scope}:{self.kind}:{ident}', *parse_rate(rate)
+
+    def next_arrival(self, arrival, count, period):
+        """The bucket's timestamp after this request, or None when the bucket is empty."""
+        now = time.time()
+        arrival = max(arrival or now, now) + period / count
+        if arrival - now > period:
+            self.retry_after = arrival - now - period
+            return None
+        return arrival
+
+    def allow_request(self, request, view):
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        key, count, period = bucket
+        cache = caches[settings.THROTTLE_CACHE]
+        arrival = self.next_arrival(cache.get(key), count, period)
+        if arrival is None:
+            return False
+        # A bucket left alone for a whole period is full again, like a missing one.
+        cache.set(key, arrival, period)
+        return True
+
+    async def aallow_request(self, request, view):
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        key, count, period = bucket
+        cache = caches[settings.THROTTLE_CACHE]
+        arrival = self.next_arrival(await cache.aget(key), count, period)
+        if arrival is None:
+            return False
+        await cache.aset(key, arrival, period)
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per authenticated user; anonymous requests are left to ``IPTokenBucketThrottle``."""
+    kind = 'user'
+
+    def get_ident_for(self, request):
+        user = request.user
+        return user.pk if user and user.is_authenticated else None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per client address, behind NUM_PROXIES proxies as DRF counts them."""
+    kind = 'ip'
+
+    def get_ident_for(self, request):
+        return self.get_ident(request)
+
+
+class ConcurrencyLimiter:
+    """
+    Admit at most ``CONCURRENCY_LIMITS[scope]`` requests of ``scope`` at once
+    in this process.
+
+    Requests over the limit are refused immediately with 429 and a
+    Retry-After of CONCURRENCY_RETRY_AFTER seconds, instead of queueing for
+    database connections and locks behind the requests already running. The
+    limit applies per server worker process. A scope without a limit is not
+    limited.
+    """
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.active = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        limit = settings.CONCURRENCY_LIMITS.get(self.scope)
+        with self._lock:
+            admitted = not limit or self.active < limit
+            if admitted:
+                self.active += 1
+        if not admitted:
+            raise exceptions.Throttled(wait=settings.CONCURRENCY_RETRY_AFTER)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
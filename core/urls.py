@@ -16,13 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 # Generic views from each app
 from bookings.views import *
 from vehicles.views import *
 from payments.views import *
 from users.views import *
+from analytics.views import *
 
 
 urlpatterns = [
@@ -31,21 +32,28 @@ urlpatterns = [
     
     # Bookings endpoints
     path('api/bookings/', BookingListCreateAPIView.as_view(), name='booking-list-create'),
+    path('api/bookings/bulk/', BookingBulkCreateAPIView.as_view(), name='booking-bulk-create'),
+    path('api/bookings/export/', BookingExportAPIView.as_view(), name='booking-export'),
     path('api/bookings/<int:pk>/', BookingRetrieveUpdateDestroyAPIView.as_view(), name='booking-detail'),
     path('api/bookings/<int:pk>/accept/', AcceptBookingAPIView.as_view(), name='booking-accept'),
     path('api/bookings/<int:pk>/start/', StartBookingAPIView.as_view(), name='booking-start'),
     path('api/bookings/<int:pk>/complete/', CompleteBookingAPIView.as_view(), name='booking-complete'),
     path('api/bookings/<int:pk>/cancel/', CancelBookingAPIView.as_view(), name='booking-cancel'),
     path('api/bookings/restore/<int:pk>/', RestoreBookingAPIView.as_view(), name='booking-restore'),
+    path('api/bookings/<int:pk>/events/', booking_events, name='booking-events'),
     
     # Vehicles endpoints
     path('api/vehicles/', VehicleListCreateAPIView.as_view(), name='vehicle-list-create'),
     path('api/vehicles/<int:pk>/', VehicleRetrieveUpdateDestroyAPIView.as_view(), name='vehicle-detail'),
     path('api/vehicles/available/', AvailableVehiclesAPIView.as_view(), name='vehicle-available'),
     path('api/vehicles/<int:pk>/status/', UpdateVehicleStatusAPIView.as_view(), name='vehicle-update-status'),
+    path('api/vehicles/<int:pk>/location/', UpdateVehicleLocationAPIView.as_view(), name='vehicle-update-location'),
     
     # Payments endpoints
     path('api/payments/', PaymentListCreateAPIView.as_view(), name='payment-list-create'),
+    path('api/payments/bulk/', PaymentBulkCreateAPIView.as_view(), name='payment-bulk-create'),
+    path('api/payments/settle/', SettlePaymentsAPIView.as_view(), name='payment-settle'),
+    path('api/payments/export/', PaymentExportAPIView.as_view(), name='payment-export'),
     path('api/payments/<int:pk>/', PaymentRetrieveUpdateDestroyAPIView.as_view(), name='payment-detail'),
     path('api/payments/<int:pk>/verify/', VerifyPaymentAPIView.as_view(), name='payment-verify'),
     path('api/payments/<int:pk>/reject/', RejectPaymentAPIView.as_view(), name='payment-reject'),
@@ -57,11 +65,18 @@ urlpatterns = [
     path('api/users/profile/', UserProfileAPIView.as_view(), name='user-profile'),
     path('api/users/change-password/', ChangePasswordAPIView.as_view(), name='user-change-password'),
     path('api/users/drivers/', DriverListAPIView.as_view(), name='user-drivers'),
+    path('api/users/drivers/<int:pk>/earnings/', DriverEarningsAPIView.as_view(), name='user-driver-earnings'),
     path('api/users/passengers/', PassengerListAPIView.as_view(), name='user-passengers'),
     path('api/passengers/', PassengerListAPIView.as_view(), name='passengers'),
 
-    path('api/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    # Analytics endpoints
+    path('api/analytics/revenue/', DailyRevenueAPIView.as_view(), name='analytics-revenue'),
+    path('api/analytics/bookings/', DailyBookingStatsAPIView.as_view(), name='analytics-bookings'),
+    path('api/analytics/drivers/', DailyDriverTripsAPIView.as_view(), name='analytics-drivers'),
+
+    path('api/login/', LoginAPIView.as_view(), name='token_obtain_pair'),
     path('api/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/logout/', LogoutAPIView.as_view(), name='token_logout'),
 ]
 
 
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from idempotency.mixins import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete the stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {purge_expired_keys()} expired idempotency key(s).")
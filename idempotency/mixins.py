@@ -0,0 +1,115 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+KEY_HEADER = 'Idempotency-Key'
+KEY_MAX_LENGTH = 255
+
+_purge_lock = threading.Lock()
+_next_purge = 0.0
+
+
+def request_fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def purge_expired_keys():
+    """Delete the keys older than IDEMPOTENCY_KEY_TTL; returns how many were deleted."""
+    return IdempotencyKey.objects.expired().delete()[0]
+
+
+def purge_expired_keys_on_commit():
+    """
+    Purge expired keys after the current transaction commits, at most once
+    every IDEMPOTENCY_PURGE_INTERVAL seconds per process.
+
+    This keeps the table at roughly the keys of the last TTL under any
+    sustained load, without a scheduled job.
+    """
+    global _next_purge
+    with _purge_lock:
+        now = time.monotonic()
+        if now < _next_purge:
+            return
+        _next_purge = now + settings.IDEMPOTENCY_PURGE_INTERVAL
+    transaction.on_commit(purge_expired_keys)
+
+
+class IdempotentCreateMixin:
+    """
+    Make ``create`` safe to retry with an ``Idempotency-Key`` header.
+
+    The first successful request with a key stores its response in the same
+    transaction as the created row. A retry by the same user with the same
+    key and data gets the stored response back, marked with an
+    ``Idempotent-Replayed: true`` header, and ``perform_create`` does not run
+    again. A concurrent duplicate loses on the key's unique constraint, is
+    rolled back and replays the winner's response. A key reused with
+    different data is refused with 422. Failed requests store nothing, so
+    they can be retried. Requests without the header are unaffected.
+    """
+    idempotency_scope = None
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(KEY_HEADER)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        if not 0 < len(key) <= KEY_MAX_LENGTH:
+            return Response(
+                {"error": f"{KEY_HEADER} must be 1 to {KEY_MAX_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        lookup = {'user_id': request.user.pk, 'scope': self.idempotency_scope, 'key': key}
+        fingerprint = request_fingerprint(request)
+        stored = self.get_stored(lookup)
+        if stored is not None:
+            return self.replay(stored, fingerprint)
+
+        try:
+            with transaction.atomic():
+                response = super().create(request, *args, **kwargs)
+                IdempotencyKey.objects.create(
+                    **lookup,
+                    fingerprint=fingerprint,
+                    status_code=response.status_code,
+                    response=JSONRenderer().render(response.data).decode(),
+                )
+        except IntegrityError:
+            stored = self.get_stored(lookup)
+            if stored is None:
+                raise
+            return self.replay(stored, fingerprint)
+        purge_expired_keys_on_commit()
+        return response
+
+    def get_stored(self, lookup):
+        stored = IdempotencyKey.objects.filter(**lookup).first()
+        if stored is not None and stored.is_expired():
+            # Not purged yet; the key is free to be used again.
+            stored.delete()
+            return None
+        return stored
+
+    def replay(self, stored, fingerprint):
+        if stored.fingerprint != fingerprint:
+            return Response(
+                {"error": f"This {KEY_HEADER} was already used with a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            json.loads(stored.response), status=stored.status_code, headers={'Idempotent-Replayed': 'true'},
+        )
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self):
+        return self.filter(created_at__lt=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL))
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a create request sent with an Idempotency-Key header,
+    replayed when the same user retries it with the same key.
+
+    Rows are kept for IDEMPOTENCY_KEY_TTL seconds.
+    """
+    # The unique constraint's index leads with user, so the FK needs none of its own.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    scope = models.CharField(max_length=30)
+    key = models.CharField(max_length=255)
+    # SHA-256 of the request data, so a key reused for another request is refused.
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotency_key_uniq'),
+        ]
+
+    def is_expired(self):
+        return self.created_at < timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status_code})"
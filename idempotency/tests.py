@@ -0,0 +1,126 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.utils import timezone
+
+from bookings.models import Booking
+from core.authentication import ClaimsRefreshToken
+from payments.models import Payment
+from users.models import User
+from vehicles.dispatch import vehicle_index
+from vehicles.models import Vehicle
+
+from . import mixins
+from .models import IdempotencyKey
+
+
+def bearer(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'}
+
+
+class IdempotentCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        vehicle_index.clear()
+        self.passenger = User.objects.create_user('rider', role='PASSENGER')
+        self.other = User.objects.create_user('other', role='PASSENGER')
+        for n in range(3):
+            driver = User.objects.create_user(f'driver{n}', role='DRIVER')
+            Vehicle.objects.create(driver=driver, plate_number=f'IDM {n}', current_geolocation='14.5995,120.9842')
+        self.client = Client()
+
+    def book(self, key, user=None, fare='250.00'):
+        user = user or self.passenger
+        return self.client.post('/api/bookings/', {
+            'passenger': user.pk, 'pickup_location': 'Rizal Park', 'pickup_geolocation': '14.5995,120.9842',
+            'dropoff_location': 'UP Diliman', 'dropoff_geolocation': '14.6538,121.0685',
+            'pickup_time': '2026-01-01T10:00:00Z', 'fare': fare,
+        }, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key, **bearer(user))
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.book('trip-1')
+        self.assertEqual(first.status_code, 201, first.content)
+        retry = self.book('trip-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        # The retry did not claim a second vehicle either.
+        self.assertEqual(Vehicle.objects.filter(status='ON_TRIP').count(), 1)
+
+    def test_key_reused_with_different_data_is_refused(self):
+        self.book('trip-1')
+        response = self.book('trip-1', fare='300.00')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user_and_endpoint(self):
+        self.assertEqual(self.book('shared').status_code, 201)
+        self.assertEqual(self.book('shared', user=self.other).status_code, 201)
+        booking = Booking.objects.filter(passenger=self.passenger).get()
+        response = self.client.post(
+            '/api/payments/', {'booking': booking.pk, 'amount': '250.00', 'payment_method': 'Cash'},
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='shared', **bearer(self.passenger),
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 3)
+
+    def test_concurrent_duplicate_creates_one_row(self):
+        # Run the duplicate to completion after the first request has looked
+        # the key up and found nothing, as a concurrent request would.
+        get_stored = mixins.IdempotentCreateMixin.get_stored
+        raced, responses = [], []
+
+        def lookup_then_race(view, lookup):
+            stored = get_stored(view, lookup)
+            if not raced:
+                # Only the first request's lookup races; the duplicate's does not.
+                raced.append(True)
+                responses.append(self.book('trip-1'))
+            return stored
+
+        with mock.patch.object(mixins.IdempotentCreateMixin, 'get_stored', lookup_then_race):
+            late = self.book('trip-1')
+        early = responses[0]
+        self.assertEqual(early.status_code, 201, early.content)
+        self.assertEqual(late.status_code, 201, late.content)
+        self.assertEqual(late['Idempotent-Replayed'], 'true')
+        self.assertEqual(late.json(), early.json())
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        # The loser's claim was rolled back with its booking.
+        self.assertEqual(Vehicle.objects.filter(status='ON_TRIP').count(), 1)
+
+    def test_failed_request_stores_nothing(self):
+        Vehicle.objects.update(status='OFFLINE')
+        vehicle_index.clear()
+        self.assertEqual(self.book('trip-1').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_key_is_free_again(self):
+        self.book('trip-1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        response = self.book('trip-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_expired_keys_are_purged(self):
+        self.book('old')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        # The next create purges, as the interval since the last purge has passed.
+        mixins._next_purge = 0.0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book('new')
+        self.assertQuerySetEqual(IdempotencyKey.objects.values_list('key', flat=True), ['new'])
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command('purge_idempotency_keys', stdout=mock.Mock())
+        self.assertFalse(IdempotencyKey.objects.exists())
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.admin import SoftDeleteAdmin
 from .models import Payment
 
-admin.site.register(Payment)
+admin.site.register(Payment, SoftDeleteAdmin)
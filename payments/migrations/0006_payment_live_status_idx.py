@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_booking_indexes_and_active_vehicle_constraint'),
+        ('payments', '0005_remove_payment_deleted_at_payment_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status', 'created_at'], name='payment_live_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_soft_delete_live_index'),
+        ('payments', '0006_payment_live_status_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at', '-id'], name='payments_payment_live_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_filter_indexes'),
+        ('payments', '0007_soft_delete_live_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['payment_method', 'created_at'], name='payment_live_method_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['amount'], name='payment_live_amount_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_updated_at_index'),
+        ('payments', '0008_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at'], name='payment_updated_at_idx'),
+        ),
+    ]
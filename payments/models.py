@@ -1,7 +1,23 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from core.models import SoftDeleteManager, SoftDeleteModel, SoftDeleteQuerySet
 from bookings.models import Booking
 
-class Payment(models.Model):
+
+class PaymentQuerySet(SoftDeleteQuerySet):
+    def settle(self, status):
+        """
+        Move the Pending payments in this queryset to ``status``.
+
+        One ``UPDATE ... WHERE status = 'Pending'``, so payments that were
+        already settled are left alone. Returns the number of payments moved.
+        """
+        return self.filter(status='Pending').update(status=status, updated_at=timezone.now())
+
+
+class Payment(SoftDeleteModel):
+    SETTLEMENTS = {'verify': 'Completed', 'reject': 'Failed'}
     payment_method_CHOICES = [
         ('Cash', 'Cash'),
         ('Credit Card', 'Credit Card'),
@@ -22,11 +38,17 @@ class Payment(models.Model):
     status = models.CharField(max_length=20, choices= status_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    is_deleted = models.BooleanField(default=False)
 
-    def soft_delete(self):
-        self.is_deleted = True
-        self.save(update_fields=['is_deleted'])
+    objects = SoftDeleteManager.from_queryset(PaymentQuerySet)()
+    all_objects = PaymentQuerySet.as_manager()
+
+    class Meta(SoftDeleteModel.Meta):
+        indexes = SoftDeleteModel.Meta.indexes + [
+            models.Index(fields=['updated_at'], name='payment_updated_at_idx'),
+            models.Index(fields=['status', 'created_at'], condition=Q(is_deleted=False), name='payment_live_status_idx'),
+            models.Index(fields=['payment_method', 'created_at'], condition=Q(is_deleted=False), name='payment_live_method_idx'),
+            models.Index(fields=['amount'], condition=Q(is_deleted=False), name='payment_live_amount_idx'),
+        ]
 
     def __str__(self):
         return f"Payment for Booking {self.booking.id} - {self.status}"
@@ -1,7 +1,18 @@
 from rest_framework import serializers
 from .models import Payment
 
-class PaymentSerializer(serializers.ModelSerializer):
+class StaffSetsStatusMixin:
+    """Only staff may set ``status``; anyone else's payment starts as Pending."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if 'status' in fields and not (request and request.user.is_staff):
+            fields['status'].read_only = True
+        return fields
+
+
+class PaymentSerializer(StaffSetsStatusMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'booking', 'amount', 'payment_method', 'status', 'created_at', 'updated_at']
@@ -20,3 +31,12 @@ class PaymentDetailSerializer(serializers.ModelSerializer):
             'amount', 'payment_method', 'status', 'created_at', 'updated_at', 'is_deleted'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'is_deleted']
+
+
+class PaymentBulkItemSerializer(StaffSetsStatusMixin, serializers.ModelSerializer):
+    """One payment of a bulk request; the bookings are checked by the view in one query."""
+    booking = serializers.IntegerField(source='booking_id')
+
+    class Meta:
+        model = Payment
+        fields = ['booking', 'amount', 'payment_method', 'status']
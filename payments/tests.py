@@ -1,3 +1,157 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.client import MULTIPART_CONTENT
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from bookings.models import Booking
+from core.authentication import ClaimsRefreshToken
+from users.cache import driver_earnings_version
+from users.models import User
+from vehicles.models import Vehicle
+
+from .models import Payment
+
+
+class PaymentQueryCountTests(TestCase):
+    def setUp(self):
+        self.trips = 0
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(self.admin).access_token}'}
+        self.client = Client()
+        self.add_payments(2)
+        # Caches the token's auth state, which the first request loads.
+        self.client.get('/api/payments/', **self.headers)
+
+    def add_payments(self, count):
+        for _ in range(count):
+            passenger = User.objects.create_user(f'rider{self.trips}', role='PASSENGER')
+            driver = User.objects.create_user(f'driver{self.trips}', role='DRIVER')
+            vehicle = Vehicle.objects.create(driver=driver, plate_number=f'PAY {self.trips}')
+            booking = Booking.objects.create(
+                passenger=passenger, driver=driver, vehicle=vehicle, pickup_location='a',
+                dropoff_location='b', pickup_time=timezone.now(), fare='100.00',
+            )
+            Payment.objects.create(booking=booking, amount='100.00', payment_method='Cash')
+            self.trips += 1
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        # COUNT for the page links and one SELECT for the page.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/payments/', **self.headers).status_code, 200)
+        self.add_payments(10)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/payments/', **self.headers)
+        self.assertEqual(response.json()['count'], 12)
+
+    def test_detail_loads_booking_and_passenger_in_one_query(self):
+        payment = Payment.objects.first()
+        # The version row for the ETag, then the payment joined to its booking and passenger.
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/payments/{payment.pk}/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['passenger_username'], 'rider0')
+
+
+class PaymentCreateTests(TestCase):
+    def setUp(self):
+        self.passenger = User.objects.create_user('rider', role='PASSENGER')
+        self.driver = User.objects.create_user('driver', role='DRIVER')
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+        self.bookings = [
+            Booking.objects.create(
+                passenger=self.passenger, driver=self.driver, pickup_location='a', dropoff_location='b',
+                pickup_time=timezone.now(), fare='100.00', status='COMPLETED',
+            )
+            for _ in range(2)
+        ]
+        self.client = Client()
+
+    def post(self, user, url, data):
+        token = ClaimsRefreshToken.for_user(user).access_token
+        return self.client.post(url, data, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def items(self, status='Completed'):
+        return [
+            {'booking': booking.pk, 'amount': '100.00', 'payment_method': 'Cash', 'status': status}
+            for booking in self.bookings
+        ]
+
+    def test_passenger_cannot_create_settled_payments(self):
+        first, second = self.items()
+        response = self.post(self.passenger, '/api/payments/bulk/', [first])
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.post(self.passenger, '/api/payments/', second)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(set(Payment.objects.values_list('status', flat=True)), {'Pending'})
+
+    def test_staff_bulk_create_sets_status_and_invalidates_earnings(self):
+        version = driver_earnings_version(self.driver.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(self.admin, '/api/payments/bulk/', self.items())
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(set(Payment.objects.values_list('status', flat=True)), {'Completed'})
+        self.assertNotEqual(driver_earnings_version(self.driver.pk), version)
+
+
+class SettlePaymentsTests(TestCase):
+    def setUp(self):
+        passenger = User.objects.create_user('rider', role='PASSENGER')
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+        self.payments = [
+            Payment.objects.create(
+                booking=Booking.objects.create(
+                    passenger=passenger, pickup_location='a', dropoff_location='b', pickup_time=timezone.now(),
+                ),
+                amount='100.00', payment_method='Cash',
+            )
+            for _ in range(5)
+        ]
+        self.payments[4].status = 'Failed'
+        self.payments[4].save()
+        self.client = Client()
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(self.admin).access_token}'}
+
+    def settle(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        return self.client.post('/api/payments/settle/', data, **kwargs, **self.headers)
+
+    def test_mixed_actions_take_one_update_each(self):
+        first, second, third, fourth, failed = (payment.pk for payment in self.payments)
+        upload = io.BytesIO(
+            f'id,action\n{first},verify\n{second},reject\n{third},\n{failed},verify\n999999,verify\n'.encode()
+        )
+        upload.name = 'settlement.csv'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.settle({'action': 'verify', 'file': upload}, content_type=MULTIPART_CONTENT)
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual((sorted(body['verified']), body['rejected']), ([first, third], [second]))
+        self.assertEqual(
+            {skip['id']: skip['reason'] for skip in body['skipped']},
+            {failed: 'Cannot verify payment with status Failed', 999999: 'Payment not found'},
+        )
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            dict(Payment.objects.values_list('pk', 'status')),
+            {first: 'Completed', second: 'Failed', third: 'Completed', fourth: 'Pending', failed: 'Failed'},
+        )
+
+    def test_ids_and_bad_items_are_reported(self):
+        pk = self.payments[0].pk
+        response = self.settle({'action': 'reject', 'ids': [pk, pk, 'x', 424242]})
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual(body['rejected'], [pk])
+        self.assertEqual(
+            [skip['reason'] for skip in body['skipped']],
+            ['Listed more than once', 'Not a payment id', 'Payment not found'],
+        )
+
+    def test_body_must_be_an_object(self):
+        response = self.settle([self.payments[0].pk])
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(self.settle({'action': 'refund', 'ids': []}).status_code, 400)
@@ -1,15 +1,30 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied, NotFound
 from .models import Payment
-from .serializers import PaymentSerializer, PaymentDetailSerializer
+from .serializers import PaymentBulkItemSerializer, PaymentSerializer, PaymentDetailSerializer
+from .filters import PaymentFilter
 from bookings.models import Booking
+from core.bulk import BulkCreateAPIView
+from core.export import ExportAPIView
+from core.conditional import ConditionalDetailMixin
+from core.events import booking_channel, payment_event, publish_on_commit
+from idempotency.mixins import IdempotentCreateMixin
+from users.cache import invalidate_driver_earnings
 
 
-class PaymentListCreateAPIView(generics.ListCreateAPIView):
+class PaymentListCreateAPIView(IdempotentCreateMixin, generics.ListCreateAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    idempotency_scope = 'payments'
+    filterset_class = PaymentFilter
+    ordering_fields = ['created_at', 'amount']
 
     def get_queryset(self):
         user = self.request.user
@@ -28,19 +43,80 @@ class PaymentListCreateAPIView(generics.ListCreateAPIView):
         except Booking.DoesNotExist:
             raise NotFound("Booking not found")
         
-        if booking.passenger != self.request.user:
+        if booking.passenger_id != self.request.user.id:
             raise PermissionDenied("You can only create payments for your own bookings")
         
         serializer.save()
+        invalidate_driver_earnings(booking.driver_id)
+
+
+class PaymentBulkCreateAPIView(BulkCreateAPIView):
+    queryset = Payment.objects.all()
+    serializer_class = PaymentBulkItemSerializer
+    output_serializer_class = PaymentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def build_instances(self, valid, errors):
+        user = self.request.user
+        booking_ids = {data['booking_id'] for data in valid.values()}
+        bookings = list(Booking.objects.filter(pk__in=booking_ids).values_list('pk', 'passenger_id', 'driver_id'))
+        passengers = {pk: passenger_id for pk, passenger_id, _ in bookings}
+        self.drivers = {pk: driver_id for pk, _, driver_id in bookings}
+        # Soft-deleted payments still occupy their booking's one-to-one slot.
+        paid = set(Payment.all_objects.filter(booking_id__in=booking_ids).values_list('booking_id', flat=True))
 
+        instances = {}
+        for index, data in valid.items():
+            booking_id = data['booking_id']
+            if booking_id not in passengers:
+                errors[index] = {"booking": ["Booking not found"]}
+            elif not user.is_staff and passengers[booking_id] != user.pk:
+                errors[index] = {"booking": ["You can only create payments for your own bookings"]}
+            elif booking_id in paid:
+                errors[index] = {"booking": ["This booking already has a payment"]}
+            else:
+                paid.add(booking_id)
+                instances[index] = Payment(**data)
+        return instances
 
-class PaymentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+    def perform_bulk_create(self, instances):
+        created = super().perform_bulk_create(instances)
+        invalidate_driver_earnings(*{self.drivers[payment.booking_id] for payment in created})
+        return created
+
+
+class PaymentExportAPIView(ExportAPIView):
     queryset = Payment.objects.all()
+    permission_classes = [permissions.IsAdminUser]
+    filterset_class = PaymentFilter
+    export_filename = 'payments'
+    export_columns = (
+        ('id', 'id'),
+        ('booking_id', 'booking_id'),
+        ('passenger_username', 'booking__passenger__username'),
+        ('amount', 'amount'),
+        ('payment_method', 'payment_method'),
+        ('status', 'status'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+
+class PaymentRetrieveUpdateDestroyAPIView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Payment.objects.select_related('booking__passenger')
     serializer_class = PaymentDetailSerializer
     permission_classes = [permissions.IsAdminUser]
+    version_fields = ('updated_at', 'booking__updated_at', 'booking__passenger__updated_at')
+
+    def perform_update(self, serializer):
+        # The payment may move to another booking, and so to another driver.
+        previous_driver_id = serializer.instance.booking.driver_id
+        payment = serializer.save()
+        invalidate_driver_earnings(previous_driver_id, payment.booking.driver_id)
 
     def perform_destroy(self, instance):
         instance.soft_delete()
+        invalidate_driver_earnings(instance.booking.driver_id)
 
 
 class VerifyPaymentAPIView(APIView):
@@ -48,7 +124,7 @@ class VerifyPaymentAPIView(APIView):
 
     def patch(self, request, pk):
         try:
-            payment = Payment.objects.get(pk=pk)
+            payment = Payment.objects.select_related('booking__passenger').get(pk=pk)
         except Payment.DoesNotExist:
             return Response({"error": "Payment not found"}, status=404)
 
@@ -60,6 +136,11 @@ class VerifyPaymentAPIView(APIView):
         
         payment.status = 'Completed'
         payment.save()
+        invalidate_driver_earnings(payment.booking.driver_id)
+        publish_on_commit(
+            booking_channel(payment.booking_id),
+            payment_event(payment.booking_id, payment.pk, payment.status, updated_at=payment.updated_at),
+        )
         return Response(PaymentDetailSerializer(payment).data)
 
 
@@ -68,7 +149,7 @@ class RejectPaymentAPIView(APIView):
 
     def patch(self, request, pk):
         try:
-            payment = Payment.objects.get(pk=pk)
+            payment = Payment.objects.select_related('booking__passenger').get(pk=pk)
         except Payment.DoesNotExist:
             return Response({"error": "Payment not found"}, status=404)
 
@@ -80,4 +161,105 @@ class RejectPaymentAPIView(APIView):
         
         payment.status = 'Failed'
         payment.save()
+        publish_on_commit(
+            booking_channel(payment.booking_id),
+            payment_event(payment.booking_id, payment.pk, payment.status, updated_at=payment.updated_at),
+        )
         return Response(PaymentDetailSerializer(payment).data)
+
+
+class SettlePaymentsAPIView(APIView):
+    """
+    Verify or reject many Pending payments in one request.
+
+    Takes ``{"action": "verify"|"reject", "ids": [...]}``, or a CSV settlement
+    file uploaded as ``file`` with an ``id`` column and an optional ``action``
+    column overriding the form's ``action`` per row. The payments are checked
+    in one query and each action is applied with one conditional UPDATE; every
+    id that was not settled is returned with the reason.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response(
+                {"error": "Expected an object with 'action' and 'ids', or a settlement file."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        default_action = request.data.get('action')
+        upload = request.FILES.get('file')
+        if upload is not None:
+            try:
+                rows = self.read_settlement_file(upload, default_action)
+            except ValueError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            ids = request.data.get('ids')
+            if not isinstance(ids, list):
+                return Response({"error": "Expected a list of payment ids."}, status=status.HTTP_400_BAD_REQUEST)
+            if default_action not in Payment.SETTLEMENTS:
+                return Response({"error": "action must be 'verify' or 'reject'."}, status=status.HTTP_400_BAD_REQUEST)
+            rows = [(raw_id, default_action) for raw_id in ids]
+        if len(rows) > settings.BULK_MAX_ITEMS:
+            return Response(
+                {"error": f"At most {settings.BULK_MAX_ITEMS} payments can be settled at once."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        skipped = []
+        requested = {}
+        for raw_id, action in rows:
+            try:
+                pk = int(raw_id)
+            except (TypeError, ValueError):
+                skipped.append({"id": raw_id, "reason": "Not a payment id"})
+                continue
+            if action not in Payment.SETTLEMENTS:
+                skipped.append({"id": pk, "reason": f"Unknown action {action!r}"})
+            elif pk in requested:
+                skipped.append({"id": pk, "reason": "Listed more than once"})
+            else:
+                requested[pk] = action
+
+        settled = {action: [] for action in Payment.SETTLEMENTS}
+        with transaction.atomic():
+            current = {
+                pk: (payment_status, booking_id, driver_id)
+                for pk, payment_status, booking_id, driver_id in Payment.objects.select_for_update(of=('self',)).filter(
+                    pk__in=requested
+                ).values_list('pk', 'status', 'booking_id', 'booking__driver_id')
+            }
+            for pk, action in requested.items():
+                if pk not in current:
+                    skipped.append({"id": pk, "reason": "Payment not found"})
+                elif current[pk][0] != 'Pending':
+                    skipped.append({"id": pk, "reason": f"Cannot {action} payment with status {current[pk][0]}"})
+                else:
+                    settled[action].append(pk)
+            for action, pks in settled.items():
+                if pks:
+                    Payment.objects.filter(pk__in=pks).settle(Payment.SETTLEMENTS[action])
+            invalidate_driver_earnings(*{current[pk][2] for pk in settled['verify']})
+
+        for action, pks in settled.items():
+            for pk in pks:
+                booking_id = current[pk][1]
+                publish_on_commit(
+                    booking_channel(booking_id), payment_event(booking_id, pk, Payment.SETTLEMENTS[action])
+                )
+        return Response({"verified": settled['verify'], "rejected": settled['reject'], "skipped": skipped})
+
+    def read_settlement_file(self, upload, default_action):
+        try:
+            text = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError("The settlement file must be UTF-8 CSV.")
+        reader = csv.DictReader(io.StringIO(text))
+        columns = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        if 'id' not in columns:
+            raise ValueError("The settlement file needs an 'id' column.")
+        rows = []
+        for row in reader:
+            action = (row.get(columns['action']) or '').strip().lower() if 'action' in columns else ''
+            rows.append((row[columns['id']].strip(), action or default_action))
+        return rows
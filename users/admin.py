@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.admin import SoftDeleteAdmin
 from .models import User
 
-admin.site.register(User)
+admin.site.register(User, SoftDeleteAdmin)
@@ -0,0 +1,27 @@
+from django.contrib.auth import backends, get_user_model
+
+from core.hashers import amake_password
+
+UserModel = get_user_model()
+
+
+class ModelBackend(backends.ModelBackend):
+    """
+    ModelBackend whose async path awaits the hashing executor, including the
+    dummy hash run for unknown usernames, so no password is hashed on the
+    event loop.
+    """
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Same cost as checking a real user's password (#20760).
+            await amake_password(password)
+        else:
+            if await user.acheck_password(password) and self.user_can_authenticate(user):
+                return user
@@ -0,0 +1,38 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+
+def _version_key(driver_id):
+    return f'users:earnings:{driver_id}:version'
+
+
+def driver_earnings_version(driver_id):
+    """Timestamp of the last change to the driver's earnings; cached summaries are keyed on it."""
+    version = cache.get(_version_key(driver_id))
+    if version is None:
+        cache.add(_version_key(driver_id), time.time(), None)
+        version = cache.get(_version_key(driver_id))
+    return version
+
+
+def invalidate_driver_earnings(*driver_ids):
+    """Drop the cached earnings of ``driver_ids`` once the current transaction commits."""
+    keys = [_version_key(driver_id) for driver_id in driver_ids if driver_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time()), None))
+
+
+def get_driver_earnings(version, driver_id, full_path):
+    return cache.get(f'users:earnings:{driver_id}:{version}:{full_path}')
+
+
+def set_driver_earnings(version, driver_id, full_path, data):
+    # Store plain JSON types so the entry survives any cache backend's pickling.
+    plain = json.loads(JSONRenderer().render(data))
+    cache.set(f'users:earnings:{driver_id}:{version}:{full_path}', plain, settings.DRIVER_EARNINGS_CACHE_TTL)
+    return plain
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from users.models import User
+from users.views import LoginAsyncView, UserRegisterAPIView
+
+PASSWORD = 'benchmark-Passw0rd'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure registration (sync view on a thread pool) and login (async view on one event loop) "
+        "throughput with each password hashing executor, against the configured database. The users "
+        "created are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--executors', default='none,thread,process')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--iterations', type=int, default=settings.PASSWORD_HASH_ITERATIONS)
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        prefix = f'bench-{uuid.uuid4().hex[:8]}-'
+        self.stdout.write(
+            f"{options['iterations']} PBKDF2 iterations, {cores} core(s), "
+            f"{settings.PASSWORD_HASH_WORKERS} hashing worker(s)"
+        )
+        self.stdout.write(
+            f"{'flow':<9} {'executor':<8} {'req_s':>8} {'req_s_core':>10} {'p50_ms':>8} {'p99_ms':>8} {'errors':>6}"
+        )
+        try:
+            for executor in options['executors'].split(','):
+                with override_settings(
+                    PASSWORD_HASH_EXECUTOR='' if executor == 'none' else executor,
+                    PASSWORD_HASH_ITERATIONS=options['iterations'],
+                ):
+                    usernames = [f'{prefix}{executor}-{i}' for i in range(options['requests'])]
+                    for flow, run in (('register', self.run_register), ('login', self.run_login)):
+                        elapsed, results = run(usernames, options['concurrency'])
+                        timings = sorted(ms for ms, _ in results)
+                        errors = sum(1 for _, status in results if status >= 400)
+                        rate = len(timings) / elapsed
+                        self.stdout.write(
+                            f"{flow:<9} {executor:<8} {rate:>8.1f} {rate / cores:>10.1f} "
+                            f"{timings[len(timings) // 2]:>8.1f} {timings[int(len(timings) * 0.99)]:>8.1f} {errors:>6}"
+                        )
+        finally:
+            User.all_objects.filter(username__startswith=prefix).delete()
+
+    def run_register(self, usernames, concurrency):
+        view = UserRegisterAPIView.as_view()
+        factory = RequestFactory()
+
+        def one(username):
+            start = time.perf_counter()
+            request = factory.post(
+                '/api/users/register/', {'username': username, 'password': PASSWORD},
+                content_type='application/json',
+            )
+            response = view(request)
+            response.render()
+            close_old_connections()
+            return (time.perf_counter() - start) * 1e3, response.status_code
+
+        connection.close()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, usernames))
+        return time.perf_counter() - start, results
+
+    def run_login(self, usernames, concurrency):
+        view = LoginAsyncView.as_view()
+        factory = AsyncRequestFactory()
+
+        async def one(slots, username):
+            async with slots:
+                async with ThreadSensitiveContext():
+                    start = time.perf_counter()
+                    request = factory.post(
+                        '/api/login/', {'username': username, 'password': PASSWORD},
+                        content_type='application/json',
+                    )
+                    response = await view(request)
+                    await sync_to_async(close_old_connections)()
+                    return (time.perf_counter() - start) * 1e3, response.status_code
+
+        async def main():
+            slots = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(one(slots, username) for username in usernames))
+
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        return time.perf_counter() - start, results
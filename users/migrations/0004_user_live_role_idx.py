@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_remove_user_deleted_at_user_is_deleted_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['role', 'created_at'], name='user_live_role_idx'),
+        ),
+    ]
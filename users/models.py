@@ -1,7 +1,68 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from core.hashers import acheck_password, amake_password
+from core.models import SoftDeleteManager, SoftDeleteModel, SoftDeleteQuerySet
 
-class User(AbstractUser):
+
+def _invalidate_auth_states_on_commit(user_ids):
+    from core.authentication import invalidate_auth_states
+
+    transaction.on_commit(lambda: invalidate_auth_states(user_ids))
+
+
+def _sync_driven_vehicles(user_ids):
+    # A driver's vehicle leaves dispatch with them and comes back on restore.
+    from vehicles.dispatch import sync_vehicles
+    from vehicles.models import Vehicle
+
+    sync_vehicles(Vehicle.all_objects.filter(driver_id__in=user_ids).values_list('pk', flat=True))
+
+
+class UserQuerySet(SoftDeleteQuerySet):
+    def revoke_tokens(self):
+        """Invalidate every token issued so far to the users in this queryset."""
+        user_ids = list(self.values_list('pk', flat=True))
+        count = self.model.all_objects.filter(pk__in=user_ids).update(token_version=F('token_version') + 1)
+        _invalidate_auth_states_on_commit(user_ids)
+        return count
+
+    def soft_delete(self):
+        user_ids = list(self.values_list('pk', flat=True))
+        count = self.model.all_objects.filter(pk__in=user_ids).update(
+            is_deleted=True, token_version=F('token_version') + 1, updated_at=timezone.now()
+        )
+        _invalidate_auth_states_on_commit(user_ids)
+        _sync_driven_vehicles(user_ids)
+        return count
+
+    def restore(self):
+        user_ids = list(self.values_list('pk', flat=True))
+        count = self.model.all_objects.filter(pk__in=user_ids).update(is_deleted=False, updated_at=timezone.now())
+        _invalidate_auth_states_on_commit(user_ids)
+        _sync_driven_vehicles(user_ids)
+        return count
+
+
+class AsyncHashingUserManager(UserManager):
+    async def _acreate_user(self, username, email, password, **extra_fields):
+        # Django's acreate_user() hashes on the event loop; await the executor instead.
+        user = self._create_user_object(username, email, None, **extra_fields)
+        user.password = await amake_password(password)
+        await user.asave(using=self._db)
+        return user
+
+
+class SoftDeleteUserManager(SoftDeleteManager.from_queryset(UserQuerySet), AsyncHashingUserManager):
+    pass
+
+
+class AllUsersManager(AsyncHashingUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class User(SoftDeleteModel, AbstractUser):
     ROLE_CHOICES = [
         ('PASSENGER', 'Passenger'),
         ('DRIVER', 'Driver'),   
@@ -11,11 +72,44 @@ class User(AbstractUser):
     contact_info = models.CharField(max_length=100, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    is_deleted = models.BooleanField(default=False)
+    # Tokens carry the version they were issued under; bumping it revokes them all.
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = SoftDeleteUserManager()
+    all_objects = AllUsersManager()
+
+    class Meta(SoftDeleteModel.Meta, AbstractUser.Meta):
+        swappable = 'AUTH_USER_MODEL'
+        indexes = SoftDeleteModel.Meta.indexes + [
+            models.Index(fields=['role', 'created_at'], condition=Q(is_deleted=False), name='user_live_role_idx'),
+        ]
+
+    async def acheck_password(self, raw_password):
+        """Awaits the hashing executor, so checking a password never blocks the event loop."""
+
+        async def setter(raw_password):
+            self.password = await amake_password(raw_password)
+            # A hash upgrade is not a password change: tokens stay valid.
+            self._password = None
+            await self.asave(update_fields=['password'])
+
+        return await acheck_password(raw_password, self.password, setter)
+
+    async def aset_password(self, raw_password):
+        self.password = await amake_password(raw_password)
+        self._password = raw_password
+
+    def revoke_tokens(self):
+        User.all_objects.filter(pk=self.pk).revoke_tokens()
+        self.refresh_from_db(fields=['token_version'])
 
     def soft_delete(self):
-        self.is_deleted = True
-        self.save(update_fields=['is_deleted'])
+        User.all_objects.filter(pk=self.pk).soft_delete()
+        self.refresh_from_db(fields=['is_deleted', 'token_version', 'updated_at'])
+
+    def restore(self):
+        User.all_objects.filter(pk=self.pk).restore()
+        self.refresh_from_db(fields=['is_deleted', 'updated_at'])
 
     def __str__(self):
-        return f"{self.username} ({self.role})"
\ No newline at end of file
+        return f"{self.username} ({self.role})"
@@ -1,4 +1,9 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from .models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -8,14 +13,20 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'password', 'role', 'contact_info', 'created_at']
         read_only_fields = ['id', 'created_at']
+        # Soft-deleted accounts still hold their username.
+        extra_kwargs = {
+            'username': {'validators': [UnicodeUsernameValidator(), UniqueValidator(queryset=User.all_objects.all())]},
+        }
     
     def create(self, validated_data):
+        # create_user hashes the password and inserts the row once; without a
+        # password the account gets an unusable one.
         password = validated_data.pop('password', None)
-        user = User.objects.create_user(**validated_data)
-        if password:
-            user.set_password(password)
-            user.save()
-        return user
+        return User.objects.create_user(password=password, **validated_data)
+
+    async def acreate(self, validated_data):
+        password = validated_data.pop('password', None)
+        return await User.objects.acreate_user(password=password, **validated_data)
     
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
@@ -24,6 +35,8 @@ class UserSerializer(serializers.ModelSerializer):
         if password:
             instance.set_password(password)
         instance.save()
+        if password:
+            instance.revoke_tokens()
         return instance
 
 
@@ -31,3 +44,43 @@ class UserListSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'role', 'contact_info']
+
+
+class LoginSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(write_only=True)
+
+
+class DriverEarningsQuerySerializer(serializers.Serializer):
+    """Query parameters of the driver earnings endpoint; the range defaults to the last 30 days."""
+    period = serializers.ChoiceField(choices=['day', 'week'], default='day')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        end = attrs.setdefault('end', timezone.localdate())
+        start = attrs.setdefault('start', end - timedelta(days=29))
+        if start > end:
+            raise serializers.ValidationError("start must not be after end.")
+        return attrs
+
+
+class EarningsFiguresSerializer(serializers.Serializer):
+    completed_trips = serializers.IntegerField()
+    total_fare = serializers.DecimalField(max_digits=14, decimal_places=2)
+    verified_payments = serializers.IntegerField()
+    verified_amount = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class EarningsPeriodSerializer(EarningsFiguresSerializer):
+    period = serializers.DateField()
+
+
+class DriverEarningsSerializer(serializers.Serializer):
+    driver = serializers.IntegerField(source='driver.pk')
+    driver_name = serializers.CharField(source='driver.username')
+    period = serializers.CharField()
+    start = serializers.DateField()
+    end = serializers.DateField()
+    totals = EarningsFiguresSerializer()
+    periods = EarningsPeriodSerializer(many=True)
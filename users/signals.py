@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.authentication import invalidate_auth_state
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which tokens do not depend on.
+    if update_fields != frozenset({'last_login'}):
+        invalidate_auth_state(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_auth_state(instance.pk)
@@ -1,3 +1,361 @@
-from django.test import TestCase
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core import hashers
+from core.authentication import ClaimsRefreshToken
+from bookings.models import Booking
+from core.checks import check_throttle_cache, check_token_revocation_cache
+from payments.models import Payment
+
+from .models import User
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, PASSWORD_HASH_EXECUTOR='')
+class LoginTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('rider', password='pw-rider-123')
+        # Real clients send no CSRF cookie; APIClient would skip the check.
+        self.client = Client(enforce_csrf_checks=True)
+
+    def login(self, password):
+        return self.client.post(
+            '/api/login/', {'username': 'rider', 'password': password}, content_type='application/json',
+        )
+
+    def test_login_needs_no_csrf_token(self):
+        response = self.login('pw-rider-123')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(set(response.json()), {'refresh', 'access'})
+
+    def test_login_only_reads_the_user(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login('pw-rider-123').status_code, 200)
+        self.assertIsNone(User.objects.get().last_login)
+
+    def test_wrong_password_is_refused(self):
+        response = self.login('wrong')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'No active account found with the given credentials')
+
+
+class ProfileTests(TestCase):
+    def test_update_with_bearer_token_needs_no_csrf_token(self):
+        user = User.objects.create_user('rider', role='PASSENGER')
+        access = ClaimsRefreshToken.for_user(user).access_token
+        client = Client(enforce_csrf_checks=True)
+        response = client.put(
+            '/api/users/profile/', {'contact_info': '0917 000 0000'},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        user.refresh_from_db()
+        self.assertEqual(user.contact_info, '0917 000 0000')
+
+
+@override_settings(ROOT_URLCONF='core.asgi_urls')
+class AsyncLoginTests(LoginTests):
+    """The same checks against the async login view the ASGI application mounts."""
+
+
+@override_settings(ROOT_URLCONF='core.asgi_urls')
+class AsyncProfileTests(ProfileTests):
+    pass
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, PASSWORD_HASH_EXECUTOR='thread')
+class PasswordHashingTests(TestCase):
+    # Hashes the synchronous views wait for with Future.result().
+    blocking = True
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('rider', password='pw-rider-123')
+        self.client = Client(enforce_csrf_checks=True)
+
+    def post(self, path, data, **extra):
+        return self.client.post(path, data, content_type='application/json', **extra)
+
+    @contextmanager
+    def assertHashes(self, count):
+        """Count the key derivations run in the block, and check where they ran."""
+        derive, threads = hashers._derive, []
+
+        def counted_derive(*args):
+            threads.append(threading.current_thread().name)
+            return derive(*args)
+
+        with mock.patch.object(hashers, '_derive', counted_derive), mock.patch.object(
+            hashers.PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=hashers.PBKDF2PasswordHasher.encode,
+        ) as encode:
+            yield
+        self.assertEqual(len(threads), count)
+        self.assertTrue(all(name.startswith('password-hash') for name in threads), threads)
+        self.assertEqual(encode.call_count, count if self.blocking else 0)
+
+    def test_registration_hashes_once(self):
+        with self.assertHashes(1):
+            response = self.post('/api/users/register/', {'username': 'new', 'password': 'pw-new-1234'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(User.objects.get(username='new').check_password('pw-new-1234'))
+
+    def test_login_hashes_once(self):
+        with self.assertHashes(1):
+            response = self.post('/api/login/', {'username': 'rider', 'password': 'pw-rider-123'})
+        self.assertEqual(response.status_code, 200, response.content)
+        # An unknown username costs the same single hash.
+        with self.assertHashes(1):
+            response = self.post('/api/login/', {'username': 'nobody', 'password': 'pw-rider-123'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_password_change_checks_and_hashes_once_each(self):
+        access = ClaimsRefreshToken.for_user(User.objects.get()).access_token
+        with self.assertHashes(2):
+            response = self.post('/api/users/change-password/', {
+                'old_password': 'pw-rider-123', 'new_password': 'pw-rider-456', 'confirm_password': 'pw-rider-456',
+            }, HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(User.objects.get().check_password('pw-rider-456'))
+        with self.assertHashes(1):
+            response = self.post('/api/users/change-password/', {
+                'old_password': 'wrong', 'new_password': 'pw-rider-789', 'confirm_password': 'pw-rider-789',
+            }, HTTP_AUTHORIZATION=f'Bearer {response.json()["access"]}')
+        self.assertEqual(response.json(), {'error': 'Old password is incorrect'})
+
+
+@override_settings(ROOT_URLCONF='core.asgi_urls')
+class AsyncPasswordHashingTests(PasswordHashingTests):
+    """The async views await the executor rather than block on the hash."""
+    blocking = False
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, PASSWORD_HASH_EXECUTOR='')
+class RevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('rider', password='pw-rider-123', role='PASSENGER')
+        self.refresh = ClaimsRefreshToken.for_user(self.user)
+        self.client = Client()
+
+    def get_profile(self, access):
+        return self.client.get('/api/users/profile/', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def post(self, path, data, access):
+        # Revocations take effect when their transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(path, data, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def refresh_with(self, refresh):
+        return self.client.post('/api/refresh/', {'refresh': str(refresh)}, content_type='application/json')
+
+    def assertRevoked(self, response):
+        self.assertEqual(response.status_code, 401, response.content)
+
+    def test_logout_revokes_the_access_and_refresh_token(self):
+        access = self.refresh.access_token
+        # Caches the user's auth state, so revocation cannot rely on a cache miss.
+        self.assertEqual(self.get_profile(access).status_code, 200)
+        other = ClaimsRefreshToken.for_user(self.user)
+
+        response = self.post('/api/logout/', {'refresh': str(self.refresh)}, access)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertRevoked(self.get_profile(access))
+        self.assertRevoked(self.refresh_with(self.refresh))
+        # Revoked by jti: the user's other sessions go on.
+        self.assertEqual(self.get_profile(other.access_token).status_code, 200)
+        self.assertEqual(self.refresh_with(other).status_code, 200)
+
+    def test_logout_all_revokes_every_session(self):
+        other = ClaimsRefreshToken.for_user(self.user)
+        self.post('/api/logout/', {'all': True}, self.refresh.access_token)
+        self.assertRevoked(self.get_profile(other.access_token))
+        self.assertRevoked(self.refresh_with(other))
+
+    def test_password_change_revokes_earlier_tokens(self):
+        access = self.refresh.access_token
+        self.assertEqual(self.get_profile(access).status_code, 200)
+
+        response = self.post('/api/users/change-password/', {
+            'old_password': 'pw-rider-123', 'new_password': 'pw-rider-456', 'confirm_password': 'pw-rider-456',
+        }, access)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertRevoked(self.get_profile(access))
+        self.assertRevoked(self.refresh_with(self.refresh))
+        # The tokens handed back carry the new token_version.
+        self.assertEqual(self.get_profile(response.json()['access']).status_code, 200)
+        self.assertEqual(self.refresh_with(response.json()['refresh']).status_code, 200)
+
+    def test_soft_delete_revokes_tokens(self):
+        access = self.refresh.access_token
+        self.assertEqual(self.get_profile(access).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.soft_delete()
+        self.assertRevoked(self.get_profile(access))
+        self.assertRevoked(self.refresh_with(self.refresh))
+
+    def test_refresh_of_a_revoked_user_is_refused(self):
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.revoke_tokens()
+        response = self.refresh_with(self.refresh)
+        self.assertRevoked(response)
+        self.assertEqual(response.json()['detail'], 'Token has been revoked')
+
+
+@override_settings(ROOT_URLCONF='core.asgi_urls')
+class AsyncRevocationTests(RevocationTests):
+    pass
+
+
+class DriverEarningsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.passenger = User.objects.create_user('rider', role='PASSENGER')
+        self.driver = User.objects.create_user('driver', role='DRIVER')
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+        self.client = Client()
+        self.url = f'/api/users/drivers/{self.driver.pk}/earnings/'
+        self.trips = {status: self.trip(status) for status in ('COMPLETED', 'ONGOING', 'CANCELLED')}
+        self.payments = {status: Payment.objects.create(booking=booking, amount='100.00', payment_method='Cash')
+                         for status, booking in self.trips.items()}
+        earlier = self.trip('COMPLETED', fare='40.00')
+        Booking.objects.filter(pk=earlier.pk).update(created_at=timezone.now() - timedelta(days=3))
+
+    def trip(self, status, fare='100.00'):
+        return Booking.objects.create(
+            passenger=self.passenger, driver=self.driver, pickup_location='a', dropoff_location='b',
+            pickup_time=timezone.now(), fare=fare, status=status,
+        )
+
+    def send(self, method, path, user, data=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'}
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(path, data, content_type='application/json', **headers)
+
+    def totals(self):
+        response = self.send('get', self.url, self.driver)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['totals']
+
+    def test_aggregates_completed_trips_and_verified_payments(self):
+        self.send('patch', f'/api/payments/{self.payments["COMPLETED"].pk}/verify/', self.admin)
+        # Cancelled and ongoing trips, and their payments, do not count.
+        self.send('patch', f'/api/payments/{self.payments["CANCELLED"].pk}/verify/', self.admin)
+        data = self.send('get', self.url, self.driver).json()
+        self.assertEqual(data['totals'], {
+            'completed_trips': 2, 'total_fare': '140.00', 'verified_payments': 1, 'verified_amount': '100.00',
+        })
+        self.assertEqual([row['completed_trips'] for row in data['periods']], [1, 1])
+        start = timezone.localdate().isoformat()
+        self.assertEqual(self.send('get', f'{self.url}?start={start}', self.driver).json()['totals']['completed_trips'], 1)
+
+    def test_other_drivers_earnings_are_staff_only(self):
+        self.assertEqual(self.send('get', self.url, self.passenger).status_code, 403)
+        self.assertEqual(self.send('get', self.url, self.admin).status_code, 200)
+
+    def test_completing_a_trip_refreshes_cached_earnings(self):
+        self.assertEqual(self.totals()['completed_trips'], 2)
+        response = self.send('post', f'/api/bookings/{self.trips["ONGOING"].pk}/complete/', self.driver)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.totals()['completed_trips'], 3)
+
+    def test_verifying_a_payment_refreshes_cached_earnings(self):
+        self.assertEqual(self.totals()['verified_payments'], 0)
+        self.send('patch', f'/api/payments/{self.payments["COMPLETED"].pk}/verify/', self.admin)
+        self.assertEqual(self.totals()['verified_payments'], 1)
+
+    def test_updating_a_payment_refreshes_cached_earnings(self):
+        payment = self.payments['COMPLETED']
+        self.send('patch', f'/api/payments/{payment.pk}/verify/', self.admin)
+        self.assertEqual(self.totals()['verified_amount'], '100.00')
+        response = self.send('patch', f'/api/payments/{payment.pk}/', self.admin, {'amount': '80.00'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.totals()['verified_amount'], '80.00')
+        self.send('delete', f'/api/payments/{payment.pk}/', self.admin)
+        self.assertEqual(self.totals()['verified_amount'], '0.00')
+
+
+class UserQueryCountTests(TestCase):
+    paths = ('/api/users/', '/api/users/drivers/', '/api/users/passengers/', '/api/passengers/')
+
+    def setUp(self):
+        self.users = 0
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(self.admin).access_token}'}
+        self.client = Client()
+        self.add_users(2)
+        # Caches the token's auth state, which the first request loads.
+        self.client.get('/api/users/', **self.headers)
+
+    def add_users(self, count):
+        for _ in range(count):
+            User.objects.create_user(f'rider{self.users}', role='PASSENGER')
+            User.objects.create_user(f'driver{self.users}', role='DRIVER')
+            self.users += 1
+
+    def counts(self):
+        counts = []
+        for path in self.paths:
+            # COUNT for the page links and one SELECT for the page.
+            with self.subTest(path=path), self.assertNumQueries(2):
+                response = self.client.get(path, **self.headers)
+                self.assertEqual(response.status_code, 200)
+            counts.append(response.json()['count'])
+        return counts
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        self.assertEqual(self.counts(), [5, 2, 2, 2])
+        self.add_users(10)
+        self.assertEqual(self.counts(), [25, 12, 12, 12])
+
+
+class UserSoftDeleteTests(TestCase):
+    def test_managers_filter_deleted_users(self):
+        kept, gone = User.objects.create_user('kept'), User.objects.create_user('gone')
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=gone.pk).soft_delete()
+        self.assertQuerySetEqual(User.objects.all(), [kept])
+        self.assertEqual(User.all_objects.count(), 2)
+        self.assertQuerySetEqual(User.objects.only_deleted(), [gone])
+
+    def test_restore_brings_the_user_back(self):
+        user = User.objects.create_user('rider')
+        user.soft_delete()
+        self.assertEqual((user.is_deleted, user.token_version), (True, 1))
+        user.restore()
+        self.assertFalse(User.objects.get(pk=user.pk).is_deleted)
+
+
+class RevocationCacheCheckTests(SimpleTestCase):
+    local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+
+    def check_ids(self):
+        return [message.id for message in check_token_revocation_cache(None)]
+
+    def test_process_local_cache_warns(self):
+        with self.settings(DEBUG=False, CACHES=self.local):
+            self.assertEqual(self.check_ids(), ['core.W001'])
+
+    def test_shared_cache_or_debug_does_not_warn(self):
+        with self.settings(DEBUG=False, CACHES=self.shared):
+            self.assertEqual(self.check_ids(), [])
+        with self.settings(DEBUG=True, CACHES=self.local):
+            self.assertEqual(self.check_ids(), [])
+
+
+class ThrottleCacheCheckTests(SimpleTestCase):
+    def test_process_local_throttle_cache_warns(self):
+        caches = {
+            'default': RevocationCacheCheckTests.shared['default'],
+            'throttle': RevocationCacheCheckTests.local['default'],
+        }
+        with self.settings(DEBUG=False, CACHES=caches, THROTTLE_CACHE='throttle'):
+            self.assertEqual([message.id for message in check_throttle_cache(None)], ['core.W002'])
+        with self.settings(DEBUG=False, CACHES=caches, THROTTLE_CACHE='default'):
+            self.assertEqual(check_throttle_cache(None), [])
@@ -1,9 +1,29 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer, UserListSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.contrib.auth.models import update_last_login
+from rest_framework import exceptions
+from rest_framework_simplejwt.serializers import TokenObtainSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView
+from .serializers import (
+    DriverEarningsQuerySerializer, DriverEarningsSerializer, LoginSerializer, UserSerializer, UserListSerializer,
+)
+from . import cache
+from bookings.models import Booking
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from core.async_views import AsyncPostView, AsyncReadView, render_json
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from core.authentication import ClaimsRefreshToken, aload_deferred_fields, load_deferred_fields, revoke_token
+from core.conditional import set_version_headers, version_headers
+from core.throttling import IPTokenBucketThrottle
 
 User = get_user_model()
 
@@ -11,23 +31,53 @@ User = get_user_model()
 class UserRegisterAPIView(generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'register'
+    throttle_classes = [IPTokenBucketThrottle]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
-        return Response({
-            "user": UserSerializer(user).data,
-            "refresh": str(refresh),
-            "access": str(refresh.access_token)
-        }, status=status.HTTP_201_CREATED)
+        return Response(registration_data(user), status=status.HTTP_201_CREATED)
+
+
+def registration_data(user):
+    refresh = ClaimsRefreshToken.for_user(user)
+    return {
+        "user": UserSerializer(user).data,
+        "refresh": str(refresh),
+        "access": str(refresh.access_token)
+    }
+
+
+class UserRegisterAsyncView(AsyncPostView):
+    """
+    UserRegisterAPIView answered on the event loop: the new password is
+    hashed on the hashing executor and awaited.
+    """
+    write_view = UserRegisterAPIView
+    throttle_scope = 'register'
+    throttle_classes = [IPTokenBucketThrottle]
+
+    async def post(self, request):
+        try:
+            await self.check_throttles()
+            serializer = self.get_serializer(data=self.drf_request.data)
+            # The username's UniqueValidator queries the database.
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+            user = await serializer.acreate(dict(serializer.validated_data))
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+        return render_json(registration_data(user), status=status.HTTP_201_CREATED)
 
 
 class UserListAPIView(generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['role']
+    search_fields = ['^username']
+    ordering_fields = ['created_at', 'username']
 
 
 class UserRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
@@ -43,31 +93,84 @@ class UserProfileAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
+        load_deferred_fields(request.user)
+        etag, last_modified = version_headers([request.user.updated_at])
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
         serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        return set_version_headers(Response(serializer.data), etag, last_modified)
 
     def put(self, request):
+        load_deferred_fields(request.user)
+        failed = get_conditional_response(request, *version_headers([request.user.updated_at]))
+        if failed is not None:
+            return failed
         serializer = UserSerializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            return set_version_headers(Response(serializer.data), *version_headers([request.user.updated_at]))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class UserProfileAsyncView(AsyncReadView):
+    write_view = UserProfileAPIView
+    serializer_class = UserSerializer
+
+    async def aget(self, request):
+        user = await aload_deferred_fields(self.drf_request.user)
+        etag, last_modified = version_headers([user.updated_at])
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_version_headers(render_json(self.get_serializer(user).data), etag, last_modified)
+
+
+class LoginAPIView(TokenObtainPairView):
+    throttle_scope = 'login'
+    throttle_classes = [IPTokenBucketThrottle]
+
+
+class LoginAsyncView(AsyncPostView):
+    """
+    LoginAPIView answered on the event loop: the password check awaits the
+    hashing executor, so a login holds no worker thread while it hashes.
+    """
+    write_view = LoginAPIView
+    serializer_class = LoginSerializer
+    throttle_scope = 'login'
+    throttle_classes = [IPTokenBucketThrottle]
+
+    async def post(self, request):
+        try:
+            await self.check_throttles()
+            serializer = self.get_serializer(data=self.drf_request.data)
+            serializer.is_valid(raise_exception=True)
+            user = await aauthenticate(request, **serializer.validated_data)
+            if not api_settings.USER_AUTHENTICATION_RULE(user):
+                raise exceptions.AuthenticationFailed(
+                    TokenObtainSerializer.default_error_messages['no_active_account'], 'no_active_account'
+                )
+            refresh = ClaimsRefreshToken.for_user(user)
+            if api_settings.UPDATE_LAST_LOGIN:
+                await sync_to_async(update_last_login)(None, user)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+        return render_json({"refresh": str(refresh), "access": str(refresh.access_token)})
+
+
 class ChangePasswordAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        user = request.user
+        user = load_deferred_fields(request.user)
         old_password = request.data.get('old_password')
         new_password = request.data.get('new_password')
         confirm_password = request.data.get('confirm_password')
 
-        if not old_password or not new_password or not confirm_password:
-            return Response(
-                {"error": "old_password, new_password, and confirm_password are required"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        error = self.required_error(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
         if not user.check_password(old_password):
             return Response(
@@ -75,34 +178,156 @@ class ChangePasswordAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if new_password != confirm_password:
-            return Response(
-                {"error": "New passwords do not match"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if len(new_password) < 8:
-            return Response(
-                {"error": "Password must be at least 8 characters"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        error = self.new_password_error(new_password, confirm_password)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
         user.set_password(new_password)
         user.save()
-        
-        return Response(
-            {"message": "Password changed successfully"},
-            status=status.HTTP_200_OK
-        )
+        # Sign out every other session; the caller continues with new tokens.
+        user.revoke_tokens()
+        return Response(self.changed_data(user), status=status.HTTP_200_OK)
+
+    @staticmethod
+    def required_error(data):
+        if not data.get('old_password') or not data.get('new_password') or not data.get('confirm_password'):
+            return "old_password, new_password, and confirm_password are required"
+        return None
+
+    @staticmethod
+    def new_password_error(new_password, confirm_password):
+        if new_password != confirm_password:
+            return "New passwords do not match"
+        if len(new_password) < 8:
+            return "Password must be at least 8 characters"
+        return None
+
+    @staticmethod
+    def changed_data(user):
+        refresh = ClaimsRefreshToken.for_user(user)
+        return {
+            "message": "Password changed successfully",
+            "refresh": str(refresh),
+            "access": str(refresh.access_token),
+        }
+
+
+class ChangePasswordAsyncView(AsyncPostView):
+    """
+    ChangePasswordAPIView answered on the event loop: checking the old
+    password and hashing the new one both await the hashing executor.
+    """
+    write_view = ChangePasswordAPIView
+
+    async def post(self, request):
+        try:
+            await self.authenticate()
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+        user = await aload_deferred_fields(self.drf_request.user)
+        data = self.drf_request.data
+        error = ChangePasswordAPIView.required_error(data)
+        if error:
+            return render_json({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        if not await user.acheck_password(data['old_password']):
+            return render_json({"error": "Old password is incorrect"}, status=status.HTTP_400_BAD_REQUEST)
+        error = ChangePasswordAPIView.new_password_error(data['new_password'], data['confirm_password'])
+        if error:
+            return render_json({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        await user.aset_password(data['new_password'])
+        await user.asave()
+        await sync_to_async(user.revoke_tokens)()
+        return render_json(ChangePasswordAPIView.changed_data(user))
+
+
+class LogoutAPIView(APIView):
+    """
+    Revoke the access token of the request and, when given, the ``refresh``
+    token. With ``"all": true`` every token of the user is revoked instead,
+    signing out all of their sessions.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        if request.data.get('all'):
+            request.user.revoke_tokens()
+            return Response({"message": "Logged out of all sessions"}, status=status.HTTP_200_OK)
+
+        raw_refresh = request.data.get('refresh')
+        if raw_refresh:
+            try:
+                refresh = ClaimsRefreshToken(raw_refresh)
+            except TokenError:
+                return Response({"error": "Invalid refresh token"}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh[api_settings.USER_ID_CLAIM]) != str(request.user.pk):
+                return Response({"error": "Invalid refresh token"}, status=status.HTTP_400_BAD_REQUEST)
+            revoke_token(refresh)
+        if request.auth is not None:
+            revoke_token(request.auth)
+        return Response({"message": "Logged out"}, status=status.HTTP_200_OK)
 
 
 class DriverListAPIView(generics.ListAPIView):
     queryset = User.objects.filter(role='DRIVER')
     serializer_class = UserListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    search_fields = ['^username']
+    ordering_fields = ['created_at', 'username']
+
+
+class DriverEarningsAPIView(APIView):
+    """
+    A driver's completed trips, fare and verified payments between ``start``
+    and ``end`` (the last 30 days by default), in total and per ``period``
+    (day or week), computed with aggregate queries.
+
+    Drivers see their own earnings, staff anyone's. Summaries are cached per
+    driver for DRIVER_EARNINGS_CACHE_TTL seconds, or until one of the driver's
+    trips completes or payments is verified.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        if not (request.user.is_staff or request.user.pk == pk):
+            return Response({"error": "You can only view your own earnings"}, status=403)
+        query = DriverEarningsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        period, start, end = (query.validated_data[name] for name in ('period', 'start', 'end'))
+
+        cache_key = f'{period}:{start}:{end}'
+        if settings.DRIVER_EARNINGS_CACHE_TTL:
+            version = cache.driver_earnings_version(pk)
+            data = cache.get_driver_earnings(version, pk, cache_key)
+            if data is not None:
+                return Response(data)
+
+        try:
+            driver = User.objects.get(pk=pk, role='DRIVER')
+        except User.DoesNotExist:
+            return Response({"error": "Driver not found"}, status=404)
+
+        bookings = Booking.objects.filter(
+            driver=driver,
+            created_at__gte=timezone.make_aware(datetime.combine(start, time.min)),
+            created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        )
+        data = DriverEarningsSerializer({
+            "driver": driver,
+            "period": period,
+            "start": start,
+            "end": end,
+            "totals": bookings.earnings(),
+            "periods": bookings.earnings(period),
+        }).data
+        if settings.DRIVER_EARNINGS_CACHE_TTL:
+            data = cache.set_driver_earnings(version, pk, cache_key, data)
+        return Response(data)
 
 
 class PassengerListAPIView(generics.ListAPIView):
     queryset = User.objects.filter(role='PASSENGER')
     serializer_class = UserListSerializer
-    permission_classes = [permissions.IsAdminUser]
\ No newline at end of file
+    permission_classes = [permissions.IsAdminUser]
+    search_fields = ['^username']
+    ordering_fields = ['created_at', 'username']
@@ -1,5 +1,5 @@
 from django.contrib import admin
+from core.admin import SoftDeleteAdmin
 from .models import Vehicle
 
-admin.site.register(Vehicle)
-
+admin.site.register(Vehicle, SoftDeleteAdmin)
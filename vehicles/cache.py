@@ -0,0 +1,69 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+AVAILABLE_VERSION_KEY = 'vehicles:available:version'
+
+
+def available_vehicles_version():
+    """
+    Timestamp of the last change to the available-vehicle set.
+
+    Every cached page is keyed on it, so bumping it invalidates them all at
+    once. It doubles as the Last-Modified time of the endpoint.
+    """
+    version = cache.get(AVAILABLE_VERSION_KEY)
+    if version is None:
+        cache.add(AVAILABLE_VERSION_KEY, time.time(), None)
+        version = cache.get(AVAILABLE_VERSION_KEY)
+    return version
+
+
+async def aavailable_vehicles_version():
+    version = await cache.aget(AVAILABLE_VERSION_KEY)
+    if version is None:
+        await cache.aadd(AVAILABLE_VERSION_KEY, time.time(), None)
+        version = await cache.aget(AVAILABLE_VERSION_KEY)
+    return version
+
+
+def invalidate_available_vehicles():
+    """
+    Bump the version once the current transaction commits.
+
+    Bumped earlier, a concurrent request could read the rows still committed,
+    cache them under the new version and serve them until the TTL runs out.
+    """
+    transaction.on_commit(lambda: cache.set(AVAILABLE_VERSION_KEY, time.time(), None))
+
+
+def available_vehicles_etag(version, full_path):
+    digest = hashlib.md5(f'{version}:{full_path}'.encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def get_available_vehicles_page(version, full_path):
+    return cache.get(f'vehicles:available:{version}:{full_path}')
+
+
+async def aget_available_vehicles_page(version, full_path):
+    return await cache.aget(f'vehicles:available:{version}:{full_path}')
+
+
+def set_available_vehicles_page(version, full_path, data):
+    # Store plain JSON types so the entry survives any cache backend's pickling.
+    plain = json.loads(JSONRenderer().render(data))
+    cache.set(f'vehicles:available:{version}:{full_path}', plain, settings.AVAILABLE_VEHICLES_CACHE_TTL)
+    return plain
+
+
+async def aset_available_vehicles_page(version, full_path, data):
+    plain = json.loads(JSONRenderer().render(data))
+    await cache.aset(f'vehicles:available:{version}:{full_path}', plain, settings.AVAILABLE_VEHICLES_CACHE_TTL)
+    return plain
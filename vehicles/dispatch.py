@@ -0,0 +1,320 @@
+import heapq
+import math
+import threading
+import time
+from collections import namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.geo import KM_PER_DEGREE, haversine_km, parse_geolocation
+from .cache import invalidate_available_vehicles
+
+Candidate = namedtuple('Candidate', ['vehicle_id', 'driver_id', 'distance_km'])
+
+
+class VehicleIndex:
+    """
+    In-memory grid index of available vehicles keyed by their position.
+
+    Vehicles are bucketed into square cells of ``cell_size`` degrees. A
+    nearest-neighbour query walks rings of cells outwards from the pickup cell
+    and stops as soon as no unvisited cell can hold anything closer than the
+    current k-th candidate. Candidates are ranked with an equirectangular
+    approximation, which is exact enough at city scale and avoids trigonometry
+    in the inner loop; the reported distance is the haversine distance.
+    """
+
+    def __init__(self, cell_size=0.005):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._entries = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.loaded_at = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, vehicle_id):
+        return vehicle_id in self._entries
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def add(self, vehicle_id, driver_id, lat, lng):
+        cell = self._cell(lat, lng)
+        with self._lock:
+            self._discard(vehicle_id)
+            self._entries[vehicle_id] = (lat, lng, driver_id, cell)
+            self._cells.setdefault(cell, set()).add(vehicle_id)
+
+    def discard(self, vehicle_id):
+        with self._lock:
+            self._discard(vehicle_id)
+
+    def _discard(self, vehicle_id):
+        entry = self._entries.pop(vehicle_id, None)
+        if entry is None:
+            return
+        bucket = self._cells[entry[3]]
+        bucket.discard(vehicle_id)
+        if not bucket:
+            del self._cells[entry[3]]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._entries.clear()
+            self.loaded = False
+
+    def load(self, rows):
+        """Replace the index contents with ``(vehicle_id, driver_id, geolocation)`` rows."""
+        with self._lock:
+            self._cells.clear()
+            self._entries.clear()
+            for vehicle_id, driver_id, geolocation in rows:
+                position = parse_geolocation(geolocation)
+                if position is not None:
+                    self.add(vehicle_id, driver_id, *position)
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def nearest(self, lat, lng, k=5, max_distance_km=None):
+        """Return up to ``k`` Candidates ordered by distance from (lat, lng)."""
+        with self._lock:
+            if not self._entries or k <= 0:
+                return []
+
+            ci, cj = self._cell(lat, lng)
+            lng_scale = math.cos(math.radians(lat))
+            best = []  # max-heap of (-squared planar distance in degrees, vehicle_id)
+            visited = 0
+            ring = 0
+            while True:
+                for cell in self._ring_cells(ci, cj, ring):
+                    visited += 1
+                    for vehicle_id in self._cells.get(cell, ()):
+                        entry = self._entries[vehicle_id]
+                        dlat = entry[0] - lat
+                        dlng = (entry[1] - lng) * lng_scale
+                        distance = dlat * dlat + dlng * dlng
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, vehicle_id))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, vehicle_id))
+
+                # Anything outside the rings walked so far is at least this far away.
+                reach = self._ring_reach(lat, ring)
+                if max_distance_km is not None and reach * KM_PER_DEGREE >= max_distance_km:
+                    break
+                if len(best) == k and reach * reach >= -best[0][0]:
+                    break
+                if visited >= len(self._entries):
+                    # Sparse index: scanning every entry is cheaper than more rings.
+                    return self._scan(lat, lng, k, max_distance_km)
+                ring += 1
+
+            ranked = sorted(best, reverse=True)
+            return self._candidates(lat, lng, [vehicle_id for _, vehicle_id in ranked], max_distance_km)
+
+    def _scan(self, lat, lng, k, max_distance_km):
+        lng_scale = math.cos(math.radians(lat))
+        distances = (
+            ((v_lat - lat) ** 2 + ((v_lng - lng) * lng_scale) ** 2, vehicle_id)
+            for vehicle_id, (v_lat, v_lng, _, _) in self._entries.items()
+        )
+        ranked = heapq.nsmallest(k, distances)
+        return self._candidates(lat, lng, [vehicle_id for _, vehicle_id in ranked], max_distance_km)
+
+    def _candidates(self, lat, lng, vehicle_ids, max_distance_km):
+        candidates = []
+        for vehicle_id in vehicle_ids:
+            v_lat, v_lng, driver_id, _ = self._entries[vehicle_id]
+            distance = haversine_km(lat, lng, v_lat, v_lng)
+            if max_distance_km is None or distance <= max_distance_km:
+                candidates.append(Candidate(vehicle_id, driver_id, distance))
+        return candidates
+
+    @staticmethod
+    def _ring_cells(ci, cj, ring):
+        if ring == 0:
+            yield (ci, cj)
+            return
+        for j in range(cj - ring, cj + ring + 1):
+            yield (ci - ring, j)
+            yield (ci + ring, j)
+        for i in range(ci - ring + 1, ci + ring):
+            yield (i, cj - ring)
+            yield (i, cj + ring)
+
+    def _ring_reach(self, lat, ring):
+        """Lower bound, in scaled degrees, on the distance to any cell beyond ``ring``."""
+        # A point outside the ring is at least ``ring`` cells away in latitude
+        # or in longitude; longitude differences are scaled by cos(lat).
+        return ring * self.cell_size * math.cos(math.radians(lat))
+
+
+vehicle_index = VehicleIndex(cell_size=settings.DISPATCH_CELL_SIZE_DEGREES)
+
+
+# The field default, which a vehicle keeps until it first reports its position.
+UNKNOWN_GEOLOCATION = '0,0'
+
+
+def is_dispatchable(vehicle):
+    return (
+        vehicle.status == 'AVAILABLE' and not vehicle.is_deleted and vehicle.driver_id is not None
+        and vehicle.current_geolocation != UNKNOWN_GEOLOCATION
+    )
+
+
+def sync_vehicle(vehicle):
+    """Mirror a saved vehicle into the index."""
+    if not vehicle_index.loaded:
+        return
+    position = parse_geolocation(vehicle.current_geolocation)
+    if is_dispatchable(vehicle) and position is not None:
+        vehicle_index.add(vehicle.pk, vehicle.driver_id, *position)
+    else:
+        vehicle_index.discard(vehicle.pk)
+
+
+def dispatchable_vehicles():
+    """The vehicles the index holds: available, live, located and driven by a live driver."""
+    from .models import Vehicle
+
+    return Vehicle.objects.filter(
+        status='AVAILABLE', driver__isnull=False, driver__is_deleted=False,
+    ).exclude(current_geolocation=UNKNOWN_GEOLOCATION)
+
+
+def ensure_loaded():
+    # Signals only reach the process that saved the vehicle, so other workers'
+    # changes are picked up by reloading the index periodically.
+    age = time.monotonic() - vehicle_index.loaded_at
+    if vehicle_index.loaded and age < settings.DISPATCH_INDEX_TTL:
+        return
+    vehicle_index.load(dispatchable_vehicles().values_list('pk', 'driver_id', 'current_geolocation'))
+
+
+def nearest_available_vehicles(lat, lng, k=None):
+    ensure_loaded()
+    return vehicle_index.nearest(
+        lat, lng,
+        k=k or settings.DISPATCH_CANDIDATES,
+        max_distance_km=settings.DISPATCH_MAX_DISTANCE_KM,
+    )
+
+
+def claim_nearest_vehicle(lat, lng):
+    """
+    Reserve the nearest available vehicle for a new booking.
+
+    Each candidate is claimed with a conditional ``UPDATE ... WHERE
+    status='AVAILABLE'``; a zero row count means another request got there
+    first, so the candidate is dropped from the index and the next one is
+    tried. Only the contended vehicle row is locked, never the whole fleet.
+    The claimed vehicle leaves the index once the caller's transaction
+    commits, so a rolled-back booking leaves it dispatchable.
+    Returns the claimed Candidate, or None when nothing could be claimed.
+    """
+    from .models import Vehicle
+
+    for _ in range(settings.DISPATCH_CLAIM_ROUNDS):
+        candidates = nearest_available_vehicles(lat, lng)
+        if not candidates:
+            return None
+        for candidate in candidates:
+            claimed = Vehicle.objects.filter(
+                pk=candidate.vehicle_id,
+                driver_id=candidate.driver_id,
+                status='AVAILABLE',
+            ).update(status='ON_TRIP', updated_at=timezone.now())
+            if claimed:
+                transaction.on_commit(partial(vehicle_index.discard, candidate.vehicle_id))
+                invalidate_available_vehicles()
+                return candidate
+            vehicle_index.discard(candidate.vehicle_id)
+    return None
+
+
+def hold_vehicle(vehicle_id):
+    """
+    Take an AVAILABLE vehicle that still has an active booking out of dispatch.
+
+    Such a vehicle fails booking_one_active_per_vehicle on every claim, so it
+    is marked ON_TRIP, as its booking implies, and leaves the index at once.
+    """
+    from .models import Vehicle
+
+    held = Vehicle.objects.filter(
+        pk=vehicle_id, status='AVAILABLE'
+    ).update(status='ON_TRIP', updated_at=timezone.now())
+    vehicle_index.discard(vehicle_id)
+    if held:
+        invalidate_available_vehicles()
+    return held
+
+
+def _index_rows(rows):
+    for vehicle_id, driver_id, geolocation in rows:
+        position = parse_geolocation(geolocation)
+        if position is not None:
+            vehicle_index.add(vehicle_id, driver_id, *position)
+
+
+def release_vehicles(vehicle_ids):
+    """
+    Put ON_TRIP vehicles back into service once none of their bookings is active.
+
+    Runs as one set-based UPDATE; callers invoke it inside the transaction
+    that ended the bookings. The vehicles rejoin the index, and the cached
+    listings are invalidated, when that transaction commits. Returns the
+    number of vehicles released.
+    """
+    from .models import Vehicle
+
+    if not vehicle_ids:
+        return 0
+    released = Vehicle.objects.filter(
+        pk__in=vehicle_ids, status='ON_TRIP'
+    ).exclude(
+        booking__status__in=('PENDING', 'ACCEPTED', 'ONGOING')
+    ).update(status='AVAILABLE', updated_at=timezone.now())
+    if released:
+        invalidate_available_vehicles()
+    if released and vehicle_index.loaded:
+        rows = list(dispatchable_vehicles().filter(
+            pk__in=vehicle_ids
+        ).values_list('pk', 'driver_id', 'current_geolocation'))
+        # Back into the index only once the release is visible to other requests.
+        transaction.on_commit(partial(_index_rows, rows))
+    return released
+
+
+def _resync(vehicle_ids):
+    if not vehicle_index.loaded:
+        return
+    rows = list(dispatchable_vehicles().filter(
+        pk__in=vehicle_ids
+    ).values_list('pk', 'driver_id', 'current_geolocation'))
+    for vehicle_id in vehicle_ids:
+        vehicle_index.discard(vehicle_id)
+    _index_rows(rows)
+
+
+def sync_vehicles(vehicle_ids):
+    """
+    Mirror the vehicles into the index, and invalidate the cached listings,
+    once the current transaction commits.
+
+    For set-based updates, which send no ``post_save`` for ``sync_vehicle``
+    to act on.
+    """
+    vehicle_ids = list(vehicle_ids)
+    if vehicle_ids:
+        invalidate_available_vehicles()
+        transaction.on_commit(partial(_resync, vehicle_ids))
@@ -0,0 +1,8 @@
+import django_filters
+from .models import Vehicle
+
+
+class VehicleFilter(django_filters.FilterSet):
+    class Meta:
+        model = Vehicle
+        fields = ['status', 'vehicle_type']
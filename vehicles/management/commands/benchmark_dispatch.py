@@ -0,0 +1,47 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from vehicles.dispatch import VehicleIndex
+
+# Roughly Metro Manila.
+LAT_RANGE = (14.35, 14.80)
+LNG_RANGE = (120.90, 121.15)
+
+
+class Command(BaseCommand):
+    help = "Measure nearest-vehicle lookup latency of the dispatch index against fleet size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000,100000')
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('-k', type=int, default=settings.DISPATCH_CANDIDATES)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        k = options['k']
+        self.stdout.write(f"{'fleet':>8} {'mean_us':>9} {'p50_us':>9} {'p99_us':>9} {'max_us':>9}")
+
+        for size in (int(s) for s in options['sizes'].split(',')):
+            index = VehicleIndex(cell_size=settings.DISPATCH_CELL_SIZE_DEGREES)
+            index.load(
+                (i, i, f"{rng.uniform(*LAT_RANGE)},{rng.uniform(*LNG_RANGE)}")
+                for i in range(size)
+            )
+            timings = []
+            for _ in range(options['queries']):
+                lat, lng = rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)
+                start = time.perf_counter()
+                index.nearest(lat, lng, k=k)
+                timings.append((time.perf_counter() - start) * 1e6)
+
+            timings.sort()
+            self.stdout.write(
+                f"{size:>8} {statistics.fmean(timings):>9.1f} "
+                f"{timings[len(timings) // 2]:>9.1f} "
+                f"{timings[int(len(timings) * 0.99)]:>9.1f} {timings[-1]:>9.1f}"
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0006_remove_vehicle_deleted_at_vehicle_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='current_geolocation',
+            field=models.CharField(default='0,0', max_length=50),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0007_vehicle_current_geolocation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status', 'created_at'], name='vehicle_live_status_idx'),
+        ),
+    ]
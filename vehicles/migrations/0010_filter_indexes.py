@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0009_soft_delete_live_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['vehicle_type', 'status'], name='vehicle_live_type_idx'),
+        ),
+    ]
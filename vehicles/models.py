@@ -1,7 +1,28 @@
 from django.db import models
+from django.db.models import Q
+from core.models import SoftDeleteManager, SoftDeleteModel, SoftDeleteQuerySet
 from users.models import User
+from .dispatch import sync_vehicles
 
-class Vehicle(models.Model):
+
+class VehicleQuerySet(SoftDeleteQuerySet):
+    # Bulk updates send no post_save, so the dispatch index and the cached
+    # listings are brought up to date here.
+
+    def soft_delete(self):
+        vehicle_ids = list(self.values_list('pk', flat=True))
+        count = super().soft_delete()
+        sync_vehicles(vehicle_ids)
+        return count
+
+    def restore(self):
+        vehicle_ids = list(self.values_list('pk', flat=True))
+        count = super().restore()
+        sync_vehicles(vehicle_ids)
+        return count
+
+
+class Vehicle(SoftDeleteModel):
     STATUS_CHOICES = (
         ('AVAILABLE', 'Available'),
         ('ON_TRIP', 'On Trip'),
@@ -18,14 +39,19 @@ class Vehicle(models.Model):
     vehicle_type = models.CharField(max_length=20, choices=VEHICLE_CHOICES, null=True)
     plate_number = models.CharField(max_length=20, unique=True)
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='AVAILABLE')
+    current_geolocation = models.CharField(max_length=50, blank=False, null=False, default='0,0')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    is_deleted = models.BooleanField(default=False)
+
+    objects = SoftDeleteManager.from_queryset(VehicleQuerySet)()
+    all_objects = VehicleQuerySet.as_manager()
+
+    class Meta(SoftDeleteModel.Meta):
+        indexes = SoftDeleteModel.Meta.indexes + [
+            models.Index(fields=['status', 'created_at'], condition=Q(is_deleted=False), name='vehicle_live_status_idx'),
+            models.Index(fields=['vehicle_type', 'status'], condition=Q(is_deleted=False), name='vehicle_live_type_idx'),
+        ]
     
-    def soft_delete(self):
-        self.is_deleted = True
-        self.save(update_fields=['is_deleted'])
-        
     def __str__(self):
         try:
             return f"{self.vehicle_type} - {self.plate_number} (Driver: {self.driver.username})"
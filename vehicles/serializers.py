@@ -1,13 +1,24 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from .models import Vehicle
 from users.serializers import UserListSerializer
+from core.geo import parse_geolocation
 
 class VehicleSerializer(serializers.ModelSerializer):
     driver_details = UserListSerializer(source='driver', read_only=True, allow_null=True)
     
     class Meta:
         model = Vehicle
-        fields = ['id', 'driver', 'driver_details', 'plate_number', 'status']
+        fields = ['id', 'driver', 'driver_details', 'plate_number', 'status', 'current_geolocation']
         read_only_fields = ['id']
+        # Soft-deleted vehicles still hold their plate number.
+        extra_kwargs = {
+            'plate_number': {'validators': [UniqueValidator(queryset=Vehicle.all_objects.all())]},
+        }
+
+    def validate_current_geolocation(self, value):
+        if parse_geolocation(value) is None:
+            raise serializers.ValidationError("Expected 'latitude,longitude'.")
+        return value
 
         
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import User
+from .cache import invalidate_available_vehicles
+from .dispatch import sync_vehicle, vehicle_index
+from .models import Vehicle
+
+
+@receiver(post_save, sender=Vehicle)
+def vehicle_saved(sender, instance, **kwargs):
+    sync_vehicle(instance)
+    invalidate_available_vehicles()
+
+
+@receiver(post_delete, sender=Vehicle)
+def vehicle_deleted(sender, instance, **kwargs):
+    vehicle_index.discard(instance.pk)
+    invalidate_available_vehicles()
+
+
+@receiver(post_save, sender=User)
+def driver_saved(sender, instance, update_fields=None, **kwargs):
+    # Vehicle listings embed the driver's details; logins only touch last_login.
+    if instance.role == 'DRIVER' and update_fields != frozenset({'last_login'}):
+        invalidate_available_vehicles()
@@ -1,3 +1,269 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase
+
+from core.authentication import ClaimsRefreshToken
+from core.geo import haversine_km
+from users.models import User
+
+from .cache import available_vehicles_version
+from .dispatch import (
+    VehicleIndex, claim_nearest_vehicle, ensure_loaded, nearest_available_vehicles, release_vehicles, vehicle_index,
+)
+from .models import Vehicle
+
+PICKUP = (14.5995, 120.9842)
+
+
+def add_vehicles(count):
+    vehicles = []
+    for i in range(count):
+        driver = User.objects.create_user(f'driver{i}', role='DRIVER')
+        vehicles.append(Vehicle.objects.create(
+            driver=driver, plate_number=f'NCR {i:03}', current_geolocation=f'14.59{i},120.98{i}',
+        ))
+    return vehicles
+
+
+class VehicleIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = {
+            vehicle_id: (14.5 + rng.random() * 0.2, 120.9 + rng.random() * 0.2) for vehicle_id in range(500)
+        }
+        self.index = VehicleIndex(cell_size=0.005)
+        for vehicle_id, (lat, lng) in self.points.items():
+            self.index.add(vehicle_id, vehicle_id + 1000, lat, lng)
+
+    def brute_force(self, lat, lng, k):
+        return sorted(self.points, key=lambda vehicle_id: haversine_km(lat, lng, *self.points[vehicle_id]))[:k]
+
+    def test_nearest_matches_a_full_scan(self):
+        rng = random.Random(11)
+        for _ in range(50):
+            lat, lng = 14.5 + rng.random() * 0.2, 120.9 + rng.random() * 0.2
+            candidates = self.index.nearest(lat, lng, k=5)
+            self.assertEqual([c.vehicle_id for c in candidates], self.brute_force(lat, lng, 5))
+            distances = [c.distance_km for c in candidates]
+            self.assertEqual(distances, sorted(distances))
+            self.assertEqual(candidates[0].driver_id, candidates[0].vehicle_id + 1000)
+
+    def test_far_pickup_falls_back_to_a_scan(self):
+        # Outside the fleet's area the ring walk gives up for a full scan.
+        candidates = self.index.nearest(15.5, 121.9, k=3)
+        self.assertEqual([c.vehicle_id for c in candidates], self.brute_force(15.5, 121.9, 3))
+
+    def test_max_distance_drops_farther_vehicles(self):
+        candidates = self.index.nearest(14.6, 121.0, k=50, max_distance_km=1.0)
+        self.assertTrue(candidates)
+        self.assertTrue(all(c.distance_km <= 1.0 for c in candidates))
+        within = [v for v in self.points if haversine_km(14.6, 121.0, *self.points[v]) <= 1.0]
+        self.assertEqual(len(candidates), min(50, len(within)))
+
+    def test_moved_and_discarded_vehicles(self):
+        nearest = self.index.nearest(14.6, 121.0, k=1)[0].vehicle_id
+        self.index.discard(nearest)
+        self.assertNotIn(nearest, self.index)
+        self.assertNotEqual(self.index.nearest(14.6, 121.0, k=1)[0].vehicle_id, nearest)
+        self.index.add(nearest, 0, 14.6, 121.0)
+        self.assertEqual(self.index.nearest(14.6, 121.0, k=1)[0].distance_km, 0)
+        self.assertEqual(len(self.index), 500)
+        self.assertEqual(VehicleIndex().nearest(14.6, 121.0), [])
+
+
+class EnsureLoadedTests(TestCase):
+    def setUp(self):
+        vehicle_index.clear()
+
+    def test_loads_only_dispatchable_vehicles(self):
+        dispatchable, unlocated, busy, deleted_driver = add_vehicles(4)
+        Vehicle.objects.filter(pk=unlocated.pk).update(current_geolocation='0,0')
+        Vehicle.objects.filter(pk=busy.pk).update(status='ON_TRIP')
+        User.objects.filter(pk=deleted_driver.driver_id).update(is_deleted=True)
+        Vehicle.objects.create(plate_number='NO DRIVER', current_geolocation='14.59,120.98')
+        Vehicle.objects.create(
+            driver=User.objects.create_user('gone', role='DRIVER'), plate_number='DELETED',
+            current_geolocation='14.59,120.98', is_deleted=True,
+        )
+        ensure_loaded()
+        self.assertEqual(list(vehicle_index._entries), [dispatchable.pk])
+
+
+class ClaimConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        vehicle_index.clear()
+
+    def claim(self, start, results):
+        start.wait()
+        try:
+            # The shared in-memory test database refuses a second writer
+            # instead of waiting for it, so a locked attempt is retried.
+            for _ in range(200):
+                try:
+                    with transaction.atomic():
+                        results.append(claim_nearest_vehicle(*PICKUP))
+                    return
+                except OperationalError:
+                    time.sleep(0.005)
+            results.append('locked')
+        finally:
+            connection.close()
+
+    def test_no_vehicle_is_claimed_twice(self):
+        vehicles = add_vehicles(5)
+        # Every thread ranks the same vehicles first, as the separate indexes of
+        # several workers would, so only the conditional UPDATE keeps them apart.
+        candidates = nearest_available_vehicles(*PICKUP, k=len(vehicles))
+        threads = 16
+        start = threading.Barrier(threads)
+        results = []
+        workers = [threading.Thread(target=self.claim, args=(start, results)) for _ in range(threads)]
+        with mock.patch('vehicles.dispatch.nearest_available_vehicles', return_value=candidates):
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.assertNotIn('locked', results)
+        claimed = [candidate.vehicle_id for candidate in results if candidate is not None]
+        self.assertEqual(sorted(claimed), sorted(vehicle.pk for vehicle in vehicles))
+        self.assertEqual(results.count(None), threads - len(vehicles))
+        self.assertEqual(Vehicle.objects.filter(status='ON_TRIP').count(), len(vehicles))
+
+
+class ClaimIndexTests(TestCase):
+    def setUp(self):
+        vehicle_index.clear()
+        self.vehicle = add_vehicles(1)[0]
+
+    def test_claimed_vehicle_leaves_the_index_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            candidate = claim_nearest_vehicle(*PICKUP)
+            self.assertEqual(candidate.vehicle_id, self.vehicle.pk)
+        self.assertNotIn(self.vehicle.pk, vehicle_index)
+
+    def test_rolled_back_claim_keeps_the_vehicle_dispatchable(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertIsNotNone(claim_nearest_vehicle(*PICKUP))
+                raise RuntimeError
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'AVAILABLE')
+        self.assertIn(self.vehicle.pk, vehicle_index)
+        self.assertEqual(claim_nearest_vehicle(*PICKUP).vehicle_id, self.vehicle.pk)
+
+    def test_listing_cache_is_invalidated_on_commit(self):
+        version = available_vehicles_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            claim_nearest_vehicle(*PICKUP)
+            # Readers keep the old version until the claim is visible to them.
+            self.assertEqual(available_vehicles_version(), version)
+        self.assertNotEqual(available_vehicles_version(), version)
+
+    def test_released_vehicle_rejoins_the_index_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            claim_nearest_vehicle(*PICKUP)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(release_vehicles([self.vehicle.pk]), 1)
+            self.assertNotIn(self.vehicle.pk, vehicle_index)
+        self.assertIn(self.vehicle.pk, vehicle_index)
+
+
+class VehicleSoftDeleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        vehicle_index.clear()
+        self.vehicles = add_vehicles(3)
+        self.gone, self.kept = self.vehicles[:2], self.vehicles[2]
+        self.ids = [vehicle.pk for vehicle in self.gone]
+        nearest_available_vehicles(*PICKUP)  # loads the index
+
+    def test_managers_filter_deleted_rows(self):
+        Vehicle.objects.filter(pk__in=self.ids).soft_delete()
+        self.assertQuerySetEqual(Vehicle.objects.all(), [self.kept])
+        self.assertEqual(Vehicle.all_objects.count(), 3)
+        self.assertEqual(set(Vehicle.objects.only_deleted().values_list('pk', flat=True)), set(self.ids))
+
+    def test_bulk_soft_delete_leaves_dispatch_on_commit(self):
+        version = available_vehicles_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Vehicle.objects.filter(pk__in=self.ids).soft_delete(), 2)
+            self.assertIn(self.ids[0], vehicle_index)
+        self.assertFalse(any(pk in vehicle_index for pk in self.ids))
+        self.assertIn(self.kept.pk, vehicle_index)
+        self.assertNotEqual(available_vehicles_version(), version)
+        self.assertEqual([c.vehicle_id for c in nearest_available_vehicles(*PICKUP)], [self.kept.pk])
+
+    def test_bulk_restore_rejoins_dispatch_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Vehicle.objects.filter(pk__in=self.ids).soft_delete()
+        version = available_vehicles_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Vehicle.all_objects.filter(pk__in=self.ids).restore(), 2)
+        self.assertTrue(all(pk in vehicle_index for pk in self.ids))
+        self.assertNotEqual(available_vehicles_version(), version)
+
+    def test_admin_action_soft_deletes_and_restores(self):
+        admin = User.objects.create_superuser('admin', password='pw-admin-123')
+        client = Client()
+        client.force_login(admin)
+
+        def act(action):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/admin/vehicles/vehicle/', {'action': action, '_selected_action': self.ids})
+            self.assertEqual(response.status_code, 302)
+
+        act('soft_delete_selected')
+        self.assertEqual(Vehicle.objects.count(), 1)
+        self.assertNotIn(self.ids[0], vehicle_index)
+        act('restore_selected')
+        self.assertEqual(Vehicle.objects.count(), 3)
+        self.assertIn(self.ids[0], vehicle_index)
+
+    def test_soft_deleted_driver_takes_their_vehicle_out_of_dispatch(self):
+        driver_ids = [vehicle.driver_id for vehicle in self.gone]
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk__in=driver_ids).soft_delete()
+        self.assertFalse(any(pk in vehicle_index for pk in self.ids))
+        with self.captureOnCommitCallbacks(execute=True):
+            User.all_objects.filter(pk__in=driver_ids).restore()
+        self.assertTrue(all(pk in vehicle_index for pk in self.ids))
+
+
+class VehicleQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vehicles = 0
+        self.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(self.admin).access_token}'}
+        self.client = Client()
+        self.add_vehicles(2)
+        # Caches the token's auth state, which the first request loads.
+        self.client.get('/api/users/profile/', **self.headers)
+
+    def add_vehicles(self, count):
+        # Committing new vehicles also drops the cached available listing.
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                driver = User.objects.create_user(f'driver{self.vehicles}', role='DRIVER')
+                Vehicle.objects.create(driver=driver, plate_number=f'QRY {self.vehicles}')
+                self.vehicles += 1
+
+    def list_count(self, path):
+        # COUNT for the page links and one SELECT for the page, drivers joined.
+        with self.assertNumQueries(2):
+            response = self.client.get(path, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['count']
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        self.assertEqual(self.list_count('/api/vehicles/'), 2)
+        self.assertEqual(self.list_count('/api/vehicles/available/'), 2)
+        self.add_vehicles(10)
+        self.assertEqual(self.list_count('/api/vehicles/'), 12)
+        self.assertEqual(self.list_count('/api/vehicles/available/'), 12)
@@ -1,13 +1,22 @@
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from core.async_views import AsyncListView, render_json
+from core.conditional import ConditionalDetailMixin
 from .models import Vehicle
+from . import cache
 from .serializers import VehicleSerializer
+from .filters import VehicleFilter
 
 
 class VehicleListCreateAPIView(generics.ListCreateAPIView):
-    queryset = Vehicle.objects.all()
+    queryset = Vehicle.objects.select_related('driver')
     serializer_class = VehicleSerializer
+    filterset_class = VehicleFilter
+    search_fields = ['^plate_number']
+    ordering_fields = ['created_at', 'plate_number']
 
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -15,19 +24,64 @@ class VehicleListCreateAPIView(generics.ListCreateAPIView):
         return [permissions.IsAuthenticated()]
 
 
-class VehicleRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Vehicle.objects.all()
+class VehicleRetrieveUpdateDestroyAPIView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Vehicle.objects.select_related('driver')
     serializer_class = VehicleSerializer
     permission_classes = [permissions.IsAdminUser]
+    version_fields = ('updated_at', 'driver__updated_at')
 
     def perform_destroy(self, instance):
         instance.soft_delete()
 
 
 class AvailableVehiclesAPIView(generics.ListAPIView):
-    queryset = Vehicle.objects.filter(status='AVAILABLE')
+    queryset = Vehicle.objects.filter(status='AVAILABLE').select_related('driver')
     serializer_class = VehicleSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['vehicle_type']
+    ordering_fields = ['created_at']
+
+    def list(self, request, *args, **kwargs):
+        version = cache.available_vehicles_version()
+        full_path = request.get_full_path()
+        etag = cache.available_vehicles_etag(version, full_path)
+        last_modified = int(version)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = cache.get_available_vehicles_page(version, full_path)
+        if data is None:
+            data = cache.set_available_vehicles_page(version, full_path, super().list(request, *args, **kwargs).data)
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class AvailableVehiclesAsyncView(AsyncListView):
+    write_view = AvailableVehiclesAPIView
+
+    async def aget(self, request, *args, **kwargs):
+        version = await cache.aavailable_vehicles_version()
+        full_path = request.get_full_path()
+        etag = cache.available_vehicles_etag(version, full_path)
+        last_modified = int(version)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = await cache.aget_available_vehicles_page(version, full_path)
+        if data is None:
+            data = await cache.aset_available_vehicles_page(version, full_path, await self.list_data())
+        return render_json(data, headers={
+            'ETag': etag,
+            'Last-Modified': http_date(last_modified),
+            'Cache-Control': 'private, no-cache',
+        })
 
 
 class UpdateVehicleStatusAPIView(APIView):
@@ -35,7 +89,7 @@ class UpdateVehicleStatusAPIView(APIView):
 
     def patch(self, request, pk):
         try:
-            vehicle = Vehicle.objects.get(pk=pk)
+            vehicle = Vehicle.objects.select_related('driver').get(pk=pk)
         except Vehicle.DoesNotExist:
             return Response({"error": "Vehicle not found"}, status=404)
 
@@ -51,3 +105,23 @@ class UpdateVehicleStatusAPIView(APIView):
         vehicle.status = new_status
         vehicle.save()
         return Response(VehicleSerializer(vehicle).data)
+
+
+class UpdateVehicleLocationAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def patch(self, request, pk):
+        try:
+            vehicle = Vehicle.objects.select_related('driver').get(pk=pk)
+        except Vehicle.DoesNotExist:
+            return Response({"error": "Vehicle not found"}, status=404)
+
+        if vehicle.driver != request.user and not request.user.is_staff:
+            return Response({"error": "Only the assigned driver can update the location"}, status=403)
+
+        serializer = VehicleSerializer(
+            vehicle, data={'current_geolocation': request.data.get('current_geolocation')}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)